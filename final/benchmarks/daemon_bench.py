@@ -0,0 +1,101 @@
+"""Command latency against `final serve`, compared with one-shot processes.
+
+Starts the daemon in a temporary directory on a store with ``--tasks``
+tasks, then has ``--clients`` threads each open one connection and send
+``--requests`` commands (a mix of list-tasks, search and add-task),
+reporting throughput and p50/p99 latency. For comparison it also times
+a few ``final --batch`` processes running a single command each.
+
+    uv run python benchmarks/daemon_bench.py [--tasks 2000] [--clients 1 8 32] [--requests 200]
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+from final import client  # noqa: E402
+
+# Selective queries, so the timings show the per-request cost rather than output size.
+COMMANDS = ["list-tasks --tag area7", "search part 77", "list-tasks --tag area3 --priority high", "add-task --title bench"]
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _client(path, requests, latencies, lock):
+    conn = client.Connection(path)
+    mine = []
+    for i in range(requests):
+        start = time.perf_counter()
+        conn.request(COMMANDS[i % len(COMMANDS)])
+        mine.append(time.perf_counter() - start)
+    conn.close()
+    with lock:
+        latencies.extend(mine)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=2000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="final-daemon-bench-")
+    env = dict(os.environ, PYTHONPATH=SRC, FINAL_AI_BACKEND="local")
+    env.pop("FINAL_SOCKET", None)
+    script = "".join(
+        f'add-task --title "Quarterly report part {i}" --tags area{i % 100} '
+        f'--priority {("low", "medium", "high")[i % 3]}\n'
+        for i in range(args.tasks)
+    )
+    subprocess.run(
+        [sys.executable, "-c", "import final; final.main(['--batch'])"],
+        input=script, cwd=workdir, env=env, text=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+    )
+
+    path = os.path.join(workdir, "state.sock")
+    daemon = subprocess.Popen([sys.executable, "-c", "import final; final.main(['serve'])"], cwd=workdir, env=env, stderr=subprocess.DEVNULL)
+    while not os.path.exists(path):
+        time.sleep(0.01)
+    time.sleep(0.1)
+
+    print(f"{args.tasks} tasks, {args.requests} requests per client")
+    for clients in args.clients:
+        latencies, lock = [], threading.Lock()
+        threads = [threading.Thread(target=_client, args=(path, args.requests, latencies, lock)) for _ in range(clients)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {clients:3d} clients: {len(latencies) / elapsed:8.0f} req/s  "
+            f"p50 {_percentile(latencies, 0.50) * 1000:6.2f} ms  p99 {_percentile(latencies, 0.99) * 1000:6.2f} ms"
+        )
+    daemon.send_signal(signal.SIGTERM)
+    daemon.wait()
+
+    runs = 5
+    start = time.perf_counter()
+    for _ in range(runs):
+        subprocess.run(
+            [sys.executable, "-c", "import final; final.main(['--batch'])"],
+            input="list-tasks --tag area7\n", cwd=workdir, env=env, text=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True,
+        )
+    print(f"  one process per command: {(time.perf_counter() - start) / runs * 1000:.0f} ms each")
+
+
+if __name__ == "__main__":
+    main()
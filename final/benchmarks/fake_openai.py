@@ -0,0 +1,107 @@
+"""A local stand-in for the OpenAI chat completions endpoint.
+
+Answers ``POST .../chat/completions`` with the first few words of the
+last user message after a fixed delay, so the AI commands can be
+benchmarked offline. Requests with ``"stream": true`` get the reply as
+server-sent events, one word every `token_delay` seconds. Point the
+client at it with ``OPENAI_BASE_URL=http://127.0.0.1:PORT/v1`` and any
+``OPENAI_API_KEY``.
+
+    uv run python benchmarks/fake_openai.py [--port 8765] [--latency 0.2] [--token-delay 0.02] [--error-rate 0.05]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+def _reply(messages) -> str:
+    text = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    # Prompts end with the task text; echo its first words as the "title".
+    words = text.split("\n")[-1].split()
+    return " ".join(words[:6]) or "Untitled task"
+
+
+def make_handler(latency: float, error_rate: float, token_delay: float = 0.0):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "not found"}})
+                return
+            time.sleep(latency)
+            if random.random() < error_rate:
+                self._send(429, {"error": {"message": "rate limited", "type": "rate_limit_error"}})
+                return
+            content = _reply(body.get("messages") or [])
+            if body.get("stream"):
+                self._stream(body.get("model", "fake"), content)
+                return
+            self._send(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+
+        def _stream(self, model: str, content: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            words = content.split(" ")
+            for i, word in enumerate(words):
+                delta = {"content": word if i == 0 else " " + word}
+                self._event({"choices": [{"index": 0, "delta": delta, "finish_reason": None}]}, model)
+                time.sleep(token_delay)
+            self._event({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}, model)
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def _event(self, payload, model: str) -> None:
+            payload.update({"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model})
+            self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+            self.wfile.flush()
+
+        def _send(self, status: int, payload) -> None:
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    return Handler
+
+
+def start(
+    port: int = 0, latency: float = 0.2, error_rate: float = 0.0, token_delay: float = 0.0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Serve in a background thread; returns the server and its ``/v1`` base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, error_rate, token_delay))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", args.port), make_handler(args.latency, args.error_rate, args.token_delay)
+    )
+    print(f"Serving on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,84 @@
+"""Measure how long starting final's REPL takes to import, using ``python -X importtime``.
+
+`final` itself only loads `final.metrics`; the REPL imports the rest
+(`REPL_MODULES`) before reading the first command. Runs a fresh
+interpreter several times, reports the median cumulative import time of
+those modules and the slowest modules they pulled in, and exits
+non-zero if the median is over the limit or if one of the AI-only
+dependencies (openai, httpx, pydantic) was imported.
+
+    uv run python benchmarks/import_time.py [--runs 5] [--max-ms 200]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# Modules only the AI commands need; importing final must not load them.
+FORBIDDEN = ("openai", "httpx", "pydantic")
+# What the REPL has loaded before its first prompt.
+REPL_MODULES = ("final", "final.commands", "final.storage", "final.flusher", "final.ai_agent")
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def measure() -> Dict[str, int]:
+    """Import `REPL_MODULES` in a new interpreter and return cumulative microseconds per module.
+
+    The ``"total"`` entry is the time of the imports the REPL does itself,
+    each counted once (a module imported by another is inside its time).
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC + os.pathsep + env.get("PYTHONPATH", "")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(REPL_MODULES)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: Dict[str, int] = {"total": 0}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, raw_name = line[len("import time:"):].split("|")
+        name = raw_name.strip()
+        times[name] = int(cumulative)
+        # Top-level imports are indented by one space, nested ones by more.
+        if name in REPL_MODULES and len(raw_name) - len(raw_name.lstrip()) == 1:
+            times["total"] += int(cumulative)
+    return times
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=200.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    runs = [measure() for _ in range(args.runs)]
+    total_ms = statistics.median(r["total"] for r in runs) / 1000
+    slowest: List[Tuple[int, str]] = sorted(
+        ((us, name) for name, us in runs[-1].items() if name != "total"), reverse=True
+    )
+
+    print(f"import {', '.join(REPL_MODULES)}: {total_ms:.1f} ms (median of {args.runs})")
+    for us, name in slowest[: args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    loaded = sorted({name.split(".")[0] for name in runs[-1]} & set(FORBIDDEN))
+    if loaded:
+        print(f"FAIL: starting the REPL loaded {', '.join(loaded)}")
+        failed = True
+    if total_ms > args.max_ms:
+        print(f"FAIL: {total_ms:.1f} ms is over the {args.max_ms:.0f} ms limit")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Resident memory of loaded tasks: plain dicts vs `Task` records, which intern repeated strings.
+
+A generated state is written to a temporary JSON file; for each mode a
+fresh interpreter loads it (plain ``json.load`` for dicts; for records
+the way `final.storage` does, interning while parsing and then
+converting the task list to `final.models.Task`) and
+reports the growth of its resident set, read from ``/proc/self/statm``
+(Linux only).
+
+    uv run python benchmarks/memory_bench.py [--tasks 1000000]
+"""
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(os.path.dirname(HERE), "src")
+sys.path.insert(0, SRC)
+sys.path.insert(0, HERE)
+
+import synthetic  # noqa: E402
+
+MODES = ("dict", "record")
+
+
+def _rss() -> int:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def measure(path: str, mode: str) -> int:
+    """Return the bytes of resident memory the tasks in `path` take in `mode`."""
+    from final import storage
+
+    gc.collect()
+    before = _rss()
+    with open(path, encoding="utf-8") as fh:
+        # The record mode loads the way `storage.load_state` does.
+        data = json.load(fh, object_hook=storage._intern_hook if mode == "record" else None)
+    if mode == "record":
+        storage._tasks_to_records(data)
+    tasks = data["tasks"]  # noqa: F841
+    del data
+    gc.collect()
+    return _rss() - before
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--measure", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(measure(*args.measure))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="final-mem-") as workdir:
+        path = os.path.join(workdir, "state.json")
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(synthetic.generate_state(args.tasks, 0, args.seed), fh)
+        results = {}
+        for mode in MODES:
+            out = subprocess.run(
+                [sys.executable, __file__, "--measure", path, mode], capture_output=True, text=True, check=True
+            )
+            results[mode] = int(out.stdout)
+
+    print(f"{args.tasks} tasks")
+    for mode in MODES:
+        print(f"  {mode:<7} {results[mode] / 2**20:8.1f} MiB  {results[mode] / args.tasks:6.0f} B/task")
+    print(f"  saving  {1 - results['record'] / results['dict']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Throughput of `retitle` against the local fake OpenAI server.
+
+Starts `fake_openai` in-process, points the real OpenAI client at it and
+times `retitle_tasks` over synthetic tasks at several concurrency levels
+(the AI cache is turned off so every task makes a request). With
+``--backend local`` the offline summarizer is timed instead.
+
+    uv run python benchmarks/retitle_bench.py [--tasks 200] [--latency 0.2] [--concurrency 1 8 32] [--rate 0]
+        [--backend openai|local]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_openai  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--rate", type=float, default=0.0, help="requests per second, 0 = unlimited")
+    parser.add_argument("--backend", default="openai")
+    args = parser.parse_args()
+
+    server, url = fake_openai.start(latency=args.latency, error_rate=args.error_rate)
+    os.environ["OPENAI_BASE_URL"] = url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+
+    from final import ai_agent, ai_cache, retitle
+
+    ai_cache.ENABLED = False
+    backend = ai_agent.get_backend(args.backend)
+    if not backend.offline:
+        ai_agent.get_client()  # keep the openai import out of the timings
+    tasks = [{"id": i, "description": f"task {i}: follow up on the quarterly report draft"} for i in range(1, args.tasks + 1)]
+
+    print(
+        f"{args.tasks} tasks, backend {backend.name}, {args.latency * 1000:.0f} ms per request, "
+        f"rate limit {args.rate or 'none'}"
+    )
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        titles = retitle.retitle_tasks(tasks, summarize=backend.summarize, concurrency=concurrency, rate=args.rate, backoff=0.05)
+        elapsed = time.perf_counter() - start
+        print(
+            f"  concurrency {concurrency:3d}: {elapsed:6.2f} s  "
+            f"{len(titles) / elapsed:7.1f} tasks/s  ({args.tasks - len(titles)} failed)"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Benchmark suite: core operations on generated states, checked against a baseline.
+
+For each size a state with that many tasks (and a quarter as many
+notes) is generated by `synthetic`, saved to a temporary directory and
+the operations in `OPERATIONS` are timed. Each result is the median
+time per call over ``--repeat`` runs; fast operations are looped until
+a run takes at least `MIN_RUN_SECONDS`.
+
+Results are compared with the baseline file (``benchmarks/baseline.json``).
+An operation more than ``--threshold`` slower than its baseline (default
+25%) is reported as a regression and the exit status is 1. Use
+``--update-baseline`` to record the current numbers instead. Baselines
+are machine specific; re-record them when changing machines.
+
+    uv run python benchmarks/suite.py [--sizes 1000 10000] [--repeat 5] [--threshold 0.25]
+        [--only load_state search_all] [--baseline FILE] [--update-baseline]
+
+Sizes up to 1000000 work but take minutes to generate and save.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+sys.path.insert(0, HERE)
+
+import synthetic  # noqa: E402
+from final import ai_agent, commands, storage  # noqa: E402
+
+BASELINE_FILE = os.path.join(HERE, "baseline.json")
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_THRESHOLD = 0.25
+MIN_RUN_SECONDS = 0.05
+SEED = 42
+
+# An operation gets the loaded state and returns (call, undo): `call` is
+# timed, `undo` (untimed, may be None) restores the state between runs.
+Operation = Callable[[Dict[str, Any]], Tuple[Callable[[], Any], Optional[Callable[[], None]]]]
+
+
+def _load(state):
+    return storage.load_state, None
+
+
+def _save(state):
+    return lambda: storage.save_state(state), None
+
+
+def _next_task_id(state):
+    return lambda: storage.next_task_id(state), None
+
+
+def _complete_task(state):
+    open_ids = iter([t["id"] for t in state["tasks"] if t["status"] == "open"])
+    completed: List[int] = []
+
+    def call():
+        task_id = next(open_ids)
+        commands.complete_task(state, task_id)
+        completed.append(task_id)
+
+    def undo():
+        nonlocal open_ids
+        for task_id in completed:
+            storage.apply_change(state, {"op": "update_task", "id": task_id, "fields": {"status": "open"}})
+        open_ids = iter(completed + list(open_ids))
+        completed.clear()
+
+    return call, undo
+
+
+def _search_all(state):
+    return lambda: commands.search_all(state, "budget"), None
+
+
+def _search_ranked(state):
+    return lambda: commands.search_all(state, "review budget report", top=10), None
+
+
+def _list_tasks(state):
+    return lambda: commands.list_tasks(state, status="open", tag="finance"), None
+
+
+def _plan_candidates(state):
+    return lambda: ai_agent._plan_candidates(state["tasks"], None), None
+
+
+OPERATIONS: Dict[str, Operation] = {
+    "load_state": _load,
+    "save_state": _save,
+    "next_task_id": _next_task_id,
+    "complete_task": _complete_task,
+    "search_all": _search_all,
+    "search_ranked": _search_ranked,
+    "list_tasks": _list_tasks,
+    "ai_plan_candidates": _plan_candidates,
+}
+
+
+def measure(call: Callable[[], Any], undo: Optional[Callable[[], None]], repeat: int, max_number: int) -> float:
+    """Return the median seconds per call of `call` over `repeat` runs."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        elapsed = time.perf_counter() - start
+        if undo:
+            undo()
+        if elapsed >= MIN_RUN_SECONDS or number >= max_number:
+            break
+        number = min(number * 10, max_number)
+    runs = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        runs.append((time.perf_counter() - start) / number)
+        if undo:
+            undo()
+    return statistics.median(runs)
+
+
+def run_suite(sizes: List[int], repeat: int, only: Optional[List[str]] = None) -> Dict[str, float]:
+    """Time the operations at every size; returns ``{"op/size": seconds per call}``."""
+    results: Dict[str, float] = {}
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix="final-bench-")
+        storage.STATE_FILE = os.path.join(workdir, "state.json")
+        try:
+            start = time.perf_counter()
+            storage.save_state(synthetic.generate_state(size, size // 4, seed=SEED))
+            print(f"{size} tasks, {size // 4} notes (generated and saved in {time.perf_counter() - start:.1f} s)", file=sys.stderr)
+            state = storage.load_state()
+            # Persist the search index like a REPL session does on exit, so
+            # load_state measures the warm path rather than an index rebuild.
+            storage.checkpoint(state)
+            # The open tasks bound how often complete_task can run per measurement.
+            max_number = max(1, sum(t["status"] == "open" for t in state["tasks"]) // 2)
+            with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+                for name, operation in OPERATIONS.items():
+                    if only and name not in only:
+                        continue
+                    call, undo = operation(state)
+                    results[f"{name}/{size}"] = measure(call, undo, repeat, max_number)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Return the keys of `results` more than `threshold` slower than in `baseline`."""
+    return [key for key, seconds in results.items() if key in baseline and seconds > baseline[key] * (1 + threshold)]
+
+
+def _fmt(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.2f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds:9.2f} s "
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--only", nargs="+", choices=sorted(OPERATIONS))
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.repeat, args.only)
+
+    baseline: Dict[str, float] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh).get("results", {})
+    regressions = compare(results, baseline, args.threshold)
+
+    print(f"{'operation':<28} {'time':>12} {'baseline':>12} {'change':>8}")
+    for key, seconds in results.items():
+        base = baseline.get(key)
+        change = f"{(seconds / base - 1) * 100:+7.1f}%" if base else "     new"
+        flag = "  REGRESSION" if key in regressions else ""
+        print(f"{key:<28} {_fmt(seconds):>12} {_fmt(base) if base else '-':>12} {change:>8}{flag}")
+
+    if args.update_baseline:
+        merged = {**baseline, **results}
+        data = {
+            "machine": {"python": platform.python_version(), "platform": platform.platform()},
+            "results": dict(sorted(merged.items())),
+        }
+        with open(args.baseline, "w", encoding="utf-8") as fh:
+            json.dump(data, fh, indent=2)
+            fh.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.threshold:.0%}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Seeded generator of realistic states for benchmarks.
+
+`generate_state(tasks, notes, seed)` returns a plain state dict (the
+shape `storage.save_state` writes) whose contents depend only on the
+arguments: titles and descriptions built from a work-ish vocabulary,
+tags drawn with a skewed (Zipf-like) popularity, mostly medium
+priorities, due dates spread around `REFERENCE_DATE` (some overdue,
+many missing), about a fifth of the tasks done, and notes of a few
+sentences to a few paragraphs.
+
+    uv run python benchmarks/synthetic.py --tasks 100000 --notes 25000 --seed 1 > state.json
+"""
+import argparse
+import json
+import random
+import sys
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List
+
+# Due and created dates are relative to this day, so states are reproducible.
+REFERENCE_DATE = date(2025, 1, 15)
+
+VERBS = (
+    "fix update review write prepare draft refactor migrate plan schedule call email book clean "
+    "organize test deploy document research compare buy renew cancel submit file sort"
+).split()
+OBJECTS = (
+    "report invoice budget slides proposal roadmap login page database backup newsletter contract "
+    "dashboard onboarding guide release notes expense claim tax return dentist appointment flight "
+    "hotel groceries garden fence laptop printer inbox calendar spreadsheet API client tests"
+).split()
+DETAILS = (
+    "before the quarterly review", "for the marketing team", "with the new template", "for next sprint",
+    "and send it to finance", "after the vendor call", "so the demo works", "for the board meeting",
+    "because the old one expired", "and update the wiki", "before Friday", "for the Berlin office",
+)
+TAGS = (
+    "work home errands finance health family reading learning ops backend frontend design hiring "
+    "travel garden car taxes q1 q2 urgent someday writing research admin"
+).split()
+PRIORITIES = ("low", "medium", "high")
+PRIORITY_WEIGHTS = (0.25, 0.55, 0.20)
+SENTENCE_WORDS = (
+    "the a we should consider how this affects our plan next week meeting notes idea draft customer "
+    "feedback deadline risk option cost estimate decision follow up open question summary "
+    "context background action item owner timeline scope detail example"
+).split()
+
+
+def _tags(rng: random.Random) -> List[str]:
+    count = rng.choices((0, 1, 2, 3), weights=(0.15, 0.45, 0.3, 0.1))[0]
+    # paretovariate gives a few very common tags and a long tail.
+    picked = {TAGS[min(int(rng.paretovariate(1.2)) - 1, len(TAGS) - 1)] for _ in range(count)}
+    return sorted(picked)
+
+
+def _sentence(rng: random.Random) -> str:
+    words = rng.choices(SENTENCE_WORDS, k=rng.randint(6, 16))
+    return words[0].capitalize() + " " + " ".join(words[1:]) + "."
+
+
+def make_task(rng: random.Random, task_id: int) -> Dict[str, Any]:
+    """Return one task dict with id `task_id`."""
+    verb, obj = rng.choice(VERBS), rng.choice(OBJECTS)
+    title = f"{verb.capitalize()} {obj}"
+    description = f"{verb.capitalize()} the {obj} {rng.choice(DETAILS)}." if rng.random() < 0.7 else ""
+    due = None
+    if rng.random() < 0.6:
+        due = (REFERENCE_DATE + timedelta(days=rng.randint(-30, 90))).isoformat()
+    created = datetime.combine(REFERENCE_DATE - timedelta(days=rng.randint(0, 365)), datetime.min.time())
+    return {
+        "id": task_id,
+        "title": title,
+        "description": description,
+        "tags": _tags(rng),
+        "status": "done" if rng.random() < 0.2 else "open",
+        "priority": rng.choices(PRIORITIES, weights=PRIORITY_WEIGHTS)[0],
+        "due_date": due,
+        "created_at": created.isoformat(),
+    }
+
+
+def make_note(rng: random.Random, note_id: int) -> Dict[str, Any]:
+    """Return one note dict with id `note_id`."""
+    paragraphs = [" ".join(_sentence(rng) for _ in range(rng.randint(2, 6))) for _ in range(rng.randint(1, 3))]
+    return {
+        "id": note_id,
+        "title": f"{rng.choice(OBJECTS).capitalize()} {rng.choice(('notes', 'ideas', 'summary', 'log'))}",
+        "content": "\n\n".join(paragraphs),
+        "tags": _tags(rng),
+    }
+
+
+def generate_state(tasks: int, notes: int = 0, seed: int = 0) -> Dict[str, Any]:
+    """Return a state with `tasks` tasks and `notes` notes, the same for the same arguments."""
+    rng = random.Random(seed)
+    return {
+        "tasks": [make_task(rng, i) for i in range(1, tasks + 1)],
+        "notes": [make_note(rng, i) for i in range(1, notes + 1)],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--notes", type=int, default=None, help="default: a quarter of --tasks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    notes = args.tasks // 4 if args.notes is None else args.notes
+    json.dump(generate_state(args.tasks, notes, args.seed), sys.stdout, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,91 +1,284 @@
-from final import commands
+import shlex
+import sys
+from datetime import date
+from typing import Dict, List, Optional
 
+from final import metrics
 
-def main() -> None:
-    from final.storage import load_state, save_state
+LIST_TASK_FLAGS = ("--status", "--priority", "--tag", "--due-before")
+RETITLE_FLAGS = ("--concurrency", "--rate")
+ADD_TASK_FLAGS = ("--title", "--description", "--tags", "--priority", "--due-date")
+ADD_NOTE_FLAGS = ("--title", "--content", "--tags")
+ADD_TASK_USAGE = "Usage: add-task [--title T] [--description D] [--tags a,b] [--priority P] [--due-date YYYY-MM-DD]"
+ADD_NOTE_USAGE = "Usage: add-note [--title T] [--content C] [--tags a,b]"
+IMPORT_USAGE = "Usage: import <file.csv|file.jsonl> [--kind task|note] [--format csv|jsonl]"
+# Commands timed under their own name by `final.metrics`; anything else is "command.other".
+COMMAND_NAMES = frozenset(
+    "add-task list-tasks complete-task add-note list-notes view-note ai-plan retitle import "
+    "reset-state search stats help".split()
+)
 
-    state = load_state()
 
-    print("Welcome to final.")
-    print("Type 'help' to see commands.")
+class CommandError(Exception):
+    """A command line that could not be run; the message says why."""
+
+
+def _parse_flags(args: List[str], allowed: tuple) -> Optional[Dict[str, str]]:
+    """Parse ``--name value`` pairs into a dict keyed by ``name`` (dashes -> underscores).
+
+    Prints a message and returns None on an unknown flag or missing value.
+    """
+    options: Dict[str, str] = {}
+    i = 0
+    while i < len(args):
+        flag = args[i]
+        if flag not in allowed:
+            print(f"Unknown option: {flag}")
+            return None
+        if i + 1 >= len(args):
+            print(f"Missing value for {flag}")
+            return None
+        options[flag[2:].replace("-", "_")] = args[i + 1]
+        i += 2
+    return options
+
+
+def _split_args(cmd: str) -> List[str]:
+    """Split a command line shell-style, so flag values can be quoted."""
+    if not any(c in cmd for c in "'\"\\"):
+        return cmd.split()
+    try:
+        return shlex.split(cmd)
+    except ValueError as e:
+        raise CommandError(f"Invalid command line: {e}")
+
+
+def run_command(state: Dict, flusher, cmd: str, interactive: bool = True) -> bool:
+    """Run one REPL command line. Returns False when the user asked to quit.
+
+    Changes made by other processes are picked up first (`Flusher.sync`),
+    and the command runs while holding `state.lock` so a background flush
+    never sees a half-applied change. New records that had to be
+    renumbered because another session took their id are reported last.
+
+    A malformed command prints its usage message. With ``interactive=False``
+    (batch mode) it raises `CommandError` instead, and commands that would
+    prompt for input (add-task/add-note without flags, reset-state without
+    ``--yes``) are rejected.
+    """
+    cmd = cmd.strip()
+    if not cmd:
+        return True
+    cmd_l = cmd.lower()
+    if cmd_l == "quit":
+        print("Goodbye.")
+        return False
 
-    while True:
+    name = cmd_l.split()[0]
+    with state.lock:
+        flusher.sync()
         try:
-            cmd = input("> ")
-        except (EOFError, KeyboardInterrupt):
-            save_state(state)
-            print("\nGoodbye.")
-            break
-
-        if cmd is None:
-            continue
-        cmd = cmd.strip()
-        if not cmd:
-            continue
-
-        cmd_l = cmd.lower()
-
-        if cmd_l == "quit":
-            save_state(state)
-            print("Goodbye.")
-            break
-        elif cmd_l == "help":
-            print("Commands:")
-            print("  add-task")
-            print("  list-tasks")
-            print("  complete-task <id>")
-            print("  add-note")
-            print("  list-notes")
-            print("  view-note <id>")
-            print("  ai-plan        # generate a daily plan from open tasks")
-            print("  reset-state          # delete ALL tasks and notes (with confirmation)")
-            print("  search <query>")
-            print("  help")
-            print("  quit")
-        elif cmd_l == "add-task":
-            commands.add_task(state)
-            save_state(state)
-        elif cmd_l == "list-tasks":
-            commands.list_tasks(state)
-        elif cmd_l.startswith("complete-task"):
-            parts = cmd_l.split()
-            if len(parts) != 2:
-                print("Usage: complete-task <id>")
-                continue
+            with metrics.timer("command." + (name if name in COMMAND_NAMES else "other")):
+                _dispatch(state, flusher, cmd, cmd_l, interactive)
+        except CommandError as e:
+            if not interactive:
+                raise
+            print(e)
+        finally:
+            _report_renumbered(state)
+    return True
+
+
+def _report_renumbered(state: Dict) -> None:
+    """Print the new ids of records another session's writes forced us to renumber."""
+    from final.storage import take_renumbered
+
+    for kind, old_id, new_id in take_renumbered(state):
+        print(f"{kind.capitalize()} {old_id} was renumbered to {new_id} (id taken by another session).")
+
+
+def _dispatch(state: Dict, flusher, cmd: str, cmd_l: str, interactive: bool = True) -> None:
+    # Imported here so `final client` starts without loading the storage layer.
+    from final import commands
+
+    if cmd_l == "help":
+        print("Commands:")
+        print("  add-task [--title T] [--description D] [--tags a,b] [--priority P] [--due-date YYYY-MM-DD]")
+        print("  list-tasks [--status S] [--priority P] [--tag T] [--due-before YYYY-MM-DD]")
+        print("  complete-task <id>")
+        print("  add-note [--title T] [--content C] [--tags a,b]")
+        print("  list-notes")
+        print("  view-note <id>")
+        print("  ai-plan [--top K]   # generate a daily plan from the K most pressing open tasks")
+        print("  retitle [--all] [--concurrency N] [--rate R]   # AI titles for untitled (or all) tasks")
+        print("  import <file> [--kind task|note] [--format csv|jsonl]   # bulk-add from CSV or JSONL")
+        print("  reset-state [--yes]  # delete ALL tasks and notes (with confirmation)")
+        print("  search [--top N] <query>   # --top: N best matches ranked by relevance")
+        print("  stats [reset]   # latency percentiles and bytes read/written so far")
+        print("  help")
+        print("  quit")
+    elif cmd_l.split()[0] == "add-task":
+        fields = _parse_flags(_split_args(cmd)[1:], ADD_TASK_FLAGS)
+        if fields is None:
+            raise CommandError(ADD_TASK_USAGE)
+        if fields:
+            flusher.record(commands.create_task(state, **fields))
+        elif interactive:
+            flusher.record(commands.add_task(state))
+        else:
+            raise CommandError(ADD_TASK_USAGE)
+    elif cmd_l.split()[0] == "list-tasks":
+        options = _parse_flags(_split_args(cmd)[1:], LIST_TASK_FLAGS)
+        if options is None:
+            raise CommandError("Usage: list-tasks [--status S] [--priority P] [--tag T] [--due-before YYYY-MM-DD]")
+        if "status" in options:
+            options["status"] = options["status"].lower()
+        if "priority" in options:
+            options["priority"] = options["priority"].lower()
+        if "due_before" in options:
+            # Due dates are compared as strings, so only YYYY-MM-DD works.
             try:
-                task_id = int(parts[1])
+                options["due_before"] = date.fromisoformat(options["due_before"]).isoformat()
             except ValueError:
-                print(f"Invalid task id: {parts[1]}")
-                continue
-            commands.complete_task(state, task_id)
-            save_state(state)
-        elif cmd_l == "add-note":
-            commands.add_note(state)
-            save_state(state)
-        elif cmd_l == "list-notes":
-            commands.list_notes(state)
-        elif cmd_l == "ai-plan":
-            commands.ai_plan(state)
-        elif cmd_l == "reset-state":
-            commands.reset_state(state)
-            save_state(state)
-        elif cmd_l.startswith("view-note"):
-            parts = cmd_l.split()
-            if len(parts) != 2:
-                print("Usage: view-note <id>")
-                continue
+                raise CommandError(f"Invalid date (expected YYYY-MM-DD): {options['due_before']}")
+        commands.list_tasks(state, **options)
+    elif cmd_l.startswith("complete-task"):
+        parts = cmd_l.split()
+        if len(parts) != 2:
+            raise CommandError("Usage: complete-task <id>")
+        try:
+            task_id = int(parts[1])
+        except ValueError:
+            raise CommandError(f"Invalid task id: {parts[1]}")
+        flusher.record(commands.complete_task(state, task_id))
+    elif cmd_l.split()[0] == "add-note":
+        fields = _parse_flags(_split_args(cmd)[1:], ADD_NOTE_FLAGS)
+        if fields is None:
+            raise CommandError(ADD_NOTE_USAGE)
+        if fields:
+            flusher.record(commands.create_note(state, fields.pop("title", ""), **fields))
+        elif interactive:
+            flusher.record(commands.add_note(state))
+        else:
+            raise CommandError(ADD_NOTE_USAGE)
+    elif cmd_l == "list-notes":
+        commands.list_notes(state)
+    elif cmd_l.split()[0] == "ai-plan":
+        options = _parse_flags(cmd.split()[1:], ("--top",))
+        if options is None:
+            raise CommandError("Usage: ai-plan [--top K]")
+        try:
+            top_k = int(options["top"]) if "top" in options else None
+        except ValueError:
+            raise CommandError(f"Invalid number: {options['top']}")
+        if top_k is not None and top_k < 1:
+            raise CommandError(f"Invalid number (expected 1 or more): {options['top']}")
+        commands.ai_plan(state, top_k=top_k)
+    elif cmd_l.split()[0] == "retitle":
+        args = cmd.split()[1:]
+        all_tasks = "--all" in args
+        options = _parse_flags([a for a in args if a != "--all"], RETITLE_FLAGS)
+        if options is None:
+            raise CommandError("Usage: retitle [--all] [--concurrency N] [--rate R]")
+        try:
+            concurrency = int(options["concurrency"]) if "concurrency" in options else None
+            rate = float(options["rate"]) if "rate" in options else None
+        except ValueError:
+            raise CommandError("Usage: retitle [--all] [--concurrency N] [--rate R]")
+        flusher.record_many(commands.retitle(state, all_tasks=all_tasks, concurrency=concurrency, rate=rate))
+    elif cmd_l.split()[0] == "import":
+        args = _split_args(cmd)[1:]
+        options = _parse_flags(args[1:], ("--kind", "--format")) if args else None
+        if options is None or options.get("kind", "task") not in ("task", "note"):
+            raise CommandError(IMPORT_USAGE)
+        commands.import_records(
+            state, args[0], kind=options.get("kind", "task"), fmt=options.get("format"), commit=flusher.record_now
+        )
+    elif cmd_l.split()[0] == "reset-state":
+        args = cmd_l.split()[1:]
+        if args not in ([], ["--yes"]) or (not args and not interactive):
+            raise CommandError("Usage: reset-state [--yes]")
+        flusher.record(commands.reset_state(state, confirmed=bool(args)))
+    elif cmd_l.startswith("view-note"):
+        parts = cmd_l.split()
+        if len(parts) != 2:
+            raise CommandError("Usage: view-note <id>")
+        try:
+            note_id = int(parts[1])
+        except ValueError:
+            raise CommandError(f"Invalid note id: {parts[1]}")
+        commands.view_note(state, note_id)
+    elif cmd_l.startswith("search"):
+        parts = cmd.split()
+        top = None
+        if len(parts) > 1 and parts[1] == "--top":
+            if len(parts) < 3:
+                raise CommandError("Usage: search [--top N] <query>")
             try:
-                note_id = int(parts[1])
+                top = int(parts[2])
             except ValueError:
-                print(f"Invalid note id: {parts[1]}")
-                continue
-            commands.view_note(state, note_id)
-        elif cmd_l.startswith("search"):
-            parts = cmd.split()
-            if len(parts) == 1:
-                print("Usage: search <query>")
-                continue
-            query = " ".join(parts[1:])
-            commands.search_all(state, query)
+                raise CommandError(f"Invalid number: {parts[2]}")
+            parts = parts[:1] + parts[3:]
+        if len(parts) == 1:
+            raise CommandError("Usage: search [--top N] <query>")
+        query = " ".join(parts[1:])
+        commands.search_all(state, query, top=top)
+    elif cmd_l.split()[0] == "stats":
+        args = cmd_l.split()[1:]
+        if args == ["reset"]:
+            metrics.reset()
+            print("Statistics reset.")
+        elif not args:
+            print(metrics.format_stats())
         else:
-            print("Unknown command. Type 'help'.")
+            raise CommandError("Usage: stats [reset]")
+    else:
+        raise CommandError("Unknown command. Type 'help'.")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Start the REPL, or dispatch ``serve`` / ``client`` / ``http`` / batch mode arguments."""
+    args = sys.argv[1:] if argv is None else argv
+    if args[:1] == ["serve"]:
+        from final import server
+
+        sys.exit(server.serve(*args[1:2]))
+    if args[:1] == ["http"]:
+        from final import http_api
+
+        sys.exit(http_api.main(args[1:]))
+    if args[:1] == ["client"]:
+        from final import client
+
+        sys.exit(client.main(args[1:]))
+    if args:
+        from final import batch
+
+        sys.exit(batch.main(args))
+
+    from final.flusher import Flusher
+    from final.storage import load_state
+
+    state = load_state()
+    flusher = Flusher(state)
+
+    print("Welcome to final.")
+    print("Type 'help' to see commands.")
+
+    try:
+        while True:
+            try:
+                cmd = input("> ")
+            except (EOFError, KeyboardInterrupt):
+                print("\nGoodbye.")
+                break
+
+            if cmd is None:
+                continue
+            if not run_command(state, flusher, cmd):
+                break
+    except (EOFError, KeyboardInterrupt):
+        print("\nGoodbye.")
+    finally:
+        # Writes anything still pending, whichever way the loop ended.
+        flusher.close()
@@ -1,20 +1,39 @@
+import heapq
 import os
-from typing import List, Dict
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-from openai import OpenAI
+from final import ai_cache, metrics
+from final.ai_backends import Backend, LocalBackend
 
 MODEL = "gpt-4.1-mini"
 
-# Create a client instance using the environment variable (may be None)
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Which backend answers the AI commands: "openai", "local" (offline,
+# instant) or "hybrid" (local titles now, refined remotely by `retitle`).
+AI_BACKEND = os.getenv("FINAL_AI_BACKEND", "openai").lower()
 
+# Created by `get_client` on first use; importing `openai` is slow, so
+# commands that never talk to the model do not pay for it.
+client = None
 
-def _ensure_api_key() -> None:
+
+def get_client():
+    """Return the shared OpenAI client, importing `openai` and creating it on first use."""
+    global client
+    if client is None:
+        from openai import OpenAI
+
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return client
+
+
+def ensure_api_key() -> None:
     """Raise a clear error if the API key is missing.
 
-    The `client` is constructed at import time using the environment
-    variable, but we still validate at call time to provide a helpful
-    RuntimeError when the key is not set.
+    Checked before the client is created so a missing key gives a
+    helpful RuntimeError instead of an error from the OpenAI library.
     """
     if not os.getenv("OPENAI_API_KEY"):
         raise RuntimeError(
@@ -22,59 +41,222 @@ def _ensure_api_key() -> None:
         )
 
 
-def _call_chat(messages: List[Dict], model: str = MODEL, temperature: float = 0.3, max_tokens: int = 300) -> str:
+def _call_chat(
+    messages: List[Dict],
+    model: str = MODEL,
+    temperature: float = 0.3,
+    max_tokens: int = 300,
+    stream: bool = False,
+) -> Union[str, Iterator[str]]:
     """Call the OpenAI Chat Completions API via the new client and return text.
 
     Uses `client.chat.completions.create(...)` and returns the assistant
     content string. Raises RuntimeError when API key is missing or an API
     error occurs.
+
+    With ``stream=True`` an iterator over the content deltas is returned
+    instead (see `_stream_chat`).
     """
-    _ensure_api_key()
+    if stream:
+        return _stream_chat(messages, model, temperature, max_tokens)
+    ensure_api_key()
     try:
-        response = client.chat.completions.create(
+        with metrics.timer("ai.call_chat"):
+            response = get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        raise RuntimeError(f"OpenAI API error: {e}")
+
+
+def _stream_chat(messages: List[Dict], model: str, temperature: float, max_tokens: int) -> Iterator[str]:
+    """Yield the assistant's reply in pieces as the API streams it.
+
+    If the backend rejects the streaming request, or the stream carries no
+    content, the reply is fetched with one normal request and yielded whole.
+    """
+    ensure_api_key()
+    start = time.perf_counter()
+    try:
+        chunks = get_client().chat.completions.create(
             model=model,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
+            stream=True,
         )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
-        raise RuntimeError(f"OpenAI API error: {e}")
+    except Exception:
+        chunks = None
 
+    streamed = False
+    if chunks is not None:
+        try:
+            for chunk in chunks:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if not streamed:
+                        metrics.record("ai.first_token", time.perf_counter() - start)
+                    streamed = True
+                    yield delta
+        except Exception as e:
+            if streamed:
+                raise RuntimeError(f"OpenAI API error: {e}")
+        if streamed:
+            metrics.record("ai.stream_chat", time.perf_counter() - start)
+    if not streamed:
+        yield _call_chat(messages, model=model, temperature=temperature, max_tokens=max_tokens)
 
-def summarize_description(description: str) -> str:
-    """Return a very short (5-10 words) task title for the given description.
 
-    The function sends the description to the Chat Completions API and returns
-    the single-line title produced by the model. If the API key is missing a
-    RuntimeError will be raised.
-    """
-    system = "You are an assistant that writes very short task titles (5–10 words)."
-    user = (
-        "Write a single short title for this task description. "
-        "Do NOT include any explanation or extra text.\n\n"
-        f"Description:\n{description}"
-    )
+SUMMARY_SYSTEM = "You are an assistant that writes very short task titles (5–10 words)."
+SUMMARY_PROMPT = (
+    "Write a single short title for this task description. "
+    "Do NOT include any explanation or extra text.\n\n"
+    "Description:\n{description}"
+)
+SUMMARY_TEMPERATURE = 0.2
+
+
+def _remote_title(description: str, use_cache: bool) -> str:
+    """Ask the model for a title, going through the on-disk cache."""
+    key = None
+    if use_cache and ai_cache.ENABLED:
+        key = ai_cache.make_key(
+            "title", MODEL, SUMMARY_SYSTEM, SUMMARY_PROMPT, SUMMARY_TEMPERATURE, ai_cache.normalize(description)
+        )
+        cached = ai_cache.get_cache().get(key)
+        if cached is not None:
+            return cached
+
     messages = [
-        {"role": "system", "content": system},
-        {"role": "user", "content": user},
+        {"role": "system", "content": SUMMARY_SYSTEM},
+        {"role": "user", "content": SUMMARY_PROMPT.format(description=description)},
     ]
-    return _call_chat(messages, temperature=0.2, max_tokens=60)
+    title = _call_chat(messages, temperature=SUMMARY_TEMPERATURE, max_tokens=60)
+    if key is not None and title:
+        ai_cache.get_cache().put(key, title)
+    return title
 
 
-def generate_plan(tasks: List[Dict]) -> str:
-    """Generate an ordered plan for what to do today from a list of tasks.
+# Local pre-ranking: only the PLAN_TOP_K best-scoring open tasks reach
+# the model. Above PLAN_CHUNK_SIZE candidates the plan is built
+# map-reduce style: chunks are planned concurrently, then merged. A full
+# top K is PLAN_CONCURRENCY chunks, so large backlogs take that path.
+PLAN_TOP_K = 100
+PLAN_CHUNK_SIZE = 25
+PLAN_CONCURRENCY = 4
 
-    The function builds a concise text representation of the open tasks
-    (including `id`, `title`, `priority`, and `due_date`) and asks the model
-    to produce a numbered plan. It returns the model's response as plain text.
+# Upper bound on the estimated size of any planning prompt.
+PLAN_MAX_PROMPT_TOKENS = 3000
+PLAN_TITLE_CHARS = 120
 
-    Args:
-        tasks: list of task dictionaries (typically from state["tasks"]).
+PRIORITY_WEIGHT = {"high": 3.0, "medium": 2.0, "low": 1.0}
+# Overdue tasks get OVERDUE_WEIGHT; otherwise DUE_WEIGHT / (1 + days left).
+OVERDUE_WEIGHT = 4.0
+DUE_WEIGHT = 3.0
+# Older tasks get up to AGE_WEIGHT, reached after AGE_DAYS days.
+AGE_WEIGHT = 1.0
+AGE_DAYS = 30
 
-    Returns:
-        str: the model's plain-text response.
+PLAN_SYSTEM = (
+    "You are an assistant that, given a list of tasks, produces a concise "
+    "ordered plan for what to do today."
+)
+PLAN_PROMPT = (
+    "Given this list of tasks, produce an ordered plan for what to do today. "
+    "Output as a numbered list and be concise. Do not add extra commentary.\n\n"
+    "Tasks:\n{tasks}"
+)
+MERGE_PROMPT = (
+    "Each plan below was made from a different part of the same task list. "
+    "Merge them into one ordered plan for what to do today, keeping the task IDs. "
+    "Output as a numbered list and be concise. Do not add extra commentary.\n\n"
+    "{plans}"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the tokens in `text` (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def score_task(task: Dict, today: date, max_id: int = 0) -> float:
+    """Score a task for planning: priority, due-date proximity and age.
+
+    Age comes from ``created_at`` when present, otherwise from the id
+    (lower ids are older) relative to `max_id`.
     """
+    score = PRIORITY_WEIGHT.get(str(task.get("priority") or "").lower(), PRIORITY_WEIGHT["medium"])
+
+    due = _parse_date(task.get("due_date") or task.get("due"))
+    if due is not None:
+        days = (due - today).days
+        score += OVERDUE_WEIGHT if days < 0 else DUE_WEIGHT / (1 + days)
+
+    created = _parse_date(task.get("created_at"))
+    if created is not None:
+        score += AGE_WEIGHT * min(max((today - created).days, 0), AGE_DAYS) / AGE_DAYS
+    elif max_id and isinstance(task.get("id"), int):
+        score += AGE_WEIGHT * (1 - task["id"] / max_id)
+    return score
+
+
+def rank_tasks(tasks: List[Dict], k: int, today: Optional[date] = None) -> List[Dict]:
+    """Return the `k` highest-scoring tasks, best first (ties: lower id first)."""
+    today = today or date.today()
+    max_id = max((t["id"] for t in tasks if isinstance(t.get("id"), int)), default=0)
+    scored = [(score_task(t, today, max_id), -i, t) for i, t in enumerate(tasks)]
+    return [t for _, _, t in heapq.nlargest(k, scored, key=lambda item: item[:2])]
+
+
+def _task_lines(tasks: List[Dict], budget: int) -> str:
+    """Format tasks one per line, stopping before `budget` estimated tokens."""
+    lines = []
+    used = 0
+    for t in tasks:
+        tid = t.get("id", "")
+        title = str(t.get("title", t.get("description", ""))).replace("\n", " ")[:PLAN_TITLE_CHARS]
+        priority = t.get("priority", "")
+        due = t.get("due_date", t.get("due", ""))
+        line = f"ID: {tid} | Title: {title} | Priority: {priority} | Due: {due}"
+        used += estimate_tokens(line)
+        if used > budget and lines:
+            break
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _plan_messages(tasks: List[Dict]) -> List[Dict]:
+    budget = PLAN_MAX_PROMPT_TOKENS - estimate_tokens(PLAN_SYSTEM + PLAN_PROMPT)
+    tasks_text = _task_lines(tasks, budget) if tasks else "No open tasks."
+    return [
+        {"role": "system", "content": PLAN_SYSTEM},
+        {"role": "user", "content": PLAN_PROMPT.format(tasks=tasks_text)},
+    ]
+
+
+def _merge_messages(plans: List[str]) -> List[Dict]:
+    # Split the budget evenly so every partial plan is represented.
+    budget = (PLAN_MAX_PROMPT_TOKENS - estimate_tokens(PLAN_SYSTEM + MERGE_PROMPT)) // max(len(plans), 1)
+    parts = [f"Plan {i}:\n{plan[: budget * 4]}" for i, plan in enumerate(plans, 1)]
+    return [
+        {"role": "system", "content": PLAN_SYSTEM},
+        {"role": "user", "content": MERGE_PROMPT.format(plans="\n\n".join(parts))},
+    ]
+
+
+def _plan_candidates(tasks: List[Dict], top_k: Optional[int]) -> List[Dict]:
+    """Return the open tasks that go into the plan, best first."""
     # Filter out tasks that are marked completed/done/closed
     open_tasks = []
     for t in tasks:
@@ -86,29 +268,198 @@ def generate_plan(tasks: List[Dict]) -> str:
             continue
         open_tasks.append(t)
 
-    if not open_tasks:
-        tasks_text = "No open tasks."
-    else:
-        lines = []
-        for t in open_tasks:
-            tid = t.get("id", "")
-            title = str(t.get("title", t.get("description", ""))).replace("\n", " ")
-            priority = t.get("priority", "")
-            due = t.get("due_date", t.get("due", ""))
-            lines.append(f"ID: {tid} | Title: {title} | Priority: {priority} | Due: {due}")
-        tasks_text = "\n".join(lines)
-
-    system = (
-        "You are an assistant that, given a list of tasks, produces a concise "
-        "ordered plan for what to do today."
-    )
-    user = (
-        "Given this list of tasks, produce an ordered plan for what to do today. "
-        "Output as a numbered list and be concise. Do not add extra commentary.\n\n"
-        f"Tasks:\n{tasks_text}"
+    return rank_tasks(open_tasks, PLAN_TOP_K if top_k is None else top_k)
+
+
+def plan_fingerprint(candidates: List[Dict], today: Optional[date] = None) -> str:
+    """Return the cache key of a plan for `candidates`.
+
+    Covers exactly what the prompts are built from (id, title, priority
+    and due date of each task, in order), the prompts and limits, the
+    model and the date, so adding, completing or editing a planned task
+    gives a new key.
+    """
+    fields = [
+        (t.get("id"), t.get("title", t.get("description", "")), t.get("priority"), t.get("due_date", t.get("due")))
+        for t in candidates
+    ]
+    today = today or date.today()
+    return ai_cache.make_key(
+        "plan", MODEL, PLAN_SYSTEM, PLAN_PROMPT, MERGE_PROMPT,
+        PLAN_CHUNK_SIZE, PLAN_MAX_PROMPT_TOKENS, PLAN_TITLE_CHARS, today.isoformat(), fields,
     )
-    messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
-    return _call_chat(messages, temperature=0.4, max_tokens=500)
 
 
-__all__ = ["summarize_description", "generate_plan"]
+def _plan_request(candidates: List[Dict]) -> List[Dict]:
+    """Return the messages of the final planning request for `candidates`.
+
+    In map-reduce mode the chunk plans are requested here (concurrently)
+    and the returned messages ask the model to merge them.
+    """
+    if len(candidates) <= PLAN_CHUNK_SIZE:
+        return _plan_messages(candidates)
+
+    chunks = [candidates[i:i + PLAN_CHUNK_SIZE] for i in range(0, len(candidates), PLAN_CHUNK_SIZE)]
+    with ThreadPoolExecutor(max_workers=PLAN_CONCURRENCY, thread_name_prefix="final-plan") as pool:
+        plans = list(pool.map(lambda chunk: _call_chat(_plan_messages(chunk), temperature=0.4, max_tokens=500), chunks))
+    return _merge_messages(plans)
+
+
+def _cached_plan(candidates: List[Dict], use_cache: bool) -> Tuple[Optional[str], Optional[str]]:
+    """Return ``(cache key, cached plan)``; both None when caching is off."""
+    if not (use_cache and ai_cache.ENABLED):
+        return None, None
+    key = plan_fingerprint(candidates)
+    return key, ai_cache.get_cache().get(key)
+
+
+def _remote_plan(candidates: List[Dict], use_cache: bool) -> str:
+    key, cached = _cached_plan(candidates, use_cache)
+    if cached is not None:
+        return cached
+    plan = _call_chat(_plan_request(candidates), temperature=0.4, max_tokens=500)
+    if key is not None and plan:
+        ai_cache.get_cache().put(key, plan)
+    return plan
+
+
+def _stream_remote_plan(candidates: List[Dict], use_cache: bool) -> Iterator[str]:
+    key, cached = _cached_plan(candidates, use_cache)
+    if cached is not None:
+        yield cached
+        return
+
+    result = _call_chat(_plan_request(candidates), temperature=0.4, max_tokens=500, stream=True)
+    # A backend without streaming answers in one piece.
+    pieces = [result] if isinstance(result, str) else result
+    received = []
+    for piece in pieces:
+        received.append(piece)
+        yield piece
+    plan = "".join(received).strip()
+    if key is not None and plan:
+        ai_cache.get_cache().put(key, plan)
+
+
+class OpenAIBackend(Backend):
+    """The OpenAI chat completions API, with results cached in `final.ai_cache`."""
+
+    name = "openai"
+
+    def summarize(self, description: str, use_cache: bool = True) -> str:
+        return _remote_title(description, use_cache)
+
+    def plan(self, candidates: List[Dict], use_cache: bool = True) -> str:
+        return _remote_plan(candidates, use_cache)
+
+    def stream_plan(self, candidates: List[Dict], use_cache: bool = True) -> Iterator[str]:
+        return _stream_remote_plan(candidates, use_cache)
+
+
+class HybridBackend(Backend):
+    """Local now, remote later.
+
+    Titles come from `local` instantly and are marked so `retitle`
+    refines them with `remote`. Plans show the local plan first, then
+    the remote one as it streams in.
+    """
+
+    name = "hybrid"
+    local_titles = True
+
+    def __init__(self, local: Backend, remote: Backend) -> None:
+        self.local = local
+        self.remote = remote
+
+    def summarize(self, description: str, use_cache: bool = True) -> str:
+        return self.local.summarize(description, use_cache)
+
+    def plan(self, candidates: List[Dict], use_cache: bool = True) -> str:
+        return "".join(self.stream_plan(candidates, use_cache))
+
+    def stream_plan(self, candidates: List[Dict], use_cache: bool = True) -> Iterator[str]:
+        yield self.local.plan(candidates, use_cache)
+        yield "\n\nRefined plan:\n"
+        yield from self.remote.stream_plan(candidates, use_cache)
+
+    def refine_backend(self) -> Backend:
+        return self.remote
+
+
+BACKENDS: Dict[str, Backend] = {}
+
+
+def register_backend(backend: Backend) -> None:
+    """Make `backend` selectable by its name (``FINAL_AI_BACKEND`` / `get_backend`)."""
+    BACKENDS[backend.name] = backend
+
+
+register_backend(OpenAIBackend())
+register_backend(LocalBackend())
+register_backend(HybridBackend(BACKENDS["local"], BACKENDS["openai"]))
+
+
+def get_backend(name: Optional[str] = None) -> Backend:
+    """Return the backend called `name` (default `AI_BACKEND`). Raises ValueError if unknown."""
+    name = (name or AI_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown AI backend: {name!r} (choose from {', '.join(sorted(BACKENDS))})")
+    return BACKENDS[name]
+
+
+def summarize_description(description: str, use_cache: bool = True, backend: Optional[str] = None) -> str:
+    """Return a very short (5-10 words) task title for the given description.
+
+    With the default "openai" backend the description is sent to the Chat
+    Completions API and the single-line title produced by the model is
+    returned. If the API key is missing a RuntimeError will be raised.
+    The "local" and "hybrid" backends answer offline (`extractive_title`).
+
+    Titles are cached on disk (see `final.ai_cache`) keyed by the model,
+    prompt, temperature and normalized description, so a repeated
+    description is answered without an API call. Pass ``use_cache=False``
+    (or set ``FINAL_AI_CACHE=off``) to always ask the model.
+    """
+    return get_backend(backend).summarize(description, use_cache)
+
+
+def generate_plan(
+    tasks: List[Dict], top_k: Optional[int] = None, use_cache: bool = True, backend: Optional[str] = None
+) -> str:
+    """Generate an ordered plan for what to do today from a list of tasks.
+
+    The open tasks are scored locally (`score_task`) and only the best
+    `top_k` (default `PLAN_TOP_K`) are planned from. The "openai" backend
+    sends them as `id`, `title`, `priority` and `due_date` lines trimmed
+    to `PLAN_MAX_PROMPT_TOKENS`; with more than `PLAN_CHUNK_SIZE`
+    candidates, chunks are planned concurrently and the partial plans
+    merged by one more request. The "local" backend lists them with a
+    reason each (`rule_based_plan`).
+
+    Remote plans are cached under `plan_fingerprint`, so asking again the
+    same day with the same planned tasks costs no request. Pass
+    ``use_cache=False`` (or set ``FINAL_AI_CACHE=off``) to always ask.
+
+    Args:
+        tasks: list of task dictionaries (typically from state["tasks"]).
+        top_k: how many of the best tasks to plan from.
+        use_cache: whether to read and store the plan cache.
+        backend: backend name, default `AI_BACKEND`.
+
+    Returns:
+        str: the plan as plain text.
+    """
+    return get_backend(backend).plan(_plan_candidates(tasks, top_k), use_cache)
+
+
+def stream_plan(
+    tasks: List[Dict], top_k: Optional[int] = None, use_cache: bool = True, backend: Optional[str] = None
+) -> Iterator[str]:
+    """Like `generate_plan`, but yield the plan in pieces as it streams.
+
+    A cached plan is yielded whole; a streamed plan is cached once it is complete.
+    """
+    yield from get_backend(backend).stream_plan(_plan_candidates(tasks, top_k), use_cache)
+
+
+__all__ = ["summarize_description", "generate_plan", "stream_plan", "get_backend", "register_backend"]
@@ -0,0 +1,141 @@
+"""Backends that answer the AI commands, and the offline one.
+
+A backend turns a task description into a short title (`summarize`)
+and a ranked list of open tasks into a plan for today (`plan`,
+`stream_plan`). `final.ai_agent` holds the OpenAI backend and picks
+the one named by ``FINAL_AI_BACKEND``.
+
+`LocalBackend` needs no network: titles are the description's highest
+TF-IDF keywords (each sentence counts as a document) and plans list the
+tasks in ranked order with the reason each one is pressing.
+"""
+import heapq
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterator, List, Optional
+
+TITLE_WORDS = 6
+LOCAL_PLAN_ITEMS = 10
+
+STOPWORDS = frozenset(
+    "a about after again all also am an and any are as at be because been before being but by can cannot could "
+    "did do does doing done for from get gets getting go going got had has have having he her here his how "
+    "i if in into is it its just let make me more most must my need needs no not of off on once only or "
+    "other our out over please really she should so some such than that the their them then there these "
+    "they this those through to too up us very was we were what when where which while who will with would "
+    "you your".split()
+)
+
+_WORD_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9'_-]*")
+_SENTENCE_RE = re.compile(r"[.!?;\n]+")
+
+
+class Backend(ABC):
+    """Interface of an AI backend.
+
+    Subclasses must implement `summarize` and `plan`. `offline` backends
+    never touch the network; `local_titles` backends suggest titles
+    offline that `refine_backend` can improve later.
+    """
+
+    name = "base"
+    offline = False
+    local_titles = False
+
+    @abstractmethod
+    def summarize(self, description: str, use_cache: bool = True) -> str:
+        """Return a short title for `description`."""
+
+    @abstractmethod
+    def plan(self, candidates: List[Dict], use_cache: bool = True) -> str:
+        """Return a plan for today from the ranked `candidates`."""
+
+    def stream_plan(self, candidates: List[Dict], use_cache: bool = True) -> Iterator[str]:
+        """Yield the plan in pieces; by default all at once."""
+        yield self.plan(candidates, use_cache)
+
+    def refine_backend(self) -> "Backend":
+        """Return the backend `retitle` uses to improve titles this one suggested."""
+        return self
+
+
+def extractive_title(description: str, max_words: int = TITLE_WORDS) -> str:
+    """Return up to `max_words` of the description's top TF-IDF keywords, in text order."""
+    sentences = [s for s in _SENTENCE_RE.split(description or "") if s.strip()]
+    first_seen: Dict[str, int] = {}
+    surface: Dict[str, str] = {}
+    tf: Counter = Counter()
+    df: Counter = Counter()
+    position = 0
+    for sentence in sentences:
+        seen = set()
+        for word in _WORD_RE.findall(sentence):
+            key = word.lower()
+            position += 1
+            if key in STOPWORDS or len(key) < 2:
+                continue
+            tf[key] += 1
+            seen.add(key)
+            first_seen.setdefault(key, position)
+            surface.setdefault(key, word)
+        df.update(seen)
+
+    if not tf:
+        words = (description or "").split()[:max_words]
+        return " ".join(words)
+
+    n = len(sentences)
+    best = heapq.nlargest(max_words, tf, key=lambda w: (tf[w] * (1 + math.log(n / df[w])), -first_seen[w]))
+    words = [surface[w] for w in sorted(best, key=first_seen.get)]
+    return words[0][:1].upper() + " ".join(words)[1:]
+
+
+def _reason(task: Dict, today: date) -> str:
+    parts = [f"{task.get('priority') or 'medium'} priority"]
+    due_raw = task.get("due_date") or task.get("due")
+    try:
+        due: Optional[date] = date.fromisoformat(str(due_raw)[:10]) if due_raw else None
+    except ValueError:
+        due = None
+    if due is not None:
+        days = (due - today).days
+        if days < 0:
+            parts.append(f"overdue since {due.isoformat()}")
+        elif days == 0:
+            parts.append("due today")
+        elif days == 1:
+            parts.append("due tomorrow")
+        else:
+            parts.append(f"due in {days} days")
+    return ", ".join(parts)
+
+
+def rule_based_plan(candidates: List[Dict], today: Optional[date] = None, limit: int = LOCAL_PLAN_ITEMS) -> str:
+    """Number the first `limit` (already ranked) tasks, each with why it is pressing."""
+    if not candidates:
+        return "No open tasks."
+    today = today or date.today()
+    lines = []
+    for i, task in enumerate(candidates[:limit], 1):
+        title = str(task.get("title") or task.get("description") or "").replace("\n", " ")
+        lines.append(f"{i}. [{task.get('id', '?')}] {title} ({_reason(task, today)})")
+    if len(candidates) > limit:
+        lines.append(f"({len(candidates) - limit} more open tasks can wait.)")
+    return "\n".join(lines)
+
+
+class LocalBackend(Backend):
+    """Offline backend: extractive titles and a rule-based plan, with no latency."""
+
+    name = "local"
+    offline = True
+    local_titles = True
+
+    def summarize(self, description: str, use_cache: bool = True) -> str:
+        return extractive_title(description)
+
+    def plan(self, candidates: List[Dict], use_cache: bool = True) -> str:
+        return rule_based_plan(candidates)
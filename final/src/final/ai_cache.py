@@ -0,0 +1,109 @@
+"""Persistent LRU cache for AI responses.
+
+Responses are stored in a small SQLite file keyed by a hash of
+everything that determines the answer (model, prompt, temperature and
+the normalized input). Entries older than `MAX_AGE_SECONDS` are dropped
+and only the `MAX_ENTRIES` most recently used are kept. Set
+``FINAL_AI_CACHE=off`` to bypass the cache entirely.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from final import metrics
+
+CACHE_FILE = "ai_cache.db"
+
+# Bypass the cache when FINAL_AI_CACHE is "off", "0" or "false".
+ENABLED = os.getenv("FINAL_AI_CACHE", "on").lower() not in ("off", "0", "false")
+
+MAX_ENTRIES = 5000
+MAX_AGE_SECONDS = 30 * 24 * 3600
+
+
+def normalize(text: str) -> str:
+    """Lowercase `text` and collapse whitespace so trivial edits share an entry."""
+    return " ".join((text or "").lower().split())
+
+
+def make_key(*parts: Any) -> str:
+    """Return a stable SHA-256 key for the given JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AICache:
+    """An on-disk LRU map from key to response text, with hit/miss counters."""
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES, max_age: float = MAX_AGE_SECONDS) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Title suggestions may be requested from a worker thread.
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache(last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for `key` (refreshing its LRU position) or None."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.max_age:
+                self.misses += 1
+                metrics.count("ai_cache.miss")
+                return None
+            self._conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            metrics.count("ai_cache.hit")
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """Store `value` under `key` and evict expired / least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._conn.execute("DELETE FROM cache WHERE created < ?", (now - self.max_age,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_cache: Optional[AICache] = None
+
+
+def get_cache() -> AICache:
+    """Return the process-wide cache stored in `CACHE_FILE`, opening it on first use."""
+    global _cache
+    if _cache is None or _cache.path != CACHE_FILE:
+        _cache = AICache(CACHE_FILE)
+    return _cache
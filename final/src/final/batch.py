@@ -0,0 +1,98 @@
+"""Running commands without the interactive prompt.
+
+``final run script.txt`` runs the commands in a file and
+``final --batch`` those read from standard input, one per line (blank
+lines and lines starting with ``#`` are skipped). The state is loaded
+once; each command's changes are appended to the journal as part of
+that command, and synced to disk once at the end. So if another session
+takes a new record's id first, the renumbering is reported in the
+output of the command that made the record. Each command prints one
+JSON object on standard output::
+
+    {"line": 3, "command": "complete-task 7", "ok": true, "output": "Marked task 7 as completed."}
+
+Failed commands have ``"ok": false`` and an ``"error"`` message. The exit
+status is 1 if any command failed.
+"""
+import contextlib
+import io
+import json
+import sys
+import time
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple
+
+USAGE = "Usage: final [run SCRIPT | --batch | serve [SOCKET] | client [COMMAND ...] | http [--host H] [--port N]]"
+
+
+def execute(state: Dict, flusher, cmd: str) -> Tuple[Dict[str, Any], bool]:
+    """Run one command non-interactively and capture what it prints.
+
+    Returns ``({"ok": ..., "output": ...[, "error": ...]}, keep_going)``;
+    `keep_going` is False after ``quit``.
+    """
+    from final import CommandError, run_command
+
+    result: Dict[str, Any] = {"ok": True}
+    captured = io.StringIO()
+    keep_going = True
+    try:
+        # Output is captured process-wide, so commands must not overlap.
+        with state.lock, contextlib.redirect_stdout(captured):
+            keep_going = run_command(state, flusher, cmd, interactive=False)
+    except CommandError as e:
+        result.update(ok=False, error=str(e))
+    except Exception as e:
+        result.update(ok=False, error=f"{type(e).__name__}: {e}")
+    result["output"] = captured.getvalue().rstrip("\n")
+    return result, keep_going
+
+
+def run_lines(state: Dict, flusher, lines: Iterable[str], out: IO[str]) -> Tuple[int, int]:
+    """Run command `lines` against `state`, writing one JSON result per command.
+
+    Stops early at ``quit``. Returns the number of commands run and failed.
+    """
+    ran = failed = 0
+    for number, line in enumerate(lines, 1):
+        cmd = line.strip()
+        if not cmd or cmd.startswith("#"):
+            continue
+        result, keep_going = execute(state, flusher, cmd)
+        ran += 1
+        failed += not result["ok"]
+        out.write(json.dumps({"line": number, "command": cmd, **result}) + "\n")
+        if not keep_going:
+            break
+    return ran, failed
+
+
+def main(args: List[str], stdin: Optional[IO[str]] = None, out: Optional[IO[str]] = None) -> int:
+    """Entry point for ``final run SCRIPT`` and ``final --batch``; returns the exit status."""
+    from final.flusher import Flusher
+    from final.storage import load_state
+
+    stdin = stdin or sys.stdin
+    out = out or sys.stdout
+    if args == ["--batch"]:
+        source = stdin
+    elif len(args) == 2 and args[0] == "run":
+        try:
+            source = open(args[1], encoding="utf-8")
+        except OSError as e:
+            print(f"Cannot read script: {e}", file=sys.stderr)
+            return 2
+    else:
+        print(USAGE, file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    state = load_state()
+    flusher = Flusher(state, mode="batch")
+    try:
+        with source if source is not stdin else contextlib.nullcontext(source):
+            ran, failed = run_lines(state, flusher, source, out)
+    finally:
+        flusher.close()
+    elapsed = time.perf_counter() - started
+    print(f"{ran} commands, {failed} failed, {elapsed:.2f}s", file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,117 @@
+"""Content-addressed blob store for note bodies.
+
+Each blob is saved once under the SHA-256 of its text, in a file named
+after the hash inside a two-character fan-out directory. Blobs are
+optionally zlib-compressed (``.z`` suffix). Reads go through a small LRU
+cache; since a hash always names the same text, cached entries never
+go stale. `collect_garbage` removes the blobs nothing refers to any more.
+"""
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+from functools import lru_cache
+from typing import Iterable
+
+from final import metrics
+
+# Compress new blobs with zlib.
+COMPRESS = True
+
+# Number of note bodies kept in memory by `get`.
+CACHE_SIZE = 128
+
+# Blobs stored (or stored again) less than this many seconds ago are
+# never collected: another process may have put one for a change it has
+# not committed yet.
+GC_MIN_AGE = 3600
+
+
+def content_hash(text: str) -> str:
+    """Return the hex SHA-256 of `text` (UTF-8)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _path(root: str, digest: str) -> str:
+    return os.path.join(root, digest[:2], digest)
+
+
+def put(root: str, text: str) -> str:
+    """Store `text` under `root` if it is not there yet and return its hash."""
+    digest = content_hash(text)
+    path = _path(root, digest)
+    for existing in (path, path + ".z"):
+        if os.path.exists(existing):
+            # Refresh the age so `collect_garbage` leaves it alone for now.
+            os.utime(existing)
+            return digest
+
+    data = text.encode("utf-8")
+    if COMPRESS:
+        data = zlib.compress(data)
+        path += ".z"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+        metrics.count("bytes_written", len(data))
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return digest
+
+
+def get(root: str, digest: str) -> str:
+    """Return the text stored under `digest`. Raises FileNotFoundError if missing."""
+    return _read(_path(os.path.abspath(root), digest))
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _read(path: str) -> str:
+    if os.path.exists(path + ".z"):
+        with open(path + ".z", "rb") as fh:
+            data = fh.read()
+        metrics.count("bytes_read", len(data))
+        return zlib.decompress(data).decode("utf-8")
+    with open(path, "rb") as fh:
+        data = fh.read()
+    metrics.count("bytes_read", len(data))
+    return data.decode("utf-8")
+
+
+def collect_garbage(root: str, keep: Iterable[str]) -> int:
+    """Delete the blobs under `root` whose hash is not in `keep`.
+
+    Blobs younger than `GC_MIN_AGE` are kept regardless. Returns how
+    many blobs were removed.
+    """
+    keep = set(keep)
+    cutoff = time.time() - GC_MIN_AGE
+    removed = 0
+    try:
+        fans = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+    for fan in fans:
+        fan_dir = os.path.join(root, fan)
+        if not os.path.isdir(fan_dir):
+            continue
+        for name in os.listdir(fan_dir):
+            digest = name[:-2] if name.endswith(".z") else name
+            path = os.path.join(fan_dir, name)
+            # Skip kept blobs and anything that is not a blob (temporary files).
+            if digest in keep or len(digest) != 64 or os.path.getmtime(path) > cutoff:
+                continue
+            os.remove(path)
+            removed += 1
+    if removed:
+        _read.cache_clear()
+    return removed
+
+
+def cache_info():
+    """Return the LRU cache statistics of `get`."""
+    return _read.cache_info()
@@ -0,0 +1,80 @@
+"""Thin client for ``final serve``.
+
+``final client`` reads commands at a prompt and ``final client CMD ...``
+runs a single command, in both cases on the running daemon, so nothing
+is loaded locally. This module imports only the standard library to
+keep start-up short.
+"""
+import json
+import os
+import shlex
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+# Same as `storage.socket_path()` for the default STATE_FILE; not derived
+# from it so the client does not import the storage layer.
+DEFAULT_SOCKET = "state.sock"
+
+
+class Connection:
+    """One connection to the daemon; `request` sends a command and returns the response."""
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path or os.getenv("FINAL_SOCKET") or DEFAULT_SOCKET)
+        self._reader = self.sock.makefile("rb")
+
+    def request(self, command: str, request_id: Any = None) -> Dict[str, Any]:
+        message: Dict[str, Any] = {"command": command}
+        if request_id is not None:
+            message["id"] = request_id
+        self.sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("final serve closed the connection")
+        return json.loads(line)
+
+    def close(self) -> None:
+        self._reader.close()
+        self.sock.close()
+
+
+def _show(response: Dict[str, Any]) -> None:
+    if response.get("output"):
+        print(response["output"])
+    if not response.get("ok"):
+        print(response.get("error", "Command failed."))
+
+
+def main(args: List[str], path: Optional[str] = None) -> int:
+    """Entry point for ``final client``; returns the exit status."""
+    try:
+        conn = Connection(path)
+    except OSError as e:
+        print(f"Cannot reach final serve: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        if args:
+            response = conn.request(shlex.join(args) if len(args) > 1 else args[0])
+            _show(response)
+            return 0 if response.get("ok") else 1
+
+        while True:
+            try:
+                cmd = input("> ")
+            except (EOFError, KeyboardInterrupt):
+                print("\nGoodbye.")
+                return 0
+            if not cmd.strip():
+                continue
+            response = conn.request(cmd)
+            _show(response)
+            if response.get("closed"):
+                return 0
+    except ConnectionError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    finally:
+        conn.close()
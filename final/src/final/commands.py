@@ -3,25 +3,85 @@
 These functions are placeholders and will be implemented later.
 They are intentionally minimal so tests and imports succeed.
 """
-from typing import Dict
-from final.storage import next_task_id, next_note_id
-from final.ai_agent import summarize_description, generate_plan
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+
+from final.models import timestamp
+from final.storage import (
+    apply_change,
+    filter_tasks,
+    find_note,
+    find_task,
+    next_note_id,
+    next_task_id,
+    ranked_search,
+    search_records,
+)
+
+# Seconds add-task waits at the title prompt for the AI suggestion.
+TITLE_SUGGESTION_TIMEOUT = 10.0
+
+
+def _start_title_suggestion(description: str) -> Future:
+    """Ask the AI for a title in a background thread and return a Future for it.
+
+    The thread is a daemon so a hung request never keeps the app from exiting.
+    """
+    future: Future = Future()
+
+    def run() -> None:
+        try:
+            # The AI layer is imported here so startup does not load it.
+            from final.ai_agent import summarize_description
+
+            future.set_result(summarize_description(description))
+        except Exception as e:
+            future.set_exception(e)
 
+    threading.Thread(target=run, name="final-title", daemon=True).start()
+    return future
 
-def add_task(state: Dict) -> None:
+
+def add_task(state: Dict) -> Optional[Dict]:
     """Add a task to the state (stub).
 
     This version will ask for a long description first and then use the
     AI summarizer to suggest a short title which the user can accept or
-    override.
+    override. The suggestion is requested in the background while the
+    tags, priority and due date are entered, and waited for (up to
+    `TITLE_SUGGESTION_TIMEOUT` seconds) only at the title prompt. If the
+    AI fails or is too slow, a local extractive title is suggested
+    instead; accepted local titles are marked ``title_source: "local"``
+    so `retitle` can refine them. Returns the change entry that was applied.
     """
     description = input("description: ").strip()
 
     # Ask AI for a suggested short title based on the description.
+    suggestion = _start_title_suggestion(description)
+
+    tags_raw = input("tags (comma-separated, optional): ").strip()
+    priority_raw = input("priority (low / medium / high) [medium]: ").strip()
+    due_date_raw = input("due_date (optional, YYYY-MM-DD or blank): ").strip()
+
+    # "local" when the suggestion was made offline, so `retitle` can refine it.
+    source = None
     try:
-        suggested_title = summarize_description(description)
-    except Exception:
-        suggested_title = ""
+        suggested_title = suggestion.result(timeout=TITLE_SUGGESTION_TIMEOUT)
+        from final.ai_agent import get_backend
+
+        if get_backend().local_titles:
+            source = "local"
+    except Exception as e:
+        from final.ai_backends import extractive_title
+
+        if isinstance(e, TimeoutError):
+            print("AI suggestion is taking too long; using a local suggestion.")
+        else:
+            print(f"AI suggestion failed ({e}); using a local suggestion.")
+        suggested_title = extractive_title(description)
+        source = "local"
 
     if suggested_title:
         print(f"AI suggestion for title: {suggested_title}")
@@ -29,21 +89,44 @@ def add_task(state: Dict) -> None:
     title_input = input(f"Title (press Enter to accept AI suggestion): ").strip()
     title = title_input if title_input else suggested_title
 
-    tags_raw = input("tags (comma-separated, optional): ").strip()
-    priority_raw = input("priority (low / medium / high) [medium]: ").strip()
-    due_date_raw = input("due_date (optional, YYYY-MM-DD or blank): ").strip()
+    return create_task(
+        state,
+        title,
+        description=description,
+        tags=tags_raw,
+        priority=priority_raw,
+        due_date=due_date_raw,
+        title_source=source if not title_input else None,
+    )
 
-    # Normalize tags into a list
-    if tags_raw == "":
-        tags_list = []
-    else:
-        tags_list = [t.strip() for t in tags_raw.split(",") if t.strip()]
 
-    # Priority default
-    priority = priority_raw.lower() if priority_raw else "medium"
+def _split_tags(tags_raw: str) -> List[str]:
+    # Normalize comma-separated tags into a list
+    if tags_raw == "":
+        return []
+    return [t.strip() for t in tags_raw.split(",") if t.strip()]
+
+
+def create_task(
+    state: Dict,
+    title: str = "",
+    description: str = "",
+    tags: str = "",
+    priority: str = "",
+    due_date: str = "",
+    title_source: Optional[str] = None,
+) -> Dict:
+    """Add a task from already known fields, without prompting.
+
+    `tags` is comma-separated, a blank priority means "medium" and a blank
+    due date none. Without a title, a local title is made from the
+    description and marked for `retitle`. Returns the applied change entry.
+    """
+    if not title and description:
+        from final.ai_backends import extractive_title
 
-    # Use None for blank due date
-    due_date = due_date_raw or None
+        title = extractive_title(description)
+        title_source = "local"
 
     # Get a new id using storage helper
     task_id = next_task_id(state)
@@ -52,23 +135,41 @@ def add_task(state: Dict) -> None:
         "id": task_id,
         "title": title,
         "description": description,
-        "tags": tags_list,
+        "tags": _split_tags(tags),
         "status": "open",
-        "priority": priority,
-        "due_date": due_date,
+        # Priority default
+        "priority": priority.lower() if priority else "medium",
+        # Use None for blank due date
+        "due_date": due_date or None,
+        "created_at": timestamp(),
     }
+    if title_source and title:
+        new_task["title_source"] = title_source
 
-    state.setdefault("tasks", []).append(new_task)
+    change = {"op": "add_task", "task": new_task}
+    apply_change(state, change)
     print(f"Added task {task_id}: {title}")
+    return change
 
 
-def list_tasks(state: Dict) -> None:
+def list_tasks(
+    state: Dict,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    tag: Optional[str] = None,
+    due_before: Optional[str] = None,
+) -> None:
     """List tasks from the state.
 
     Prints a simple one-line summary per task. If there are no tasks,
-    prints "No tasks found.".
+    prints "No tasks found.". The optional filters keep only tasks with
+    that status, priority or tag, or due strictly before `due_before`
+    (YYYY-MM-DD).
     """
-    tasks = state.get("tasks") or []
+    if status is None and priority is None and tag is None and due_before is None:
+        tasks = state.get("tasks") or []
+    else:
+        tasks = filter_tasks(state, status=status, priority=priority, tag=tag, due_before=due_before)
     if not tasks:
         print("No tasks found.")
         return
@@ -82,59 +183,62 @@ def list_tasks(state: Dict) -> None:
         print(f"[{tid}] {title}  (status: {status}, priority: {priority}, due: {due})")
 
 
-def complete_task(state: Dict, task_id: int) -> None:
+def complete_task(state: Dict, task_id: int) -> Optional[Dict]:
     """Mark a task complete in the state.
 
-    Searches `state['tasks']` for a task with matching `id`. Prints
-    messages for not-found, already completed, or successful update.
+    Looks the task up with `find_task`. Prints messages for not-found,
+    already completed, or successful update. Returns the applied change
+    entry, or None if nothing changed.
     """
-    tasks = state.get("tasks") or []
-    # Find task by id
-    target = None
-    for t in tasks:
-        if isinstance(t, dict) and t.get("id") == task_id:
-            target = t
-            break
+    target = find_task(state, task_id)
 
     if target is None:
         print(f"Task {task_id} not found.")
-        return
+        return None
 
     current_status = target.get("status")
     if current_status == "done":
         print(f"Task {task_id} is already completed.")
-        return
+        return None
 
-    target["status"] = "done"
+    change = {"op": "update_task", "id": task_id, "fields": {"status": "done"}}
+    apply_change(state, change)
     print(f"Marked task {task_id} as completed.")
+    return change
 
 
-def add_note(state: Dict) -> None:
+def add_note(state: Dict) -> Optional[Dict]:
     """Prompt for a note and append it to `state['notes']`.
 
-    Prompts for title, content, and optional comma-separated tags.
-    Uses `next_note_id` to assign a unique id.
+    Prompts for title, content, and optional comma-separated tags, then
+    adds the note with `create_note`, which uses `next_note_id` to assign
+    a unique id. Returns the applied change entry.
     """
     title = input("title: ").strip()
     content = input("content: ").strip()
     tags_raw = input("tags (comma-separated, optional): ").strip()
+    return create_note(state, title, content=content, tags=tags_raw)
 
-    if tags_raw == "":
-        tags_list = []
-    else:
-        tags_list = [t.strip() for t in tags_raw.split(",") if t.strip()]
 
+def create_note(state: Dict, title: str, content: str = "", tags: str = "") -> Dict:
+    """Add a note from already known fields, without prompting.
+
+    `tags` is comma-separated. Returns the applied change entry.
+    """
     note_id = next_note_id(state)
 
     new_note = {
         "id": note_id,
         "title": title,
         "content": content,
-        "tags": tags_list,
+        "tags": _split_tags(tags),
+        "created_at": timestamp(),
     }
 
-    state.setdefault("notes", []).append(new_note)
+    change = {"op": "add_note", "note": new_note}
+    apply_change(state, change)
     print(f"Added note {note_id}: {title}")
+    return change
 
 
 def list_notes(state: Dict) -> None:
@@ -159,16 +263,10 @@ def list_notes(state: Dict) -> None:
 def view_note(state: Dict, note_id: int) -> None:
     """View a note by id in the state.
 
-    Searches `state['notes']` for a note with matching `id`. If found,
-    prints a simple readable representation. Otherwise prints a not-found
-    message.
+    Looks the note up with `find_note`. If found, prints a simple
+    readable representation. Otherwise prints a not-found message.
     """
-    notes = state.get("notes") or []
-    target = None
-    for n in notes:
-        if isinstance(n, dict) and n.get("id") == note_id:
-            target = n
-            break
+    target = find_note(state, note_id)
 
     if target is None:
         print(f"Note {note_id} not found.")
@@ -185,77 +283,203 @@ def view_note(state: Dict, note_id: int) -> None:
     print(content)
 
 
-def ai_plan(state: Dict) -> None:
+def ai_plan(state: Dict, top_k: Optional[int] = None) -> None:
     """Generate and print an AI plan for open tasks without modifying state.
 
-    - Filters `state['tasks']` for tasks with `status == 'open'`.
+    - Selects tasks with `status == 'open'` via `filter_tasks`.
     - If none, prints a message and returns.
-    - Otherwise calls `generate_plan(open_tasks)` and prints the result.
+    - Otherwise streams `stream_plan(open_tasks)` to the screen as it
+      arrives, then reports the time to the first piece and in total.
+      Only the `top_k` best-ranked tasks are planned from (see
+      `final.ai_agent.generate_plan`).
     """
-    tasks = state.get("tasks") or []
-    open_tasks = [t for t in tasks if isinstance(t, dict) and t.get("status") == "open"]
+    open_tasks = filter_tasks(state, status="open")
 
     if not open_tasks:
         print("No open tasks to plan.")
         return
 
+    started = time.perf_counter()
+    first = None
     try:
-        plan_text = generate_plan(open_tasks)
+        from final.ai_agent import PLAN_TOP_K, stream_plan
+
+        limit = PLAN_TOP_K if top_k is None else top_k
+        if len(open_tasks) > limit:
+            print(f"Planning from the top {limit} of {len(open_tasks)} open tasks.")
+        for piece in stream_plan(open_tasks, top_k=limit):
+            if first is None:
+                first = time.perf_counter() - started
+                print("AI-generated plan:")
+            print(piece, end="", flush=True)
     except Exception as e:
+        if first is not None:
+            print()
         print(f"AI planning error: {e}")
         return
 
-    print("AI-generated plan:")
-    print(plan_text)
+    if first is None:
+        print("AI-generated plan:")
+        first = time.perf_counter() - started
+    print()
+    print(f"(first output after {first:.2f}s, total {time.perf_counter() - started:.2f}s)")
 
 
-def reset_state(state: Dict) -> None:
+def reset_state(state: Dict, confirmed: bool = False) -> Optional[Dict]:
     """Prompt the user to confirm and, if confirmed, clear tasks and notes.
 
     This function does not delete the entire state object, only resets the
-    `tasks` and `notes` lists to empty lists after user confirmation.
+    `tasks` and `notes` lists to empty lists after user confirmation
+    (skipped when `confirmed`). Returns the applied change entry, or None
+    if the reset was canceled.
     """
-    choice = input("Are you sure you want to delete ALL tasks and notes? (y/n): ").strip().lower()
+    if confirmed:
+        choice = "y"
+    else:
+        choice = input("Are you sure you want to delete ALL tasks and notes? (y/n): ").strip().lower()
     if choice != "y":
         print("State reset canceled.")
-        return
+        return None
 
-    state["tasks"] = []
-    state["notes"] = []
+    change = {"op": "reset"}
+    apply_change(state, change)
     print("State has been reset.")
+    return change
 
 
-def search_all(state: Dict, query: str) -> None:
+def search_all(state: Dict, query: str, top: Optional[int] = None) -> None:
     """Search tasks and notes for a query and print matches.
 
     - Matches in tasks: if query appears in title or description (case-insensitive).
     - Matches in notes: if query appears in title or content (case-insensitive).
     Prints simple lines for each match or "No matches found." if none.
+
+    With `top`, prints only the `top` best matches ranked by BM25 over
+    the words of the query, best first.
     """
-    q = (query or "").lower()
-    found = False
+    if top is not None:
+        hits = ranked_search(state, query, top)
+        for kind, record, score in hits:
+            rid = record.get("id", "?")
+            title = record.get("title") or ""
+            if kind == "task":
+                priority = record.get("priority", "?")
+                status = record.get("status", "?")
+                print(f"Task [{rid}] {title}  (priority: {priority}, status: {status}, score: {score:.2f})")
+            else:
+                print(f"Note [{rid}] {title}  (score: {score:.2f})")
+        if not hits:
+            print("No matches found.")
+        return
+
+    tasks, notes = search_records(state, query)
 
-    # Search tasks
-    tasks = state.get("tasks") or []
     for t in tasks:
-        title = (t.get("title") or "")
-        desc = (t.get("description") or "")
-        if q in title.lower() or q in desc.lower():
-            tid = t.get("id", "?")
-            priority = t.get("priority", "?")
-            status = t.get("status", "?")
-            print(f"Task [{tid}] {title}  (priority: {priority}, status: {status})")
-            found = True
-
-    # Search notes
-    notes = state.get("notes") or []
+        tid = t.get("id", "?")
+        title = t.get("title") or ""
+        priority = t.get("priority", "?")
+        status = t.get("status", "?")
+        print(f"Task [{tid}] {title}  (priority: {priority}, status: {status})")
+
     for n in notes:
-        title = (n.get("title") or "")
-        content = (n.get("content") or "")
-        if q in title.lower() or q in content.lower():
-            nid = n.get("id", "?")
-            print(f"Note [{nid}] {title}")
-            found = True
-
-    if not found:
+        nid = n.get("id", "?")
+        title = n.get("title") or ""
+        print(f"Note [{nid}] {title}")
+
+    if not tasks and not notes:
         print("No matches found.")
+
+
+def retitle(state: Dict, all_tasks: bool = False, concurrency: Optional[int] = None, rate: Optional[float] = None) -> List[Dict]:
+    """Ask the AI for new titles for many tasks at once.
+
+    By default only tasks with a description but no title, or with a
+    locally suggested one (``title_source == "local"``), are retitled;
+    with `all_tasks` every task that has a description is. Titles come
+    from the configured backend's refine backend (the remote one in
+    "hybrid" mode). Requests run concurrently (see `final.retitle`) and
+    progress is printed as they finish. Returns the applied change
+    entries so they can be saved together.
+    """
+    from final import ai_agent, retitle as batch
+
+    try:
+        backend = ai_agent.get_backend().refine_backend()
+        if not backend.offline:
+            ai_agent.ensure_api_key()
+    except (RuntimeError, ValueError) as e:
+        print(f"AI error: {e}")
+        return []
+
+    tasks = [
+        t for t in state.get("tasks") or []
+        if (t.get("description") or "").strip()
+        and (all_tasks or not (t.get("title") or "").strip() or t.get("title_source") == "local")
+    ]
+    if not tasks:
+        print("No tasks to retitle.")
+        return []
+
+    def progress(done: int, total: int, failed: int) -> None:
+        print(f"\rRetitled {done}/{total} ({failed} failed)", end="", flush=True)
+
+    titles = batch.retitle_tasks(
+        tasks,
+        summarize=backend.summarize,
+        concurrency=concurrency or batch.DEFAULT_CONCURRENCY,
+        rate=batch.DEFAULT_RATE if rate is None else rate,
+        progress=progress,
+    )
+    print()
+
+    source = "local" if backend.offline else backend.name
+    changes = []
+    for task_id in sorted(titles):
+        change = {"op": "update_task", "id": task_id, "fields": {"title": titles[task_id], "title_source": source}}
+        apply_change(state, change)
+        changes.append(change)
+    print(f"Updated {len(changes)} of {len(tasks)} task titles.")
+    return changes
+
+
+def import_records(
+    state: Dict,
+    path: str,
+    kind: str = "task",
+    fmt: Optional[str] = None,
+    commit: Optional[Callable[[List[Dict]], None]] = None,
+) -> int:
+    """Import tasks or notes from a CSV or JSONL file (see `final.importer`).
+
+    The applied change entries are passed to `commit` one chunk at a time,
+    so they can be written as the file is read. Prints how many records
+    were imported and the first invalid ones, or, if the file could not
+    be read to the end, the line it stopped after and what was imported
+    up to there. Returns the number imported.
+    """
+    from final import importer
+
+    try:
+        imported, errors, invalid = importer.import_file(state, path, kind=kind, fmt=fmt, commit=commit)
+    except importer.ImportInterrupted as e:
+        done = e.imported["task"] + e.imported["note"]
+        if not done:
+            print(f"Import failed: {e}")
+        else:
+            print(
+                f"Import failed after line {e.line}: {e}. The {e.imported['task']} tasks and "
+                f"{e.imported['note']} notes before it were imported; nothing after it was."
+            )
+        return done
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}")
+        return 0
+
+    print(f"Imported {imported['task']} tasks and {imported['note']} notes from {path}.")
+    if invalid:
+        print(f"Skipped {invalid} invalid records:")
+        for error in errors:
+            print(f"  {error}")
+        if invalid > len(errors):
+            print(f"  ... and {invalid - len(errors)} more")
+    return imported["task"] + imported["note"]
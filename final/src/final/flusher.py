@@ -0,0 +1,137 @@
+"""Persisting REPL changes either per command or debounced in the background.
+
+In "durable" mode every change is committed to the journal (and
+fsynced) before the next prompt. In "debounced" mode changes are queued
+and a background thread commits them once no new change has arrived for
+`DEBOUNCE_SECONDS`, so a burst of commands costs one write.
+In "batch" mode (used by ``final run`` / ``final --batch``) each change
+is appended to the journal as it is recorded, inside the command that
+made it, but the journal is only fsynced once, by `Flusher.close`.
+`Flusher.close` always writes whatever is pending.
+
+The background thread only touches the state while holding
+``state.lock``, which the REPL holds while a command runs.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from final import storage
+
+# "durable", "debounced" or "batch"; FINAL_FLUSH_MODE overrides the default.
+FLUSH_MODE = os.getenv("FINAL_FLUSH_MODE", "durable").lower()
+
+DEBOUNCE_SECONDS = 0.5
+
+
+class Flusher:
+    """Writes the change entries returned by commands to storage."""
+
+    def __init__(self, state: Dict[str, Any], mode: Optional[str] = None, delay: Optional[float] = None) -> None:
+        self.state = state
+        self.mode = (mode or FLUSH_MODE).lower()
+        if self.mode not in ("durable", "debounced", "batch"):
+            raise ValueError(f"Unknown flush mode: {self.mode!r}")
+        if storage.BACKEND == "sqlite" and self.mode == "debounced":
+            # Row writes are already small; keep the connection on one thread.
+            self.mode = "durable"
+        self.delay = DEBOUNCE_SECONDS if delay is None else delay
+        self.writes = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._last_change = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        if self.mode == "debounced":
+            self._thread = threading.Thread(target=self._run, name="final-flusher", daemon=True)
+            self._thread.start()
+
+    def record(self, change: Optional[Dict[str, Any]]) -> None:
+        """Persist `change` (already applied to the state). None is ignored."""
+        if not change:
+            return
+        if self.mode in ("durable", "batch"):
+            with self.state.lock:
+                storage.commit_changes(self.state, [change], fsync=self.mode == "durable")
+            self.writes += 1
+            return
+
+        with self._cond:
+            self._pending.append(change)
+            self._last_change = time.monotonic()
+            self._cond.notify()
+
+    def record_many(self, changes: Optional[List[Dict[str, Any]]]) -> None:
+        """Persist a batch of applied changes together (one journal write unless debounced)."""
+        if not changes:
+            return
+        if self.mode in ("durable", "batch"):
+            with self.state.lock:
+                storage.commit_changes(self.state, changes, fsync=self.mode == "durable")
+            self.writes += 1
+            return
+
+        with self._cond:
+            self._pending.extend(changes)
+            self._last_change = time.monotonic()
+            self._cond.notify()
+
+    def record_now(self, changes: List[Dict[str, Any]]) -> None:
+        """Write `changes` (with anything pending before them) right away, in every mode.
+
+        For bulk writes such as ``import``, whose changes should not pile
+        up in memory. The journal is not compacted here, so a long import
+        does not rewrite the snapshot over and over; in "batch" mode it is
+        only fsynced on close.
+        """
+        with self.state.lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            storage.commit_changes(self.state, batch + changes, fsync=self.mode != "batch", compact=False)
+            self.writes += 1
+
+    def sync(self) -> None:
+        """Pick up changes other processes wrote, keeping ours on top."""
+        with self.state.lock:
+            with self._cond:
+                pending = list(self._pending)
+            storage.sync(self.state, pending)
+
+    def flush(self) -> None:
+        """Commit everything that is pending now."""
+        with self.state.lock:
+            with self._cond:
+                batch, self._pending = self._pending, []
+            if batch:
+                storage.commit_changes(self.state, batch)
+                self.writes += 1
+
+    def close(self) -> None:
+        """Stop the background thread, flush pending changes and checkpoint."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        with self.state.lock:
+            self.flush()
+            if self.mode == "batch":
+                storage.fsync_journal()
+            storage.checkpoint(self.state)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Wait until no change has arrived for `delay` seconds.
+                while not self._closed:
+                    remaining = self._last_change + self.delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            # Lock order is always state.lock, then _cond.
+            self.flush()
@@ -0,0 +1,361 @@
+"""``final http``: a JSON API over HTTP for dashboards and scripts.
+
+Endpoints::
+
+    GET  /tasks?status=&priority=&tag=&due_before=&offset=&limit=
+    GET  /tasks/<id>
+    POST /tasks                 {"title", "description", "tags", "priority", "due_date"}
+    POST /tasks/<id>/complete
+    GET  /notes?offset=&limit=  (without note bodies)
+    GET  /notes/<id>
+    POST /notes                 {"title", "content", "tags"}
+    GET  /search?q=&top=&offset=&limit=
+
+Lists are paged (``{"items": [...], "total", "offset", "limit"}``,
+`PAGE_SIZE` items by default). The state is loaded once; every GET
+carries a weak ETag naming the saved data it was built from (the
+snapshot and journal position), so a client that sends it back in
+``If-None-Match`` gets an empty 304 until something changes, even
+across restarts. Bodies are cached per URL until then. Responses over
+`GZIP_MIN_BYTES` are gzipped for clients that accept it.
+
+Requests are handled one at a time on the event loop, so writes never
+interleave; slow clients only hold up their own connection. Changes
+made by other processes are picked up before each request.
+"""
+import argparse
+import asyncio
+import contextlib
+import gzip
+import io
+import json
+import os
+import signal
+import sys
+from collections import OrderedDict
+from datetime import datetime
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from final import commands, storage
+from final.importer import RecordError, validate_note, validate_task
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+GZIP_MIN_BYTES = 1024
+MAX_BODY_BYTES = 1024 * 1024
+# Encoded GET responses kept for reuse while the state version is unchanged.
+CACHE_ENTRIES = 256
+# Tags ETags of state that is not on disk (yet), so they never match
+# those of another process.
+EPOCH = os.urandom(4).hex()
+
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+class HTTPError(Exception):
+    """Turned into a JSON ``{"error": ...}`` response with `status`."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _int_param(query: Dict[str, List[str]], name: str, default: int, maximum: Optional[int] = None) -> int:
+    raw = query.get(name, [""])[-1]
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise HTTPError(400, f"{name} must be an integer")
+    if value < 0:
+        raise HTTPError(400, f"{name} must not be negative")
+    return min(value, maximum) if maximum is not None else value
+
+
+def _page(items: List[Any], query: Dict[str, List[str]]) -> Dict[str, Any]:
+    offset = _int_param(query, "offset", 0)
+    limit = _int_param(query, "limit", PAGE_SIZE, MAX_PAGE_SIZE)
+    return {"items": items[offset:offset + limit], "total": len(items), "offset": offset, "limit": limit}
+
+
+def _note_summary(note: Dict[str, Any]) -> Dict[str, Any]:
+    """The note's stored fields, without the body or its blob hash."""
+    return {k: v for k, v in dict.items(note) if k not in ("content", "content_hash")}
+
+
+def _record_id(raw: str) -> int:
+    try:
+        return int(raw)
+    except ValueError:
+        raise HTTPError(404, "Not found")
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against the current `etag`."""
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == current for tag in if_none_match.split(","))
+
+
+def _encode(payload: Any, gzip_ok: bool) -> Tuple[bytes, bool]:
+    """Return the JSON body, gzipped if the client accepts it and it is large enough."""
+    encoded = json.dumps(payload).encode("utf-8")
+    if gzip_ok and len(encoded) >= GZIP_MIN_BYTES:
+        return gzip.compress(encoded, compresslevel=5, mtime=0), True
+    return encoded, False
+
+
+def _quietly(func, *args, **kwargs):
+    # The command functions print REPL messages; the API returns records instead.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+class Api:
+    """Answers requests against one in-memory state, writing through `flusher`."""
+
+    def __init__(self, state: Dict[str, Any], flusher) -> None:
+        self.state = state
+        self.flusher = flusher
+        # (target, gzip accepted) -> (state version, body, gzipped)
+        self._cache: "OrderedDict[Tuple[str, bool], Tuple[int, bytes, bool]]" = OrderedDict()
+
+    def handle(self, method: str, target: str, headers: Dict[str, str], body: bytes = b"") -> Response:
+        """Return ``(status, headers, body)`` for one request; `headers` keys are lower-case."""
+        state = self.state
+        with state.lock:
+            self.flusher.sync()
+            try:
+                if method == "GET":
+                    return self._get(target, headers)
+                if method == "POST":
+                    return self._post(target, body)
+                raise HTTPError(405, f"Method {method} not allowed")
+            except HTTPError as e:
+                return self._json(e.status, {"error": str(e)}, headers)
+
+    def _etag(self) -> str:
+        """Name the saved data the state matches: snapshot signature and journal offset.
+
+        Unsaved changes, and the sqlite backend (whose data version only
+        means something to one connection), fall back to this process's
+        `EPOCH` and the in-memory version.
+        """
+        state = self.state
+        if state.dirty or state.data_version is not None:
+            return f'W/"{EPOCH}-{state.version}"'
+        mtime, size = state.snapshot_sig or (0, 0)
+        return f'W/"{mtime:x}-{size:x}-{state.journal_offset:x}"'
+
+    def _get(self, target: str, headers: Dict[str, str]) -> Response:
+        version = self.state.version
+        gzip_ok = "gzip" in headers.get("accept-encoding", "")
+        key = (target, gzip_ok)
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] == version:
+            self._cache.move_to_end(key)
+            encoded, gzipped = cached[1], cached[2]
+        else:
+            # Routed (and cached) before the ETag is checked, so unknown
+            # paths and bad parameters get their error rather than a 304.
+            encoded, gzipped = _encode(self._route_get(target), gzip_ok)
+            self._cache[key] = (version, encoded, gzipped)
+            if len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        etag = self._etag()
+        if _etag_matches(headers.get("if-none-match", ""), etag):
+            return 304, {"ETag": etag}, b""
+        return 200, self._headers(gzipped), encoded
+
+    def _route_get(self, target: str) -> Any:
+        url = urlsplit(target)
+        parts = [p for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+        state = self.state
+        if parts == ["tasks"]:
+            filters = {
+                name: query[name][-1].lower() if name in ("status", "priority") else query[name][-1]
+                for name in ("status", "priority", "tag", "due_before")
+                if query.get(name, [""])[-1]
+            }
+            tasks = storage.filter_tasks(state, **filters) if filters else list(state.get("tasks") or [])
+            return _page(tasks, query)
+        if len(parts) == 2 and parts[0] == "tasks":
+            task = storage.find_task(state, _record_id(parts[1]))
+            if task is None:
+                raise HTTPError(404, f"Task {parts[1]} not found")
+            return task
+        if parts == ["notes"]:
+            page = _page(state.get("notes") or [], query)
+            page["items"] = [_note_summary(n) for n in page["items"]]
+            return page
+        if len(parts) == 2 and parts[0] == "notes":
+            note = storage.find_note(state, _record_id(parts[1]))
+            if note is None:
+                raise HTTPError(404, f"Note {parts[1]} not found")
+            return {**_note_summary(note), "content": note.get("content") or ""}
+        if parts == ["search"]:
+            return self._search(query)
+        raise HTTPError(404, "Not found")
+
+    def _search(self, query: Dict[str, List[str]]) -> Dict[str, Any]:
+        text = query.get("q", [""])[-1].strip()
+        if not text:
+            raise HTTPError(400, "q is required")
+        top = _int_param(query, "top", 0, MAX_PAGE_SIZE)
+        if top:
+            items = [
+                {"kind": kind, "score": round(score, 4), **(record if kind == "task" else _note_summary(record))}
+                for kind, record, score in storage.ranked_search(self.state, text, top)
+            ]
+        else:
+            tasks, notes = storage.search_records(self.state, text)
+            items = [{"kind": "task", **t} for t in tasks] + [{"kind": "note", **_note_summary(n)} for n in notes]
+        return _page(items, query)
+
+    def _post(self, target: str, body: bytes) -> Response:
+        parts = [p for p in urlsplit(target).path.split("/") if p]
+        state = self.state
+        if len(parts) == 3 and parts[0] == "tasks" and parts[2] == "complete":
+            task_id = _record_id(parts[1])
+            if storage.find_task(state, task_id) is None:
+                raise HTTPError(404, f"Task {task_id} not found")
+            self.flusher.record(_quietly(commands.complete_task, state, task_id))
+            return self._json(200, storage.find_task(state, task_id))
+        if parts not in (["tasks"], ["notes"]):
+            raise HTTPError(404, "Not found")
+
+        try:
+            record = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body must be a JSON object")
+        if isinstance(record, dict):
+            # New records always get the next free id.
+            record.pop("id", None)
+        now = datetime.now().isoformat()
+        try:
+            # Stored as validated (including status and created_at), as `import` does.
+            if parts == ["tasks"]:
+                fields = validate_task(record, now)
+                change = {"op": "add_task", "task": {"id": storage.next_task_id(state), **fields}}
+            else:
+                fields = validate_note(record, now)
+                change = {"op": "add_note", "note": {"id": storage.next_note_id(state), **fields}}
+        except RecordError as e:
+            raise HTTPError(400, str(e))
+        storage.apply_change(state, change)
+        if parts == ["tasks"]:
+            created = change["task"]
+        else:
+            created = {**_note_summary(change["note"]), "content": fields["content"]}
+        self.flusher.record(change)
+        return self._json(201, created)
+
+    def _headers(self, gzipped: bool) -> Dict[str, str]:
+        headers = {"ETag": self._etag(), "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+        return headers
+
+    def _json(self, status: int, payload: Any, request_headers: Optional[Dict[str, str]] = None) -> Response:
+        encoded, gzipped = _encode(payload, "gzip" in (request_headers or {}).get("accept-encoding", ""))
+        return status, self._headers(gzipped), encoded
+
+
+def _response(status: int, headers: Dict[str, str], body: bytes, keep_alive: bool) -> bytes:
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    if status != 304:
+        lines.append("Content-Type: application/json; charset=utf-8")
+        lines.append(f"Content-Length: {len(body)}")
+    lines.extend(f"{k}: {v}" for k, v in headers.items())
+    lines.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body if status != 304 else b"")
+
+
+def _error(status: int, message: str) -> bytes:
+    return _response(status, {}, json.dumps({"error": message}).encode("utf-8"), keep_alive=False)
+
+
+async def _handle_connection(api: Api, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            except asyncio.LimitOverrunError:
+                writer.write(_error(431, "Request headers too large"))
+                break
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ")
+            except ValueError:
+                writer.write(_error(400, "Malformed request line"))
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, sep, value = line.partition(":")
+                if sep:
+                    headers[name.strip().lower()] = value.strip()
+            try:
+                length = int(headers.get("content-length") or 0)
+            except ValueError:
+                writer.write(_error(400, "Bad Content-Length"))
+                break
+            if length > MAX_BODY_BYTES:
+                writer.write(_error(413, "Request body too large"))
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            status, response_headers, payload = api.handle(method, target, headers, body)
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+            writer.write(_response(status, response_headers, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _serve(api: Api, host: str, port: int) -> None:
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_connection(api, reader, writer), host, port, limit=64 * 1024
+    )
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    bound = server.sockets[0].getsockname()
+    print(f"Serving http://{bound[0]}:{bound[1]}/ (Ctrl-C to stop)", file=sys.stderr)
+    async with server:
+        await stop.wait()
+
+
+def main(args: List[str]) -> int:
+    """Entry point for ``final http [--host H] [--port N]``; returns the exit status."""
+    from final.flusher import Flusher
+
+    parser = argparse.ArgumentParser(prog="final http", description="Serve the store as a JSON API.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    options = parser.parse_args(args)
+
+    state = storage.load_state()
+    flusher = Flusher(state)
+    try:
+        asyncio.run(_serve(Api(state, flusher), options.host, options.port))
+    except OSError as e:
+        print(f"Cannot serve on {options.host}:{options.port}: {e}", file=sys.stderr)
+        return 1
+    finally:
+        flusher.close()
+    return 0
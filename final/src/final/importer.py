@@ -0,0 +1,247 @@
+"""Bulk import of tasks and notes from CSV or JSONL files.
+
+The file is read as a stream, `CHUNK_SIZE` records at a time. Each
+record is checked against the fields of `final.models.Task` / `Note`,
+gets a fresh id counting up from the state's high-water mark and is
+applied with `apply_change`, which keeps the indexes up to date. Each
+chunk's change entries are handed to a `commit` callback (which writes
+them to the journal) and then dropped, and note bodies go to the blob
+store chunk by chunk, so nothing but the records themselves grows with
+the file.
+
+Chunks already committed stay committed if the file turns out to be
+unreadable further on (bad UTF-8, a malformed CSV row); the import
+then stops with `ImportInterrupted`, which says how far it got.
+"""
+import csv
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from final.models import Note, Task
+from final.storage import LazyNote, apply_change, next_note_id, next_task_id
+
+CHUNK_SIZE = 1000
+
+# Invalid records reported by line; the rest are only counted.
+MAX_REPORTED_ERRORS = 10
+
+# Bookkeeping fields (set by final itself) cannot be imported.
+TASK_FIELDS = frozenset(Task.FIELDS) - {"title_source"}
+NOTE_FIELDS = frozenset(Note.FIELDS) - {"content_hash"}
+STATUSES = ("open", "done")
+PRIORITIES = ("low", "medium", "high")
+
+
+class RecordError(ValueError):
+    """A record that does not fit the model; the message says why."""
+
+
+class ImportInterrupted(Exception):
+    """Reading the file failed partway through.
+
+    Every valid record up to `line` was imported and committed; nothing
+    after it was. `imported` counts them like `import_file`'s result.
+    """
+
+    def __init__(self, error: Exception, line: int, imported: Dict[str, int]) -> None:
+        super().__init__(str(error))
+        self.error = error
+        self.line = line
+        self.imported = imported
+
+
+def detect_format(path: str) -> str:
+    """Return "csv" or "jsonl" from the file extension."""
+    lowered = path.lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    raise ValueError(f"Cannot tell the format of {path!r}; use --format csv|jsonl")
+
+
+def iter_records(path: str, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(line number, record)`` from the file without reading it whole.
+
+    The file is decoded line by line, so a decoding error is raised at
+    the line it is on. A JSONL line that is not valid UTF-8 or JSON is
+    yielded as a `RecordError`.
+    """
+    with open(path, "rb") as fh:
+        if fmt == "csv":
+            reader = csv.DictReader(line.decode("utf-8") for line in fh)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for number, raw in enumerate(fh, 1):
+            try:
+                line = raw.decode("utf-8")
+            except UnicodeDecodeError as e:
+                yield number, RecordError(f"invalid UTF-8: {e}")
+                continue
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError as e:
+                yield number, RecordError(f"invalid JSON: {e}")
+
+
+def _tags(value: Any) -> List[str]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [t.strip() for t in value.split(",") if t.strip()]
+    if isinstance(value, list) and all(isinstance(t, str) for t in value):
+        return [t.strip() for t in value if t.strip()]
+    raise RecordError("tags must be a list of strings or a comma-separated string")
+
+
+def _text(record: Dict[str, Any], key: str) -> str:
+    value = record.get(key)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise RecordError(f"{key} must be a string")
+    return value.strip()
+
+
+def _check_fields(record: Any, allowed: frozenset) -> Dict[str, Any]:
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise RecordError("record must be an object")
+    # CSV rows with too many cells put the extras under the None key.
+    unknown = sorted(str(k) for k in record if k not in allowed and k != "kind")
+    if unknown:
+        raise RecordError(f"unknown field(s): {', '.join(unknown)}")
+    return record
+
+
+def validate_task(record: Any, created_at: str) -> Dict[str, Any]:
+    """Return a task dict (without ``id``) built from `record`, or raise `RecordError`."""
+    record = _check_fields(record, TASK_FIELDS)
+    title = _text(record, "title")
+    description = _text(record, "description")
+    if not title and not description:
+        raise RecordError("a task needs a title or a description")
+    status = _text(record, "status").lower() or "open"
+    if status not in STATUSES:
+        raise RecordError(f"status must be one of {', '.join(STATUSES)}")
+    priority = _text(record, "priority").lower() or "medium"
+    if priority not in PRIORITIES:
+        raise RecordError(f"priority must be one of {', '.join(PRIORITIES)}")
+    due_date = _text(record, "due_date") or None
+    if due_date is not None:
+        try:
+            date.fromisoformat(due_date)
+        except ValueError:
+            raise RecordError(f"due_date is not YYYY-MM-DD: {due_date!r}")
+    task = {
+        "title": title,
+        "description": description,
+        "tags": _tags(record.get("tags")),
+        "status": status,
+        "priority": priority,
+        "due_date": due_date,
+        "created_at": _text(record, "created_at") or created_at,
+    }
+    if not title:
+        from final.ai_backends import extractive_title
+
+        # Refined later by `retitle`, like add-task's local suggestions.
+        task["title"] = extractive_title(description)
+        task["title_source"] = "local"
+    return task
+
+
+def validate_note(record: Any, created_at: str) -> Dict[str, Any]:
+    """Return a note dict (without ``id``) built from `record`, or raise `RecordError`."""
+    record = _check_fields(record, NOTE_FIELDS)
+    title = _text(record, "title")
+    if not title:
+        raise RecordError("a note needs a title")
+    return {
+        "title": title,
+        "content": _text(record, "content"),
+        "tags": _tags(record.get("tags")),
+        "created_at": _text(record, "created_at") or created_at,
+    }
+
+
+def import_file(
+    state: Dict[str, Any],
+    path: str,
+    kind: str = "task",
+    fmt: Optional[str] = None,
+    chunk_size: int = CHUNK_SIZE,
+    commit: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+) -> Tuple[Dict[str, int], List[str], int]:
+    """Import the records in `path` into `state`.
+
+    `kind` ("task" or "note") is the default for records without a
+    ``kind`` field. Ids in the file are ignored; new ones are assigned.
+    The applied change entries are passed to `commit` a chunk at a time.
+    Returns ``({"task": imported tasks, "note": imported notes},
+    reported errors, number of invalid records)``. Raises
+    `ImportInterrupted` if the file cannot be read to the end, after
+    committing the records read before that point.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Unknown format: {fmt!r} (use csv or jsonl)")
+    created_at = datetime.now().isoformat()
+    imported = {"task": 0, "note": 0}
+    errors: List[str] = []
+    invalid = 0
+    chunk: List[Tuple[str, Dict[str, Any]]] = []
+
+    def apply_chunk() -> None:
+        task_id = next_task_id(state)
+        note_id = next_note_id(state)
+        changes = []
+        for record_kind, record in chunk:
+            if record_kind == "task":
+                change = {"op": "add_task", "task": {"id": task_id, **record}}
+                task_id += 1
+            else:
+                note = LazyNote({"id": note_id, **record})
+                note_id += 1
+                # Move the body out of memory now rather than at commit time.
+                note.externalize()
+                change = {"op": "add_note", "note": note}
+            apply_change(state, change)
+            changes.append(change)
+            imported[record_kind] += 1
+        chunk.clear()
+        if commit is not None and changes:
+            commit(changes)
+
+    records = iter_records(path, fmt)
+    number = 0
+    while True:
+        try:
+            number, record = next(records)
+        except StopIteration:
+            break
+        except (OSError, ValueError, csv.Error) as e:
+            apply_chunk()
+            raise ImportInterrupted(e, number, imported) from e
+        try:
+            record_kind = (record.get("kind") or kind) if isinstance(record, dict) else kind
+            if record_kind == "task":
+                chunk.append(("task", validate_task(record, created_at)))
+            elif record_kind == "note":
+                chunk.append(("note", validate_note(record, created_at)))
+            else:
+                raise RecordError(f"unknown kind: {record_kind!r}")
+        except RecordError as e:
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(f"line {number}: {e}")
+            continue
+        if len(chunk) >= chunk_size:
+            apply_chunk()
+    apply_chunk()
+    return imported, errors, invalid
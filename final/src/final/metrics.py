@@ -0,0 +1,183 @@
+"""Lightweight timers and counters for finding out where time goes.
+
+Storage, commands and AI calls are wrapped in named timers
+(``storage.load_state``, ``command.search``, ``ai.call_chat``, ...) and
+file I/O is counted in bytes (``bytes_read`` / ``bytes_written``). The
+``stats`` command prints call counts and p50/p95/p99 latencies from the
+last `MAX_SAMPLES` calls of each timer, plus the counters.
+
+Collection is on unless ``FINAL_STATS=0``; when off, every hook is a
+single flag check. ``FINAL_TRACE=path`` additionally appends one JSON
+line per timed call or count to `path` for offline analysis::
+
+    {"t": 1760000000.123, "span": "storage.commit", "ms": 1.84}
+    {"t": 1760000000.124, "counter": "bytes_written", "n": 412}
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+ENABLED = os.getenv("FINAL_STATS", "1") != "0"
+TRACE_FILE: Optional[str] = os.getenv("FINAL_TRACE") or None
+# Latency samples kept per timer; older ones are dropped.
+MAX_SAMPLES = 10_000
+
+_lock = threading.Lock()
+_samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=MAX_SAMPLES))
+_calls: Dict[str, int] = defaultdict(int)
+_totals: Dict[str, float] = defaultdict(float)
+_counters: Dict[str, int] = defaultdict(int)
+_trace = None
+
+
+def _write_trace(event: Dict[str, Any]) -> None:
+    # Caller holds _lock.
+    global _trace
+    if _trace is None:
+        _trace = open(TRACE_FILE, "a", encoding="utf-8", buffering=1)
+    _trace.write(json.dumps(event) + "\n")
+
+
+def record(name: str, seconds: float) -> None:
+    """Add one call of `seconds` to the timer `name`."""
+    if not ENABLED:
+        return
+    with _lock:
+        _samples[name].append(seconds)
+        _calls[name] += 1
+        _totals[name] += seconds
+        if TRACE_FILE:
+            _write_trace({"t": round(time.time(), 6), "span": name, "ms": round(seconds * 1000, 4)})
+
+
+def count(name: str, n: int = 1) -> None:
+    """Add `n` to the counter `name`."""
+    if not ENABLED or not n:
+        return
+    with _lock:
+        _counters[name] += n
+        if TRACE_FILE:
+            _write_trace({"t": round(time.time(), 6), "counter": name, "n": n})
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        record(self.name, time.perf_counter() - self.start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name: str):
+    """Context manager that times its block under `name`."""
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+def timed(name: str) -> Callable:
+    """Decorator that times every call of the function under `name`."""
+
+    def decorate(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not ENABLED:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorate
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile (`q` in 0..100) of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(len(sorted_values) * q / 100))
+    return sorted_values[min(len(sorted_values), rank) - 1]
+
+
+def snapshot() -> Dict[str, Any]:
+    """Return ``{"timers": {name: {calls, total_ms, p50, p95, p99, max}}, "counters": {...}}`` (ms)."""
+    with _lock:
+        samples = {name: sorted(values) for name, values in _samples.items()}
+        calls = dict(_calls)
+        totals = dict(_totals)
+        counters = dict(_counters)
+    timers = {}
+    for name, values in samples.items():
+        timers[name] = {
+            "calls": calls[name],
+            "total_ms": totals[name] * 1000,
+            "p50": percentile(values, 50) * 1000,
+            "p95": percentile(values, 95) * 1000,
+            "p99": percentile(values, 99) * 1000,
+            "max": values[-1] * 1000 if values else 0.0,
+        }
+    return {"timers": timers, "counters": counters}
+
+
+def _bytes(n: int) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GiB"
+
+
+def format_stats() -> str:
+    """Render `snapshot` as the table printed by the ``stats`` command."""
+    if not ENABLED:
+        return "Instrumentation is off (FINAL_STATS=0)."
+    snap = snapshot()
+    if not snap["timers"] and not snap["counters"]:
+        return "No measurements yet."
+    lines = [f"{'timer':<24} {'calls':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'total ms':>10}"]
+    for name in sorted(snap["timers"]):
+        t = snap["timers"][name]
+        lines.append(
+            f"{name:<24} {t['calls']:>7} {t['p50']:>9.3f} {t['p95']:>9.3f} {t['p99']:>9.3f} "
+            f"{t['max']:>9.3f} {t['total_ms']:>10.1f}"
+        )
+    counters = snap["counters"]
+    lines.append(f"I/O: {_bytes(counters.get('bytes_read', 0))} read, {_bytes(counters.get('bytes_written', 0))} written")
+    others = [f"{name} {value}" for name, value in sorted(counters.items()) if not name.startswith("bytes_")]
+    if others:
+        lines.append("Counters: " + ", ".join(others))
+    return "\n".join(lines)
+
+
+def reset() -> None:
+    """Forget all measurements (the trace file is kept)."""
+    with _lock:
+        _samples.clear()
+        _calls.clear()
+        _totals.clear()
+        _counters.clear()
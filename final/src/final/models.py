@@ -1,24 +1,79 @@
-from dataclasses import dataclass
-from typing import List, Optional
+"""In-memory task and note records.
+
+`Task` and `Note` are plain dicts underneath, not slotted records: each
+field read is an ordinary dict lookup, and code that handles dicts
+works on them unchanged (including ``json.dumps``). What they add is
+string interning. The values that repeat across records (tags, status,
+priority, due date) are interned whenever a record is built or changed,
+so a large store holds one copy of each string instead of one per
+record. That interning is the whole memory saving. The empty
+``__slots__`` only keeps the subclass from adding an instance
+``__dict__``.
+
+Records are converted from dicts where the state is loaded or changed
+(`final.storage.State`, `apply_change`); they are written out as the
+plain JSON objects they are.
+"""
+import sys
 from datetime import datetime
+from typing import Any, FrozenSet, Optional, Tuple
+
+
+def timestamp() -> str:
+    """Return the current time as the ISO string stored in ``created_at``."""
+    return datetime.now().isoformat()
+
+
+def intern_value(value: Any) -> Any:
+    """Return `value` with its string (or list of strings) interned."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, list):
+        return [sys.intern(v) if isinstance(v, str) else v for v in value]
+    return value
+
+
+class Record(dict):
+    """Base of `Task` and `Note`: a dict that interns the strings in `INTERNED` fields."""
+
+    __slots__ = ()
+
+    # Known field names, in the order they are written out.
+    FIELDS: Tuple[str, ...] = ()
+    # Fields whose strings (or list of strings) are interned.
+    INTERNED: FrozenSet[str] = frozenset()
+
+    def __init__(self, data: Optional[Any] = None, **kwargs: Any) -> None:
+        super().__init__(data or (), **kwargs)
+        self._intern_fields()
+
+    def _intern_fields(self) -> None:
+        for key in self.INTERNED.intersection(self.keys()):
+            dict.__setitem__(self, key, intern_value(dict.__getitem__(self, key)))
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        dict.__setitem__(self, key, intern_value(value) if key in self.INTERNED else value)
+
+    def update(self, *args: Any, **kwargs: Any) -> None:
+        dict.update(self, *args, **kwargs)
+        self._intern_fields()
+
+    def to_dict(self) -> dict:
+        """Return the record as a plain dict."""
+        return dict(self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict.__repr__(self)})"
+
+
+class Task(Record):
+    FIELDS = ("id", "title", "description", "tags", "status", "priority", "due_date", "created_at", "title_source")
+    INTERNED = frozenset(("tags", "status", "priority", "due_date", "title_source"))
+    __slots__ = ()
 
 
-@dataclass
-class Task:
-    id: int
-    title: str
-    description: str
-    tags: List[str]
-    status: str  # "open" or "done"
-    priority: str  # "low", "medium", or "high"
-    due_date: Optional[str]  # store as ISO string
-    created_at: str = datetime.now().isoformat()
-
-
-@dataclass
-class Note:
-    id: int
-    title: str
-    content: str
-    tags: List[str]
-    created_at: str = datetime.now().isoformat()
+class Note(Record):
+    # ``content_hash`` replaces ``content`` once the body is in the blob store.
+    FIELDS = ("id", "title", "content", "tags", "created_at", "content_hash")
+    INTERNED = frozenset(("tags",))
+    __slots__ = ()
@@ -0,0 +1,113 @@
+"""Generating titles for many tasks at once.
+
+`retitle_tasks` runs `summarize_description` for a batch of tasks on a
+pool of worker threads. A `TokenBucket` caps how many requests start per
+second, failed requests are retried with exponential backoff, and a
+progress callback is called as results arrive. Nothing is written here:
+the caller turns the returned titles into change entries and saves them
+once.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CONCURRENCY = 8
+
+# Requests started per second; 0 disables the limit.
+DEFAULT_RATE = 5.0
+
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 0.5
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _summarize_with_retry(
+    summarize: Callable[[str], str],
+    description: str,
+    bucket: TokenBucket,
+    retries: int,
+    backoff: float,
+) -> str:
+    attempt = 0
+    while True:
+        bucket.acquire()
+        try:
+            return summarize(description)
+        except Exception:
+            if attempt >= retries:
+                raise
+            time.sleep(backoff * 2 ** attempt)
+            attempt += 1
+
+
+def retitle_tasks(
+    tasks: List[Dict],
+    summarize: Optional[Callable[[str], str]] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rate: float = DEFAULT_RATE,
+    retries: int = MAX_RETRIES,
+    backoff: float = BACKOFF_SECONDS,
+    progress: Optional[Callable[[int, int, int], None]] = None,
+) -> Dict[int, str]:
+    """Return ``{task id: suggested title}`` for `tasks`, summarizing concurrently.
+
+    Tasks whose summary still fails after `retries` retries (or comes back
+    empty) are left out. `progress(done, total, failed)` is called after
+    each task. On Ctrl-C the queued requests are cancelled and the titles
+    received so far are returned.
+    """
+    if summarize is None:
+        from final.ai_agent import summarize_description as summarize
+
+    bucket = TokenBucket(rate)
+    titles: Dict[int, str] = {}
+    done = failed = 0
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="final-retitle")
+    try:
+        futures = {
+            pool.submit(_summarize_with_retry, summarize, t.get("description") or "", bucket, retries, backoff): t["id"]
+            for t in tasks
+        }
+        for future in as_completed(futures):
+            done += 1
+            try:
+                title = future.result()
+            except Exception:
+                title = ""
+            if title:
+                titles[futures[future]] = title
+            else:
+                failed += 1
+            if progress is not None:
+                progress(done, len(futures), failed)
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        return titles
+    pool.shutdown()
+    return titles
@@ -0,0 +1,433 @@
+"""In-memory inverted indexes used by `search_all`.
+
+Each `TokenIndex` maps a lowercase word token to a posting list of
+record ids (with the term frequency for each id). Each `TrigramIndex`
+maps every three-character substring to the ids containing it, which
+narrows substring searches to a few candidates that are then checked
+with the same `in` test `search_all` always used. Tasks are indexed on
+title + description and notes on title + content.
+
+Neither index keeps a per-record copy of what it indexed; records are
+unindexed by passing their old text. Saved indexes store each posting
+list as a packed string (`pack_ids`) that stays packed in memory after
+loading and is only decoded the first time a query or change touches
+that token or trigram. The note indexes may stay unloaded until notes
+are first searched (`SearchIndex.load_notes`), so note bodies are not
+read just to start up.
+"""
+import base64
+import heapq
+import math
+import re
+import sys
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r"\w+")
+
+# BM25 parameters.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TASK_FIELDS = ("title", "description")
+NOTE_FIELDS = ("title", "content")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split `text` into lowercase word tokens."""
+    return TOKEN_RE.findall((text or "").lower())
+
+
+def record_text(record: Dict[str, Any], fields: Iterable[str]) -> str:
+    """Join the given text fields of `record` into one string."""
+    return "\n".join(str(record.get(f) or "") for f in fields)
+
+
+def pack_ids(values: Iterable[int]) -> str:
+    """Pack 32-bit ints into a compact ASCII string (little-endian, base64)."""
+    packed = array("i", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+
+def unpack_ids(data: str) -> array:
+    """Inverse of `pack_ids`."""
+    values = array("i")
+    values.frombytes(base64.b64decode(data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class TokenIndex:
+    """Token -> {record id: term frequency} posting lists for one record kind.
+
+    Only the postings and each record's length are kept, not a copy of
+    every record's tokens: to remove or replace a record, pass the text
+    it was indexed with and it is tokenized again. A posting may still be
+    packed (see `from_dict`); `_posting` decodes it on first use.
+    """
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Any] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def _posting(self, tok: str) -> Optional[Dict[int, int]]:
+        posting = self.postings.get(tok)
+        if isinstance(posting, str):
+            values = unpack_ids(posting)
+            posting = self.postings[tok] = dict(zip(values[::2], values[1::2]))
+        return posting
+
+    def add(self, record_id: int, text: str) -> None:
+        """Index `text` under `record_id`, which must not be indexed yet (see `remove`)."""
+        counts: Dict[str, int] = {}
+        for tok in tokenize(text):
+            counts[tok] = counts.get(tok, 0) + 1
+        length = sum(counts.values())
+        self.total_length += length - self.doc_lengths.get(record_id, 0)
+        self.doc_lengths[record_id] = length
+        for tok, tf in counts.items():
+            posting = self._posting(tok)
+            if posting is None:
+                self.postings[tok] = {record_id: tf}
+            else:
+                posting[record_id] = tf
+
+    def remove(self, record_id: int, text: str) -> None:
+        """Drop `record_id`, indexed with `text`, from every posting list."""
+        if record_id not in self.doc_lengths:
+            return
+        self.total_length -= self.doc_lengths.pop(record_id)
+        for tok in set(tokenize(text)):
+            posting = self._posting(tok)
+            if posting is None:
+                continue
+            posting.pop(record_id, None)
+            if not posting:
+                del self.postings[tok]
+
+    def clear(self) -> None:
+        self.postings.clear()
+        self.doc_lengths.clear()
+        self.total_length = 0
+
+    def bm25_scores(self, query: str) -> Dict[int, float]:
+        """Return BM25 scores for every record containing any query token."""
+        n = len(self.doc_lengths)
+        if n == 0:
+            return {}
+        avg_len = self.total_length / n or 1.0
+        scores: Dict[int, float] = {}
+        for tok in set(tokenize(query)):
+            posting = self._posting(tok)
+            if not posting:
+                continue
+            df = len(posting)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for rid, tf in posting.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[rid] / avg_len)
+                scores[rid] = scores.get(rid, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str) -> Set[int]:
+        """Return ids of records that contain every token in `query`.
+
+        Posting lists are intersected smallest first. A query without
+        any word tokens matches nothing.
+        """
+        tokens = set(tokenize(query))
+        if not tokens:
+            return set()
+        postings = sorted((self._posting(t) or {} for t in tokens), key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result.intersection_update(posting)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the packed posting lists and record lengths, JSON-serializable.
+
+        Each posting is ``pack_ids`` of (id, tf) pairs; postings never
+        decoded since loading are written back as they are.
+        """
+        return {
+            "postings": {
+                tok: posting if isinstance(posting, str) else pack_ids(_flatten(posting.items()))
+                for tok, posting in self.postings.items()
+            },
+            "lengths": pack_ids(_flatten(self.doc_lengths.items())),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TokenIndex":
+        """Restore from `to_dict` output; postings stay packed until used."""
+        index = cls()
+        index.postings = dict(data.get("postings") or {})
+        lengths = unpack_ids(data.get("lengths") or "")
+        index.doc_lengths = dict(zip(lengths[::2], lengths[1::2]))
+        index.total_length = sum(lengths[1::2])
+        return index
+
+
+def _flatten(pairs: Iterable[Tuple[int, int]]) -> Iterator[int]:
+    for a, b in pairs:
+        yield a
+        yield b
+
+
+def trigrams(text: str) -> Set[str]:
+    """Return the set of three-character substrings of lowercased `text`."""
+    t = (text or "").lower()
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+def matches(record: Dict[str, Any], query: str, fields: Iterable[str]) -> bool:
+    """Return True if lowercased `query` occurs in any of the given fields."""
+    q = (query or "").lower()
+    return any(q in (record.get(f) or "").lower() for f in fields)
+
+
+class TrigramIndex:
+    """Trigram -> set of record ids for one record kind.
+
+    Like `TokenIndex` it keeps no per-record trigram sets: `remove` is
+    given the record's texts and recomputes them.
+    """
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Any] = {}
+        self.ids: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _posting(self, gram: str) -> Optional[Set[int]]:
+        posting = self.postings.get(gram)
+        if isinstance(posting, str):
+            posting = self.postings[gram] = set(unpack_ids(posting))
+        return posting
+
+    @staticmethod
+    def _grams(texts: Iterable[str]) -> Set[str]:
+        # Fields are indexed separately so no trigram spans two fields.
+        grams: Set[str] = set()
+        for text in texts:
+            grams |= trigrams(text)
+        return grams
+
+    def add(self, record_id: int, texts: Iterable[str]) -> None:
+        """Index each of `texts` under `record_id`, which must not be indexed yet."""
+        self.ids.add(record_id)
+        for g in self._grams(texts):
+            posting = self._posting(g)
+            if posting is None:
+                self.postings[g] = {record_id}
+            else:
+                posting.add(record_id)
+
+    def remove(self, record_id: int, texts: Iterable[str]) -> None:
+        """Drop `record_id`, indexed with `texts`, from every posting."""
+        if record_id not in self.ids:
+            return
+        self.ids.discard(record_id)
+        for g in self._grams(texts):
+            posting = self._posting(g)
+            if posting is None:
+                continue
+            posting.discard(record_id)
+            if not posting:
+                del self.postings[g]
+
+    def clear(self) -> None:
+        self.postings.clear()
+        self.ids.clear()
+
+    def candidates(self, query: str) -> Set[int]:
+        """Return ids that may contain `query` as a substring.
+
+        Every id containing the query is included; callers verify the
+        candidates with `matches`. Queries shorter than three characters
+        cannot be narrowed and return every id.
+        """
+        grams = trigrams(query)
+        if len((query or "").lower()) < 3 or not grams:
+            return set(self.ids)
+        postings = sorted((self._posting(g) or set() for g in grams), key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ids": pack_ids(sorted(self.ids)),
+            "postings": {
+                g: posting if isinstance(posting, str) else pack_ids(sorted(posting))
+                for g, posting in self.postings.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TrigramIndex":
+        """Restore from `to_dict` output; postings stay packed until used."""
+        index = cls()
+        index.ids = set(unpack_ids(data.get("ids") or ""))
+        index.postings = dict(data.get("postings") or {})
+        return index
+
+
+class SearchIndex:
+    """Token indexes over tasks and notes, kept in step with the state.
+
+    The note indexes can be left unloaded (``notes`` is None) so that a
+    state that never searches notes does not hold their postings or read
+    their bodies. Note changes made meanwhile are remembered by id and
+    folded in by `load_notes`.
+    """
+
+    def __init__(self, notes: bool = True) -> None:
+        self.tasks = TokenIndex()
+        self.task_grams = TrigramIndex()
+        self.notes: Optional[TokenIndex] = TokenIndex() if notes else None
+        self.note_grams: Optional[TrigramIndex] = TrigramIndex() if notes else None
+        # Ids of notes added or removed while the note indexes were unloaded,
+        # and whether they were cleared, so saved ones can no longer be used.
+        self.pending_notes: Set[int] = set()
+        self.notes_reset = False
+
+    @classmethod
+    def build(cls, state: Dict[str, Any], notes: bool = True) -> "SearchIndex":
+        """Index the tasks of `state`, and its notes unless `notes` is False."""
+        index = cls(notes=notes)
+        for t in state.get("tasks") or []:
+            index.add_task(t)
+        if notes:
+            for n in state.get("notes") or []:
+                index.add_note(n)
+        return index
+
+    @property
+    def notes_loaded(self) -> bool:
+        return self.notes is not None
+
+    def load_notes(self, notes: Iterable[Dict[str, Any]], data: Optional[Dict[str, Any]] = None) -> bool:
+        """Load the note indexes for `notes`, the current note records.
+
+        `data` is `notes_to_dict` output saved earlier. It is used, with
+        the notes changed since folded in, unless one of its notes was
+        replaced or the notes were reset; otherwise the indexes are built
+        from `notes`. Returns True if `data` was used unchanged.
+        """
+        by_id = {n.get("id"): n for n in notes}
+        unchanged = False
+        if data is not None and not self.notes_reset:
+            grams = TrigramIndex.from_dict(data.get("note_grams") or {})
+            if grams.ids <= by_id.keys() and not grams.ids & self.pending_notes:
+                self.notes = TokenIndex.from_dict(data.get("notes") or {})
+                self.note_grams = grams
+                unchanged = not self.pending_notes
+                for nid in sorted(self.pending_notes):
+                    if nid in by_id:
+                        self.add_note(by_id[nid])
+        if not self.notes_loaded:
+            self.notes = TokenIndex()
+            self.note_grams = TrigramIndex()
+            for n in by_id.values():
+                self.add_note(n)
+        self.pending_notes.clear()
+        self.notes_reset = False
+        return unchanged
+
+    def unload_notes(self) -> None:
+        """Drop the note indexes; `load_notes` brings them back."""
+        self.notes = None
+        self.note_grams = None
+        self.pending_notes.clear()
+        self.notes_reset = False
+
+    def add_task(self, task: Dict[str, Any]) -> None:
+        tid = task.get("id")
+        self.tasks.add(tid, record_text(task, TASK_FIELDS))
+        self.task_grams.add(tid, (str(task.get(f) or "") for f in TASK_FIELDS))
+
+    def remove_task(self, task: Dict[str, Any]) -> None:
+        """Unindex `task`; call before its text fields change."""
+        tid = task.get("id")
+        self.tasks.remove(tid, record_text(task, TASK_FIELDS))
+        self.task_grams.remove(tid, (str(task.get(f) or "") for f in TASK_FIELDS))
+
+    def add_note(self, note: Dict[str, Any]) -> None:
+        nid = note.get("id")
+        if self.notes is None or self.note_grams is None:
+            self.pending_notes.add(nid)
+            return
+        self.notes.add(nid, record_text(note, NOTE_FIELDS))
+        self.note_grams.add(nid, (str(note.get(f) or "") for f in NOTE_FIELDS))
+
+    def remove_note(self, note: Dict[str, Any]) -> None:
+        nid = note.get("id")
+        if self.notes is None or self.note_grams is None:
+            self.pending_notes.add(nid)
+            return
+        self.notes.remove(nid, record_text(note, NOTE_FIELDS))
+        self.note_grams.remove(nid, (str(note.get(f) or "") for f in NOTE_FIELDS))
+
+    def top_k(self, query: str, k: int) -> List[Tuple[float, str, int]]:
+        """Return up to `k` best (score, kind, id) BM25 hits, best first.
+
+        `kind` is "task" or "note"; notes are only ranked if loaded. Only
+        a heap of size `k` is kept, so large result sets are never sorted
+        or materialized in full.
+        """
+        if k <= 0:
+            return []
+        heap: List[Tuple[float, int, str, int]] = []
+        for kind, index in (("task", self.tasks), ("note", self.notes)):
+            if index is None:
+                continue
+            for rid, score in index.bm25_scores(query).items():
+                # Ties go to the lower id (older record).
+                item = (score, -rid, kind, rid)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        return [(score, kind, rid) for score, _, kind, rid in sorted(heap, reverse=True)]
+
+    def clear(self) -> None:
+        self.tasks.clear()
+        self.task_grams.clear()
+        if self.notes is None or self.note_grams is None:
+            self.pending_notes.clear()
+            self.notes_reset = True
+        else:
+            self.notes.clear()
+            self.note_grams.clear()
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the task indexes; see `notes_to_dict` for the notes."""
+        return {"tasks": self.tasks.to_dict(), "task_grams": self.task_grams.to_dict()}
+
+    def notes_to_dict(self) -> Optional[Dict[str, Any]]:
+        """Return the note indexes, or None if they are not loaded."""
+        if self.notes is None or self.note_grams is None:
+            return None
+        return {"notes": self.notes.to_dict(), "note_grams": self.note_grams.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SearchIndex":
+        """Restore the task indexes from `to_dict` output; notes are left unloaded."""
+        index = cls(notes=False)
+        index.tasks = TokenIndex.from_dict(data.get("tasks") or {})
+        index.task_grams = TrigramIndex.from_dict(data.get("task_grams") or {})
+        return index
@@ -0,0 +1,127 @@
+"""``final serve``: keep the store in memory and answer commands over a Unix socket.
+
+The daemon loads the state and its indexes once and then serves any
+number of clients on `storage.socket_path()` (or ``FINAL_SOCKET``),
+readable by the owner only. Each request is one line, either a JSON
+object ``{"command": "list-tasks --tag work", "id": 7}`` or just the
+command text, and gets one JSON line back with the same fields as a
+``final --batch`` result (``ok``, ``output``, ``error``) plus the
+request's ``id``. ``quit`` closes the connection.
+
+Commands run one at a time on the event loop, so a slow AI command
+delays the others. Changes are written exactly as in the REPL, and the
+daemon picks up changes other processes make to the store.
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from typing import Any, Dict, Optional
+
+from final.batch import execute
+
+# Longest request line accepted (add-note content travels inline).
+LINE_LIMIT = 1024 * 1024
+
+
+def handle_request(state: Dict, flusher, line: bytes) -> Dict[str, Any]:
+    """Run the command in one request line and return the response object."""
+    text = line.decode("utf-8", "replace").strip()
+    request_id = None
+    if text.startswith("{"):
+        try:
+            request = json.loads(text)
+            cmd = str(request["command"])
+            request_id = request.get("id")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return {"ok": False, "error": 'Invalid request; expected {"command": "..."}', "output": ""}
+    else:
+        cmd = text
+    result, keep_going = execute(state, flusher, cmd)
+    if request_id is not None:
+        result["id"] = request_id
+    if not keep_going:
+        result["closed"] = True
+    return result
+
+
+async def _handle(state: Dict, flusher, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                writer.write(b'{"ok": false, "error": "Request too long", "output": ""}\n')
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            response = handle_request(state, flusher, line)
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+            await writer.drain()
+            if response.get("closed"):
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+def _alive(path: str) -> bool:
+    """Return True if something accepts connections on the socket at `path`."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+async def _serve(state: Dict, flusher, path: str) -> None:
+    # Create the socket owner-only from the start rather than chmod it afterwards.
+    umask = os.umask(0o177)
+    try:
+        server = await asyncio.start_unix_server(
+            lambda reader, writer: _handle(state, flusher, reader, writer), path=path, limit=LINE_LIMIT
+        )
+    finally:
+        os.umask(umask)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    print(f"Serving on {path} (Ctrl-C to stop)", file=sys.stderr)
+    async with server:
+        await stop.wait()
+
+
+def serve(path: Optional[str] = None) -> int:
+    """Run the daemon until SIGINT/SIGTERM; returns the exit status."""
+    from final import storage
+    from final.flusher import Flusher
+
+    if not hasattr(socket, "AF_UNIX"):
+        print("final serve needs Unix domain sockets.", file=sys.stderr)
+        return 1
+    path = path or os.getenv("FINAL_SOCKET") or storage.socket_path()
+    if os.path.exists(path):
+        if _alive(path):
+            print(f"Already serving on {path}", file=sys.stderr)
+            return 1
+        # Left behind by a daemon that did not shut down cleanly.
+        os.unlink(path)
+
+    state = storage.load_state()
+    flusher = Flusher(state)
+    try:
+        asyncio.run(_serve(state, flusher, path))
+    finally:
+        flusher.close()
+        if os.path.exists(path):
+            os.unlink(path)
+    return 0
@@ -0,0 +1,386 @@
+"""SQLite storage backend for the final app.
+
+Tasks, notes and their tags live in separate tables so single-record
+lookups and writes are indexed queries instead of whole-file rewrites.
+Fields that do not have a dedicated column are kept in an `extra` JSON
+column so records round-trip unchanged.
+
+Every write also appends to the `changes` table, so a connection that
+has loaded the state can apply just what others committed since
+(`changes_since`) instead of reading every row again.
+"""
+import json
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from final.models import Task
+
+TASK_COLUMNS = ("id", "title", "description", "status", "priority", "due_date")
+NOTE_COLUMNS = ("id", "title", "content")
+
+# How many entries of the change log are kept. A connection that falls
+# further behind than this reloads everything.
+CHANGE_LOG_ROWS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    status TEXT,
+    priority TEXT,
+    due_date TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status);
+CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority);
+CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date);
+
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    content TEXT,
+    extra TEXT
+);
+
+CREATE TABLE IF NOT EXISTS tags (
+    kind TEXT NOT NULL,
+    record_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (kind, record_id, position)
+);
+CREATE INDEX IF NOT EXISTS idx_tags_tag ON tags(kind, tag);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- One row per committed change. `fields` holds an update's fields; added
+-- records are read back from their own rows.
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    record_id INTEGER,
+    fields TEXT
+);
+"""
+
+_connections: Dict[str, sqlite3.Connection] = {}
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Return a (cached) connection to the database at `path`, creating the schema."""
+    conn = _connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Python's str.lower so searches match the JSON backend exactly.
+        conn.create_function("py_lower", 1, lambda s: (s or "").lower(), deterministic=True)
+        conn.executescript(SCHEMA)
+        _connections[path] = conn
+    return conn
+
+
+def close(path: str) -> None:
+    """Close and forget the cached connection for `path`, if any."""
+    conn = _connections.pop(path, None)
+    if conn is not None:
+        conn.close()
+
+
+def data_version(path: str) -> int:
+    """Return SQLite's data_version, which changes when another connection commits."""
+    return connect(path).execute("PRAGMA data_version").fetchone()[0]
+
+
+def is_empty(path: str) -> bool:
+    """Return True when the database holds no tasks, notes or metadata."""
+    conn = connect(path)
+    for table in ("tasks", "notes", "meta"):
+        if conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone():
+            return False
+    return True
+
+
+def _split(record: Dict[str, Any], columns: Tuple[str, ...]) -> Tuple[List[Any], Optional[str]]:
+    values = [record.get(c) for c in columns]
+    extra = {k: v for k, v in record.items() if k not in columns and k != "tags"}
+    return values, (json.dumps(extra) if extra else None)
+
+
+def _tags_for(conn: sqlite3.Connection, kind: str, record_id: int) -> List[str]:
+    rows = conn.execute(
+        "SELECT tag FROM tags WHERE kind = ? AND record_id = ? ORDER BY position",
+        (kind, record_id),
+    )
+    return [r["tag"] for r in rows]
+
+
+def _row_to_record(row: sqlite3.Row, columns: Tuple[str, ...], tags: List[str]) -> Dict[str, Any]:
+    record = {c: row[c] for c in columns}
+    record["tags"] = tags
+    if row["extra"]:
+        record.update(json.loads(row["extra"]))
+    return record
+
+
+def _all_tags(conn: sqlite3.Connection, kind: str) -> Dict[int, List[str]]:
+    tags: Dict[int, List[str]] = {}
+    rows = conn.execute(
+        "SELECT record_id, tag FROM tags WHERE kind = ? ORDER BY record_id, position", (kind,)
+    )
+    for r in rows:
+        tags.setdefault(r["record_id"], []).append(r["tag"])
+    return tags
+
+
+def _write_tags(conn: sqlite3.Connection, kind: str, record_id: int, tags: List[str]) -> None:
+    conn.execute("DELETE FROM tags WHERE kind = ? AND record_id = ?", (kind, record_id))
+    conn.executemany(
+        "INSERT INTO tags (kind, record_id, position, tag) VALUES (?, ?, ?, ?)",
+        [(kind, record_id, i, tag) for i, tag in enumerate(tags or [])],
+    )
+
+
+def _upsert_task(conn: sqlite3.Connection, task: Dict[str, Any], replace: bool = True) -> None:
+    values, extra = _split(task, TASK_COLUMNS)
+    verb = "INSERT OR REPLACE" if replace else "INSERT"
+    conn.execute(
+        f"{verb} INTO tasks (id, title, description, status, priority, due_date, extra) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (*values, extra),
+    )
+    _write_tags(conn, "task", task["id"], task.get("tags") or [])
+
+
+def _upsert_note(conn: sqlite3.Connection, note: Dict[str, Any], replace: bool = True) -> None:
+    values, extra = _split(note, NOTE_COLUMNS)
+    verb = "INSERT OR REPLACE" if replace else "INSERT"
+    conn.execute(
+        f"{verb} INTO notes (id, title, content, extra) VALUES (?, ?, ?, ?)",
+        (*values, extra),
+    )
+    _write_tags(conn, "note", note["id"], note.get("tags") or [])
+
+
+def _bump_counter(conn: sqlite3.Connection, key: str, value: int) -> None:
+    """Raise the integer stored under meta `key` to at least `value`."""
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    current = json.loads(row["value"]) if row else 0
+    if value > (current or 0):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+
+@contextmanager
+def _read_transaction(conn: sqlite3.Connection) -> Iterator[None]:
+    """Run the reads in the block against one snapshot of the database."""
+    conn.execute("BEGIN")
+    try:
+        yield
+    finally:
+        conn.rollback()
+
+
+def _last_seq(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT MAX(seq) FROM changes").fetchone()[0] or 0
+
+
+def _log(
+    conn: sqlite3.Connection, op: str, record_id: Optional[int] = None, fields: Optional[Dict[str, Any]] = None
+) -> None:
+    conn.execute(
+        "INSERT INTO changes (op, record_id, fields) VALUES (?, ?, ?)",
+        (op, record_id, json.dumps(fields) if fields is not None else None),
+    )
+
+
+def load_state(path: str) -> Tuple[Dict[str, Any], int]:
+    """Read every task and note (ordered by id) plus metadata into a state dict.
+
+    Returns the state and the position in the change log it includes,
+    to pass to `changes_since` and `write_changes` later.
+    """
+    conn = connect(path)
+    with _read_transaction(conn):
+        return _read_state(conn), _last_seq(conn)
+
+
+def _read_state(conn: sqlite3.Connection) -> Dict[str, Any]:
+    state: Dict[str, Any] = {}
+    for row in conn.execute("SELECT key, value FROM meta"):
+        state[row["key"]] = json.loads(row["value"])
+
+    task_tags = _all_tags(conn, "task")
+    note_tags = _all_tags(conn, "note")
+    state["tasks"] = [
+        Task(_row_to_record(row, TASK_COLUMNS, task_tags.get(row["id"], [])))
+        for row in conn.execute("SELECT * FROM tasks ORDER BY id")
+    ]
+    state["notes"] = [
+        _row_to_record(row, NOTE_COLUMNS, note_tags.get(row["id"], []))
+        for row in conn.execute("SELECT * FROM notes ORDER BY id")
+    ]
+    return state
+
+
+def save_state(path: str, state: Dict[str, Any]) -> int:
+    """Replace the database contents with `state` in one transaction.
+
+    Returns the new change log position.
+    """
+    conn = connect(path)
+    with conn:
+        conn.execute("DELETE FROM tasks")
+        conn.execute("DELETE FROM notes")
+        conn.execute("DELETE FROM tags")
+        conn.execute("DELETE FROM meta")
+        for task in state.get("tasks") or []:
+            _upsert_task(conn, task)
+        for note in state.get("notes") or []:
+            _upsert_note(conn, note)
+        conn.executemany(
+            "INSERT INTO meta (key, value) VALUES (?, ?)",
+            [(k, json.dumps(v)) for k, v in state.items() if k not in ("tasks", "notes")],
+        )
+        # Individual changes cannot describe this; readers reload.
+        _log(conn, "replace")
+        return _last_seq(conn)
+
+
+def write_changes(path: str, changes: List[Dict[str, Any]], since: Optional[int] = None) -> Optional[int]:
+    """Persist change entries in one transaction, touching only the affected rows.
+
+    With `since`, nothing is written if the change log has moved past
+    that position (another connection committed first); None is
+    returned and the caller should catch up and try again. Otherwise the
+    new log position is returned.
+
+    Adding a record whose id already exists raises `sqlite3.IntegrityError`
+    instead of overwriting the other record, and then none of `changes`
+    is written.
+    """
+    conn = connect(path)
+    with conn:
+        # Take the write lock before checking the log, so nobody commits in between.
+        conn.execute("BEGIN IMMEDIATE")
+        if since is not None and _last_seq(conn) != since:
+            return None
+        for change in changes:
+            _write(conn, path, change)
+        seq = _last_seq(conn)
+        conn.execute("DELETE FROM changes WHERE seq <= ?", (seq - CHANGE_LOG_ROWS,))
+    return seq
+
+
+def changes_since(path: str, seq: Optional[int]) -> Optional[Tuple[List[Dict[str, Any]], int]]:
+    """Return the change entries committed after log position `seq`, and the new position.
+
+    Added records are read from their current rows. Returns None when
+    the log cannot bring `seq` up to date (it is unknown, already
+    trimmed away, or `save_state` replaced everything since); the
+    caller must then reload the whole state.
+    """
+    if seq is None:
+        return None
+    conn = connect(path)
+    with _read_transaction(conn):
+        rows = conn.execute("SELECT * FROM changes WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+        if not rows:
+            return [], seq
+        if rows[0]["seq"] != seq + 1:
+            # Entries we have not seen were trimmed from the log.
+            return None
+        changes: List[Dict[str, Any]] = []
+        for row in rows:
+            op, record_id = row["op"], row["record_id"]
+            if op == "replace":
+                return None
+            if op == "add_task":
+                task = get_task(path, record_id)
+                if task is not None:
+                    changes.append({"op": op, "task": task})
+            elif op == "add_note":
+                note = get_note(path, record_id)
+                if note is not None:
+                    changes.append({"op": op, "note": note})
+            elif op == "update_task":
+                changes.append({"op": op, "id": record_id, "fields": json.loads(row["fields"])})
+            elif op == "reset":
+                changes.append({"op": op})
+        return changes, rows[-1]["seq"]
+
+
+def _write(conn: sqlite3.Connection, path: str, change: Dict[str, Any]) -> None:
+    op = change.get("op")
+    if op == "add_task":
+        _upsert_task(conn, change["task"], replace=False)
+        _bump_counter(conn, "last_task_id", change["task"]["id"])
+        _log(conn, op, change["task"]["id"])
+    elif op == "add_note":
+        _upsert_note(conn, change["note"], replace=False)
+        _bump_counter(conn, "last_note_id", change["note"]["id"])
+        _log(conn, op, change["note"]["id"])
+    elif op == "update_task":
+        task = get_task(path, change["id"])
+        if task is not None:
+            fields = change.get("fields") or {}
+            task.update(fields)
+            _upsert_task(conn, task)
+            _log(conn, op, change["id"], fields)
+    elif op == "reset":
+        conn.execute("DELETE FROM tasks")
+        conn.execute("DELETE FROM notes")
+        conn.execute("DELETE FROM tags")
+        _log(conn, op)
+    else:
+        raise ValueError(f"Unknown change op: {op!r}")
+
+
+def get_task(path: str, task_id: int) -> Optional[Dict[str, Any]]:
+    """Return the task with `task_id` or None."""
+    conn = connect(path)
+    row = conn.execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+    if row is None:
+        return None
+    return _row_to_record(row, TASK_COLUMNS, _tags_for(conn, "task", task_id))
+
+
+def get_note(path: str, note_id: int) -> Optional[Dict[str, Any]]:
+    """Return the note with `note_id` or None."""
+    conn = connect(path)
+    row = conn.execute("SELECT * FROM notes WHERE id = ?", (note_id,)).fetchone()
+    if row is None:
+        return None
+    return _row_to_record(row, NOTE_COLUMNS, _tags_for(conn, "note", note_id))
+
+
+def max_id(path: str, table: str) -> int:
+    """Return the largest id in `table` ("tasks" or "notes"), or 0 when empty."""
+    if table not in ("tasks", "notes"):
+        raise ValueError(f"Unknown table: {table!r}")
+    row = connect(path).execute(f"SELECT MAX(id) FROM {table}").fetchone()
+    return row[0] or 0
+
+
+def search(path: str, query: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Return (tasks, notes) whose text fields contain `query`, case-insensitively."""
+    conn = connect(path)
+    q = (query or "").lower()
+    task_rows = conn.execute(
+        "SELECT * FROM tasks WHERE instr(py_lower(title), ?) > 0 "
+        "OR instr(py_lower(description), ?) > 0 ORDER BY id",
+        (q, q),
+    ).fetchall()
+    note_rows = conn.execute(
+        "SELECT * FROM notes WHERE instr(py_lower(title), ?) > 0 "
+        "OR instr(py_lower(content), ?) > 0 ORDER BY id",
+        (q, q),
+    ).fetchall()
+    tasks = [_row_to_record(r, TASK_COLUMNS, _tags_for(conn, "task", r["id"])) for r in task_rows]
+    notes = [_row_to_record(r, NOTE_COLUMNS, _tags_for(conn, "note", r["id"])) for r in note_rows]
+    return tasks, notes
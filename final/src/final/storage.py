@@ -1,33 +1,822 @@
 import json
 import os
-from typing import Any, Dict
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single process only.
+    fcntl = None
+
+from final import blob_store, metrics, sqlite_backend
+from final.models import Note, Task, intern_value
+from final.search_index import NOTE_FIELDS, TASK_FIELDS, SearchIndex, matches
+from final.task_index import TaskIndex, task_matches
 
 STATE_FILE = "state.json"
 
+# Storage backend: "json" (state.json plus journal) or "sqlite" (state.db).
+BACKEND = os.getenv("FINAL_BACKEND", "json").lower()
+
+# Once the journal grows past this many bytes it is folded back into a
+# fresh snapshot in STATE_FILE.
+JOURNAL_COMPACT_BYTES = 1024 * 1024
+# Bumped whenever the persisted search index layout changes; an index
+# saved in another layout is rebuilt.
+INDEX_FORMAT = 3
+
+# On exit the journal is only folded in once it is at least this
+# fraction of the snapshot's size; smaller ones are cheap to replay.
+CHECKPOINT_COMPACT_RATIO = 0.25
+
+
+def journal_path() -> str:
+    """Return the path of the write-ahead journal kept next to `STATE_FILE`."""
+    root, _ = os.path.splitext(STATE_FILE)
+    return root + ".journal"
+
+
+def index_path() -> str:
+    """Return the path of the persisted search index kept next to `STATE_FILE`."""
+    root, _ = os.path.splitext(STATE_FILE)
+    return root + ".index.json"
+
+
+def notes_index_path() -> str:
+    """Return the path of the persisted note search index kept next to `STATE_FILE`."""
+    root, _ = os.path.splitext(STATE_FILE)
+    return root + ".notes.index.json"
+
+
+def blob_dir() -> str:
+    """Return the directory holding note bodies, kept next to `STATE_FILE`."""
+    root, _ = os.path.splitext(STATE_FILE)
+    return root + ".blobs"
+
+
+def lock_path() -> str:
+    """Return the path of the lock file that serializes writers across processes."""
+    root, _ = os.path.splitext(STATE_FILE)
+    return root + ".lock"
+
+
+def socket_path() -> str:
+    """Return the path of the Unix socket `final serve` listens on, next to `STATE_FILE`."""
+    root, _ = os.path.splitext(STATE_FILE)
+    return root + ".sock"
+
+
+def db_path() -> str:
+    """Return the path of the SQLite database used by the "sqlite" backend."""
+    root, _ = os.path.splitext(STATE_FILE)
+    return root + ".db"
+
+
+def _use_sqlite() -> bool:
+    if BACKEND == "sqlite":
+        return True
+    if BACKEND != "json":
+        raise ValueError(f"Unknown storage backend: {BACKEND!r}")
+    return False
+
+
+class State(dict):
+    """The state dict returned by `load_state`.
+
+    Behaves exactly like the plain ``{"tasks": [...], "notes": [...]}``
+    dict, but also keeps id -> record maps, a `TaskIndex` for filtered
+    listing and the search index as attributes, which are never written
+    to disk. The highest task and note ids ever handed out are stored in
+    the dict itself (``last_task_id`` / ``last_note_id``) so new ids are
+    O(1) and never reused. Tasks are held as `final.models.Task` records
+    and notes as `LazyNote`. Change it through `apply_change` so
+    everything stays in step.
+
+    To notice writes by other processes it remembers which snapshot it
+    was loaded from and how far into the journal it has read, and
+    `lock` is held by whichever thread is currently changing it.
+    """
+
+    search_index: Optional[SearchIndex] = None
+    # True once `search_index` matches what is saved in `index_path()`
+    # (and `notes_index_path()`, if its note indexes are loaded).
+    index_saved: bool = False
+    # True while there are applied changes that are not yet on disk.
+    dirty: bool = False
+    # [mtime_ns, size] of the snapshot this state was loaded from or last wrote.
+    snapshot_sig: Optional[List[int]] = None
+    # Bytes of the journal already applied to this state.
+    journal_offset: int = 0
+    # SQLite `PRAGMA data_version` seen at the last load or sync (sqlite backend).
+    data_version: Optional[int] = None
+    # Position in the sqlite change log this state includes (sqlite backend).
+    change_seq: Optional[int] = None
+    # Bumped by every applied change and reload, so readers can tell the
+    # state changed (the HTTP API's ETags) without comparing contents.
+    # Unlike the snapshot ``generation`` key it is never saved.
+    version: int = 0
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.lock = threading.RLock()
+        # (kind, old id, new id) of our new records that `_rebase` had to
+        # renumber, until `take_renumbered` reports them.
+        self.renumbered: List[Tuple[str, int, int]] = []
+        self["tasks"] = [Task(t) if type(t) is dict else t for t in self.get("tasks") or []]
+        self["notes"] = [LazyNote(n) if type(n) in (dict, Note) else n for n in self.get("notes") or []]
+        self.tasks_by_id: Dict[int, Dict[str, Any]] = {
+            t.get("id"): t for t in self["tasks"] if isinstance(t, dict)
+        }
+        self.notes_by_id: Dict[int, Dict[str, Any]] = {
+            n.get("id"): n for n in self["notes"] if isinstance(n, dict)
+        }
+        self.task_index = TaskIndex.build(self["tasks"])
+        self["last_task_id"] = max([self.get("last_task_id") or 0, *_int_ids(self.tasks_by_id)])
+        self["last_note_id"] = max([self.get("last_note_id") or 0, *_int_ids(self.notes_by_id)])
+
+    def adopt(self, other: "State") -> None:
+        """Replace this state's contents and indexes with those of `other`, in place."""
+        dict.clear(self)
+        dict.update(self, other)
+        lock, version, renumbered = self.lock, self.version, self.renumbered
+        self.__dict__.update(other.__dict__)
+        self.lock = lock
+        self.version = version + 1
+        self.renumbered = renumbered
+
+
+class LazyNote(Note):
+    """A `Note` whose ``content`` may live in the blob store.
+
+    Once a note has been saved its body is moved to `blob_dir()` and the
+    record keeps only ``content_hash``. Reading ``note["content"]`` or
+    ``note.get("content")`` then loads the body through the blob store's
+    LRU cache. The body is never part of the record's items, so it is not
+    written into `STATE_FILE` or the journal.
+    """
+
+    __slots__ = ()
+
+    def _has_blob(self) -> bool:
+        return not dict.__contains__(self, "content") and dict.__contains__(self, "content_hash")
+
+    def _load_content(self) -> str:
+        return blob_store.get(blob_dir(), dict.__getitem__(self, "content_hash"))
+
+    def __missing__(self, key: str) -> Any:
+        if key == "content" and self._has_blob():
+            return self._load_content()
+        raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return dict.__contains__(self, key) or (key == "content" and self._has_blob())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key == "content" and self._has_blob():
+            return self._load_content()
+        return dict.get(self, key, default)
+
+    def externalize(self) -> None:
+        """Move an inline ``content`` into the blob store."""
+        if dict.__contains__(self, "content"):
+            self["content_hash"] = blob_store.put(blob_dir(), str(dict.pop(self, "content") or ""))
+
+
+def _int_ids(by_id: Dict[Any, Any]) -> List[int]:
+    return [i for i in by_id if isinstance(i, int)]
+
+
+def _default_state() -> Dict[str, Any]:
+    return {"tasks": [], "notes": []}
 
+
+def _atomic_write(path: str, data: str) -> None:
+    """Write `data` to a temp file next to `path`, fsync it, then replace `path`."""
+    dirpath = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dirpath)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as tmp:
+            tmp.write(data)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+            if metrics.ENABLED:
+                metrics.count("bytes_written", os.fstat(tmp.fileno()).st_size)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def read_journal() -> List[Dict[str, Any]]:
+    """Return the change entries recorded in the journal, oldest first.
+
+    A partially written last line (e.g. from a crash mid-append) is
+    ignored together with anything after it.
+    """
+    return _read_journal_from(0)[0]
+
+
+def _read_journal_from(offset: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Return the complete entries after byte `offset` and the offset after them."""
+    path = journal_path()
+    if not os.path.exists(path):
+        return [], 0
+    changes = []
+    start = offset
+    with open(path, "rb") as fh:
+        fh.seek(offset)
+        for raw in fh:
+            if not raw.endswith(b"\n"):
+                break
+            line = raw.strip()
+            if line:
+                try:
+                    changes.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+            offset += len(raw)
+    metrics.count("bytes_read", offset - start)
+    return changes, offset
+
+
+@contextmanager
+def file_lock(shared: bool = False) -> Iterator[None]:
+    """Hold an advisory `fcntl` lock on `lock_path()` for the duration.
+
+    Writers take it exclusively, loads take it shared. It is not
+    re-entrant, so functions that already hold it call the ``_locked``
+    helpers. Without `fcntl` (Windows) this is a no-op.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path(), "a") as fh:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+
+@metrics.timed("storage.load_state")
 def load_state() -> Dict[str, Any]:
     """Load and return the state from `STATE_FILE`.
 
-    If the file does not exist, return a default state.
+    If the file does not exist, return a default state. Any entries in
+    the journal that are newer than the snapshot are replayed on top.
+    With the "sqlite" backend the database is read instead; an empty
+    database is seeded from `STATE_FILE` the first time.
     """
-    if not os.path.exists(STATE_FILE):
-        return {"tasks": [], "notes": []}
-    with open(STATE_FILE, "r", encoding="utf-8") as fh:
-        return json.load(fh)
+    if _use_sqlite():
+        path = db_path()
+        if sqlite_backend.is_empty(path) and os.path.exists(STATE_FILE):
+            sqlite_backend.save_state(path, load_json_state())
+        return _load_sqlite_state()
+    return load_json_state()
+
+
+def _load_sqlite_state() -> "State":
+    path = db_path()
+    # Read first, so a commit that lands during the load is seen by `sync`.
+    version = sqlite_backend.data_version(path)
+    data, seq = sqlite_backend.load_state(path)
+    state = State(data)
+    state.data_version, state.change_seq = version, seq
+    # Built once here and kept in step by `apply_change`, so ranked search
+    # does not rebuild it per query; note indexes load on first use.
+    state.search_index = SearchIndex.build(state, notes=False)
+    return state
+
+
+def load_json_state() -> Dict[str, Any]:
+    """Load the JSON snapshot in `STATE_FILE` and replay the journal over it.
+
+    The search index saved with the snapshot is reused when it matches
+    the snapshot on disk, otherwise it is rebuilt. Journal entries update
+    it incrementally as they are replayed. Entries written before the
+    snapshot's current ``generation`` (left over from an interrupted
+    compaction) are skipped.
+    """
+    with file_lock(shared=True):
+        return _load_json_locked()
+
 
+def _intern_hook(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """`json.load` object hook that interns the repeated strings of task-like objects.
 
+    Run while parsing, so the duplicate strings are freed as they are read
+    instead of after the whole snapshot is in memory. Interning does not
+    change any value, so it is safe on objects that turn out not to be tasks.
+    """
+    for key in Task.INTERNED.intersection(obj):
+        obj[key] = intern_value(obj[key])
+    return obj
+
+
+def _tasks_to_records(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn the task dicts in ``data["tasks"]`` into `Task` records, in place.
+
+    Each dict is dropped as soon as its record replaces it in the list, so
+    a large snapshot never holds every task twice while loading. Only the
+    top-level task list is converted; nested values and notes are left as
+    they are.
+    """
+    tasks = data.get("tasks")
+    if isinstance(tasks, list):
+        for i, task in enumerate(tasks):
+            if type(task) is dict:
+                tasks[i] = Task(task)
+    return data
+
+
+def _load_json_locked() -> "State":
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, "r", encoding="utf-8") as fh:
+            state = State(_tasks_to_records(json.load(fh, object_hook=_intern_hook)))
+            st = os.fstat(fh.fileno())
+        state.snapshot_sig = [st.st_mtime_ns, st.st_size]
+        metrics.count("bytes_read", st.st_size)
+    else:
+        state = State(_default_state())
+
+    index = _load_index()
+    state.index_saved = index is not None
+    # Note indexes are only loaded once notes are searched (`_load_note_index`).
+    state.search_index = index or SearchIndex.build(state, notes=False)
+
+    _apply_journal_from(state, 0)
+    state.dirty = False
+    return state
+
+
+def _apply_journal_from(state: "State", offset: int) -> int:
+    """Apply journal entries of the current generation after `offset`.
+
+    Returns how many entries were applied.
+    """
+    changes, state.journal_offset = _read_journal_from(offset)
+    generation = state.get("generation", 0)
+    # These entries are already on disk, so they leave `dirty` as it was.
+    dirty = state.dirty
+    applied = 0
+    for change in changes:
+        if change.get("gen", generation) != generation:
+            continue
+        apply_change(state, change)
+        applied += 1
+    state.dirty = dirty
+    return applied
+
+
+@metrics.timed("storage.save_state")
 def save_state(state: Dict[str, Any]) -> None:
-    """Write `state` to `STATE_FILE` using pretty JSON (indent=4)."""
-    with open(STATE_FILE, "w", encoding="utf-8") as fh:
-        json.dump(state, fh, indent=4)
+    """Write `state` to `STATE_FILE` using pretty JSON (indent=4).
+
+    The snapshot is written atomically and then the journal is removed,
+    since everything it recorded is now part of the snapshot. Note
+    bodies are stored in the blob store and only their hash is written.
+    With the "sqlite" backend the database contents are replaced instead.
+    """
+    if _use_sqlite():
+        seq = sqlite_backend.save_state(db_path(), state)
+        if isinstance(state, State):
+            state.change_seq = seq
+            state.data_version = sqlite_backend.data_version(db_path())
+        _mark_clean(state)
+        return
+    with file_lock():
+        if isinstance(state, State):
+            # Fold in what other processes wrote since we last looked.
+            _catch_up(state, [])
+        _write_snapshot(state)
+
+
+def _write_snapshot(state: Dict[str, Any]) -> None:
+    # Caller holds file_lock(). Bumping the generation marks any journal
+    # entries still on disk (if removing it below fails) as already folded in.
+    index = getattr(state, "search_index", None)
+    notes_saved, load_notes = None, False
+    if index is not None and not index.notes_loaded:
+        # Read before the snapshot changes, so it can be re-saved for the new
+        # one. Without an earlier snapshot every note body is still in memory.
+        notes_saved = _read_index_file(notes_index_path(), state.snapshot_sig)
+        load_notes = notes_saved is not None or state.snapshot_sig is None
+    state["generation"] = state.get("generation", 0) + 1
+    for note in state.get("notes") or []:
+        if isinstance(note, LazyNote):
+            note.externalize()
+    _atomic_write(STATE_FILE, json.dumps(state, indent=4))
+    try:
+        os.remove(journal_path())
+    except FileNotFoundError:
+        pass
+    # With the journal gone, the snapshot names every blob still in use.
+    blob_store.collect_garbage(
+        blob_dir(), [n["content_hash"] for n in state.get("notes") or [] if isinstance(n, dict) and "content_hash" in n]
+    )
+    _mark_clean(state)
+    if isinstance(state, State):
+        state.snapshot_sig = _snapshot_signature()
+        state.journal_offset = 0
+    if index is not None:
+        if load_notes:
+            index.load_notes(state.get("notes") or [], notes_saved)
+        _save_index(index)
+        state.index_saved = True
+        if load_notes:
+            index.unload_notes()
+
+
+def _snapshot_signature() -> Optional[List[int]]:
+    if not os.path.exists(STATE_FILE):
+        return None
+    st = os.stat(STATE_FILE)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _save_index(index: SearchIndex) -> None:
+    """Persist `index` tagged with the signature of the current snapshot.
+
+    Task indexes go to `index_path()` and, if loaded, note indexes to
+    `notes_index_path()`. Posting lists are packed as 32-bit ints; an
+    index over other ids is not saved and is rebuilt on the next load
+    instead.
+    """
+    sig = _snapshot_signature()
+    try:
+        parts = [(index_path(), index.to_dict()), (notes_index_path(), index.notes_to_dict())]
+    except (TypeError, OverflowError):
+        return
+    for path, packed in parts:
+        if packed is not None:
+            data = {"format": INDEX_FORMAT, "snapshot": sig, "index": packed}
+            _atomic_write(path, json.dumps(data, separators=(",", ":")))
+
+
+def _read_index_file(path: str, sig: Optional[List[int]]) -> Optional[Dict[str, Any]]:
+    """Return the index saved in `path` if it was saved for snapshot `sig`."""
+    if sig is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+            if metrics.ENABLED:
+                metrics.count("bytes_read", fh.tell())
+    except (OSError, json.JSONDecodeError):
+        return None
+    if data.get("format") != INDEX_FORMAT or data.get("snapshot") != sig:
+        return None
+    return data.get("index") or {}
+
+
+def _load_index() -> Optional[SearchIndex]:
+    """Return the persisted task index if it was saved for the current snapshot."""
+    data = _read_index_file(index_path(), _snapshot_signature())
+    return None if data is None else SearchIndex.from_dict(data)
+
+
+def _load_note_index(state: "State") -> None:
+    """Load the note indexes of `state`'s search index if not loaded yet.
+
+    They are read from `notes_index_path()` when it was saved for the
+    snapshot `state` came from, and otherwise built from the notes,
+    which reads every note body.
+    """
+    index = state.search_index
+    if index is None or index.notes_loaded:
+        return
+    data = _read_index_file(notes_index_path(), state.snapshot_sig)
+    if not index.load_notes(state.get("notes") or [], data):
+        state.index_saved = False
+
+
+def checkpoint(state: Dict[str, Any]) -> None:
+    """Fold pending changes into the main store, e.g. before exiting.
+
+    For the "json" backend, unsaved changes are written as a new snapshot.
+    The journal is compacted into one only once it is large compared
+    with the snapshot (`CHECKPOINT_COMPACT_RATIO`), so a short session
+    does not rewrite the whole store; the next load replays it. Without
+    a journal, a search index that is not saved yet is saved so the next
+    start can reuse it. For the "sqlite" backend every change is already
+    in the database, so only the WAL is checkpointed.
+    """
+    if _use_sqlite():
+        sqlite_backend.connect(db_path()).execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return
+    journal_size = os.path.getsize(journal_path()) if os.path.exists(journal_path()) else 0
+    snapshot_size = os.path.getsize(STATE_FILE) if os.path.exists(STATE_FILE) else 0
+    if getattr(state, "dirty", True) or (journal_size and journal_size >= snapshot_size * CHECKPOINT_COMPACT_RATIO):
+        save_state(state)
+    elif journal_size:
+        # The saved index matches the snapshot; the journal is replayed over it.
+        return
+    elif os.path.exists(STATE_FILE) and getattr(state, "search_index", None) is not None and not state.index_saved:
+        _save_index(state.search_index)
+        state.index_saved = True
+
+
+def apply_change(state: Dict[str, Any], change: Dict[str, Any]) -> None:
+    """Apply a single change entry to an in-memory `state`.
+
+    Supported ops:
+      - ``add_task`` / ``add_note``: append ``change["task"]`` / ``change["note"]``
+      - ``update_task``: merge ``change["fields"]`` into the task with ``change["id"]``
+      - ``reset``: clear all tasks and notes
+    """
+    index = getattr(state, "search_index", None)
+    if index is not None:
+        state.index_saved = False
+    is_state = isinstance(state, State)
+    if is_state:
+        state.dirty = True
+        state.version += 1
+    op = change.get("op")
+    if op == "add_task":
+        task = change["task"]
+        if is_state and type(task) is dict:
+            task = change["task"] = Task(task)
+        state.setdefault("tasks", []).append(task)
+        if is_state:
+            replaced = state.tasks_by_id.get(task.get("id"))
+            if index is not None and replaced is not None:
+                index.remove_task(replaced)
+            state.tasks_by_id[task.get("id")] = task
+            state.task_index.add(task)
+            if isinstance(task.get("id"), int):
+                state["last_task_id"] = max(state["last_task_id"], task["id"])
+        if index is not None:
+            index.add_task(task)
+    elif op == "add_note":
+        note = change["note"]
+        if is_state and type(note) is dict:
+            note = change["note"] = LazyNote(note)
+        state.setdefault("notes", []).append(note)
+        if is_state:
+            replaced = state.notes_by_id.get(note.get("id"))
+            if index is not None and replaced is not None:
+                index.remove_note(replaced)
+            state.notes_by_id[note.get("id")] = note
+            if isinstance(note.get("id"), int):
+                state["last_note_id"] = max(state["last_note_id"], note["id"])
+        if index is not None:
+            index.add_note(note)
+    elif op == "update_task":
+        fields = change.get("fields") or {}
+        t = state.tasks_by_id.get(change.get("id")) if is_state else _scan(state.get("tasks"), change.get("id"))
+        if t is not None:
+            # The index finds what to unindex from the old text.
+            reindex = index is not None and any(f in fields for f in TASK_FIELDS)
+            if reindex:
+                index.remove_task(t)
+            t.update(fields)
+            if is_state:
+                state.task_index.add(t)
+            if reindex:
+                index.add_task(t)
+    elif op == "reset":
+        # Id high-water marks are kept so ids are never reused.
+        state["tasks"] = []
+        state["notes"] = []
+        if is_state:
+            state.tasks_by_id.clear()
+            state.notes_by_id.clear()
+            state.task_index.clear()
+        if index is not None:
+            index.clear()
+    else:
+        raise ValueError(f"Unknown change op: {op!r}")
+
+
+def log_change(state: Dict[str, Any], change: Dict[str, Any]) -> None:
+    """Append `change` to the journal instead of rewriting the whole state.
+
+    The change must already have been applied to `state` (see
+    `apply_change`). Same as ``commit_changes(state, [change])``.
+    """
+    commit_changes(state, [change])
+
+
+@metrics.timed("storage.commit")
+def commit_changes(
+    state: Dict[str, Any], changes: List[Dict[str, Any]], fsync: bool = True, compact: bool = True
+) -> None:
+    """Persist `changes` (already applied to `state`) with one journal append.
+
+    Runs under the exclusive file lock. If another process wrote in the
+    meantime, its entries are applied to `state` first and `changes` are
+    replayed on top (see `_rebase`), so nobody's update is lost. When the
+    journal grows past `JOURNAL_COMPACT_BYTES` it is compacted into a new
+    snapshot. With the "sqlite" backend only the affected rows are written,
+    all in one transaction. Without `fsync` the append is left to the OS (see `fsync_journal`);
+    without `compact` the journal is left to grow.
+    """
+    if not changes:
+        return
+    if _use_sqlite():
+        _write_sqlite_changes(state, changes)
+        _mark_clean(state)
+        return
+    with file_lock():
+        if isinstance(state, State) and _catch_up(state, changes):
+            _rebase(state, changes)
+        size = append_journal([encode_change(state, c) for c in changes], fsync)
+        if isinstance(state, State):
+            state.journal_offset = size
+        _mark_clean(state)
+        if compact and size >= JOURNAL_COMPACT_BYTES:
+            _write_snapshot(state)
+
+
+@metrics.timed("storage.sync")
+def sync(state: Dict[str, Any], pending: List[Dict[str, Any]] = ()) -> bool:
+    """Bring `state` up to date with changes written by other processes.
+
+    `pending` are changes already applied to `state` but not yet
+    committed; they are replayed on top of the other processes' changes.
+    This is cheap when nothing changed: a stat of the snapshot and a
+    read of the journal tail (or one PRAGMA for sqlite). Returns True if
+    anything was picked up.
+    """
+    if not isinstance(state, State):
+        return False
+    if _use_sqlite():
+        if sqlite_backend.data_version(db_path()) == state.data_version:
+            return False
+        changed = _catch_up_sqlite(state)
+        if changed:
+            _rebase(state, list(pending))
+        return changed
+    with file_lock(shared=True):
+        changed = _catch_up(state, pending)
+    if changed:
+        _rebase(state, list(pending))
+    return changed
+
+
+def _catch_up(state: "State", pending: List[Dict[str, Any]]) -> bool:
+    """Apply other processes' writes to `state`; caller holds the file lock.
+
+    If the snapshot changed (another process compacted), the state is
+    reloaded from disk. Otherwise only the new journal entries are
+    applied. Returns True if anything changed; the caller must then
+    `_rebase` its pending changes.
+    """
+    if _snapshot_signature() != state.snapshot_sig:
+        state.adopt(_load_json_locked())
+        return True
+    return _apply_journal_from(state, state.journal_offset) > 0
+
+
+def _rebase(state: "State", pending: List[Dict[str, Any]]) -> None:
+    """Re-apply our uncommitted `pending` changes after other processes' changes.
+
+    A new record whose id was meanwhile taken by another process gets the
+    next free id (and later pending updates follow it); the change is
+    noted in ``state.renumbered``. Updates and resets are simply applied
+    again.
+    """
+    renumbered: Dict[int, int] = {}
+    for change in pending:
+        op = change.get("op")
+        if op in ("add_task", "add_note"):
+            kind = "task" if op == "add_task" else "note"
+            record = change[kind]
+            by_id = state.tasks_by_id if kind == "task" else state.notes_by_id
+            if by_id.get(record.get("id")) is record:
+                continue
+            records = state[kind + "s"]
+            for i, r in enumerate(records):
+                if r is record:
+                    del records[i]
+                    break
+            if record.get("id") in by_id:
+                old_id = record["id"]
+                record["id"] = state[f"last_{kind}_id"] + 1
+                if kind == "task":
+                    renumbered[old_id] = record["id"]
+                state.renumbered.append((kind, old_id, record["id"]))
+            apply_change(state, change)
+        else:
+            if op == "update_task" and change.get("id") in renumbered:
+                change["id"] = renumbered[change["id"]]
+            apply_change(state, change)
+
+
+def take_renumbered(state: Dict[str, Any]) -> List[Tuple[str, int, int]]:
+    """Return and forget the (kind, old id, new id) renumberings recorded on `state`."""
+    if not isinstance(state, State) or not state.renumbered:
+        return []
+    renumbered, state.renumbered = state.renumbered, []
+    return renumbered
+
+
+def _catch_up_sqlite(state: "State") -> bool:
+    """Apply the rows other connections changed since `state.change_seq`.
+
+    Falls back to reloading the whole state when the change log cannot
+    say what changed. Returns True if anything changed; the caller must
+    then `_rebase` its pending changes.
+    """
+    path = db_path()
+    # Read first, so a commit that lands after the log is read is seen next time.
+    state.data_version = sqlite_backend.data_version(path)
+    news = sqlite_backend.changes_since(path, state.change_seq)
+    if news is None:
+        state.adopt(_load_sqlite_state())
+        return True
+    changes, state.change_seq = news
+    # These rows are already in the database, so they leave `dirty` as it was.
+    dirty = state.dirty
+    for change in changes:
+        apply_change(state, change)
+    state.dirty = dirty
+    return bool(changes)
+
+
+def _write_sqlite_changes(state: Dict[str, Any], changes: List[Dict[str, Any]]) -> None:
+    path = db_path()
+    if not isinstance(state, State):
+        sqlite_backend.write_changes(path, changes)
+        return
+    while True:
+        try:
+            seq = sqlite_backend.write_changes(path, changes, since=state.change_seq)
+        except sqlite3.IntegrityError:
+            # A state that does not know its log position cannot tell which
+            # of our ids were taken: reload before renumbering.
+            state.adopt(_load_sqlite_state())
+            _rebase(state, changes)
+            continue
+        if seq is not None:
+            break
+        # Another process committed first: apply its rows and replay ours on top.
+        _catch_up_sqlite(state)
+        _rebase(state, changes)
+    if state.change_seq is not None:
+        state.change_seq = seq
+    state.data_version = sqlite_backend.data_version(path)
+
+
+def encode_change(state: Dict[str, Any], change: Dict[str, Any]) -> str:
+    """Return the journal line for `change`, tagged with the snapshot generation.
+
+    A new note's body is moved to the blob store first, so the line only
+    carries its hash.
+    """
+    if isinstance(change.get("note"), LazyNote):
+        change["note"].externalize()
+    entry = dict(change, gen=state.get("generation", 0))
+    return json.dumps(entry, separators=(",", ":")) + "\n"
+
+
+def append_journal(lines: List[str], fsync: bool = True) -> int:
+    """Append encoded journal `lines` with a single write (and fsync).
+
+    Returns the journal size in bytes afterwards.
+    """
+    data = "".join(lines)
+    with open(journal_path(), "a", encoding="utf-8") as fh:
+        fh.write(data)
+        fh.flush()
+        if fsync:
+            os.fsync(fh.fileno())
+        # Entries are ASCII JSON, so characters are bytes.
+        metrics.count("bytes_written", len(data))
+        return fh.tell()
+
+
+def fsync_journal() -> None:
+    """Flush appends made with ``fsync=False`` to disk."""
+    if _use_sqlite() or not os.path.exists(journal_path()):
+        return
+    with open(journal_path(), "rb") as fh:
+        os.fsync(fh.fileno())
+
+
+def _mark_clean(state: Dict[str, Any]) -> None:
+    if isinstance(state, State):
+        state.dirty = False
 
 
 def next_task_id(state: Dict[str, Any]) -> int:
     """Return the next integer id for a new task.
 
     Looks at `state["tasks"]` for existing integer `id` values and
-    returns max(id) + 1 or 1 if there are no tasks.
+    returns max(id) + 1 or 1 if there are no tasks. A `State` answers
+    from its ``last_task_id`` counter instead; otherwise, with the
+    "sqlite" backend, the maximum comes from the primary key index.
     """
+    if isinstance(state, State):
+        return state["last_task_id"] + 1
+    if _use_sqlite():
+        return sqlite_backend.max_id(db_path(), "tasks") + 1
     tasks = state.get("tasks") or []
     ids = [t.get("id") for t in tasks if isinstance(t, dict) and isinstance(t.get("id"), int)]
     return max(ids) + 1 if ids else 1
@@ -38,6 +827,114 @@ def next_note_id(state: Dict[str, Any]) -> int:
 
     Same logic as `next_task_id` but for `state["notes"]`.
     """
+    if isinstance(state, State):
+        return state["last_note_id"] + 1
+    if _use_sqlite():
+        return sqlite_backend.max_id(db_path(), "notes") + 1
     notes = state.get("notes") or []
     ids = [n.get("id") for n in notes if isinstance(n, dict) and isinstance(n.get("id"), int)]
     return max(ids) + 1 if ids else 1
+
+
+def find_task(state: Dict[str, Any], task_id: int) -> Optional[Dict[str, Any]]:
+    """Return the task with `task_id`, or None if there is no such task.
+
+    A `State` answers from its id map. Otherwise, with the "sqlite"
+    backend this is a primary key lookup and the returned dict is a copy
+    of the stored row.
+    """
+    if isinstance(state, State):
+        return state.tasks_by_id.get(task_id)
+    if _use_sqlite():
+        return sqlite_backend.get_task(db_path(), task_id)
+    return _scan(state.get("tasks"), task_id)
+
+
+def find_note(state: Dict[str, Any], note_id: int) -> Optional[Dict[str, Any]]:
+    """Return the note with `note_id`, or None. See `find_task`."""
+    if isinstance(state, State):
+        return state.notes_by_id.get(note_id)
+    if _use_sqlite():
+        return sqlite_backend.get_note(db_path(), note_id)
+    return _scan(state.get("notes"), note_id)
+
+
+def filter_tasks(
+    state: Dict[str, Any],
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    tag: Optional[str] = None,
+    due_before: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Return the tasks matching every given filter (None means "any").
+
+    A `State` answers from its `TaskIndex` buckets; a plain dict is
+    scanned. See `TaskIndex.query` for the filter semantics.
+    """
+    if isinstance(state, State):
+        ids = state.task_index.query(status=status, priority=priority, tag=tag, due_before=due_before)
+        return _lookup(state.tasks_by_id, ids)
+    return [
+        t for t in state.get("tasks") or []
+        if isinstance(t, dict) and task_matches(t, status, priority, tag, due_before)
+    ]
+
+
+def _scan(records: Optional[List[Dict[str, Any]]], record_id: Any) -> Optional[Dict[str, Any]]:
+    for r in records or []:
+        if isinstance(r, dict) and r.get("id") == record_id:
+            return r
+    return None
+
+
+@metrics.timed("search.scan")
+def search_records(state: Dict[str, Any], query: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Return (tasks, notes) whose text contains `query` (case-insensitive).
+
+    Tasks match on title or description, notes on title or content.
+    When `state` carries a search index, its trigram postings narrow the
+    records to a few candidates first; the same substring check is then
+    applied to those, so results are identical to a full scan. A `State`
+    is always searched in memory, so changes not yet written are found
+    too; with the "sqlite" backend a plain dict is answered by the
+    database.
+    """
+    if _use_sqlite() and not isinstance(state, State):
+        return sqlite_backend.search(db_path(), query)
+    tasks = state.get("tasks") or []
+    notes = state.get("notes") or []
+    index = getattr(state, "search_index", None)
+    if index is not None:
+        _load_note_index(state)
+        tasks = _lookup(state.tasks_by_id, index.task_grams.candidates(query))
+        notes = _lookup(state.notes_by_id, index.note_grams.candidates(query))
+    return (
+        [t for t in tasks if matches(t, query, TASK_FIELDS)],
+        [n for n in notes if matches(n, query, NOTE_FIELDS)],
+    )
+
+
+@metrics.timed("search.ranked")
+def ranked_search(state: Dict[str, Any], query: str, top: int) -> List[Tuple[str, Dict[str, Any], float]]:
+    """Return the `top` best BM25 matches for `query` as (kind, record, score).
+
+    `kind` is "task" or "note". Uses the state's search index, building a
+    temporary one if `state` does not carry it.
+    """
+    if not isinstance(state, State):
+        state = State(state)
+    if state.search_index is None:
+        state.search_index = SearchIndex.build(state)
+    _load_note_index(state)
+    index = state.search_index
+    results = []
+    for score, kind, rid in index.top_k(query, top):
+        record = (state.tasks_by_id if kind == "task" else state.notes_by_id).get(rid)
+        if record is not None:
+            results.append((kind, record, score))
+    return results
+
+
+def _lookup(by_id: Dict[int, Dict[str, Any]], ids: Iterable[int]) -> List[Dict[str, Any]]:
+    """Return the records for `ids` in id order, skipping unknown ids."""
+    return [by_id[i] for i in sorted(ids) if i in by_id]
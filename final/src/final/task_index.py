@@ -0,0 +1,127 @@
+"""Secondary indexes over tasks for filtered listing.
+
+`TaskIndex` keeps task ids bucketed by status, priority and tag, plus a
+due-date index sorted by date, so `list-tasks` filters and `ai-plan`
+candidate selection do not have to scan every task.
+"""
+import bisect
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+class TaskIndex:
+    """Status / priority / tag buckets and a sorted due-date index."""
+
+    def __init__(self) -> None:
+        self.by_status: Dict[str, Set[int]] = {}
+        self.by_priority: Dict[str, Set[int]] = {}
+        self.by_tag: Dict[str, Set[int]] = {}
+        # Sorted (due_date, id) pairs for tasks that have a due date.
+        self.due: List[Tuple[str, int]] = []
+        # id -> the values each task is currently filed under.
+        self._keys: Dict[int, Tuple[Any, Any, Tuple[str, ...], Optional[str]]] = {}
+
+    @classmethod
+    def build(cls, tasks: Iterable[Dict[str, Any]]) -> "TaskIndex":
+        index = cls()
+        for t in tasks:
+            if isinstance(t, dict):
+                index.add(t)
+        return index
+
+    def add(self, task: Dict[str, Any]) -> None:
+        """File `task` under its current values, replacing any older entry."""
+        tid = task.get("id")
+        if tid in self._keys:
+            self.remove(tid)
+        status = task.get("status")
+        priority = task.get("priority")
+        tags = tuple(task.get("tags") or ())
+        due = task.get("due_date") or None
+        self._keys[tid] = (status, priority, tags, due)
+        self.by_status.setdefault(status, set()).add(tid)
+        self.by_priority.setdefault(priority, set()).add(tid)
+        for tag in tags:
+            self.by_tag.setdefault(tag, set()).add(tid)
+        if isinstance(due, str):
+            bisect.insort(self.due, (due, tid))
+
+    def remove(self, task_id: int) -> None:
+        keys = self._keys.pop(task_id, None)
+        if keys is None:
+            return
+        status, priority, tags, due = keys
+        _discard(self.by_status, status, task_id)
+        _discard(self.by_priority, priority, task_id)
+        for tag in tags:
+            _discard(self.by_tag, tag, task_id)
+        if isinstance(due, str):
+            i = bisect.bisect_left(self.due, (due, task_id))
+            if i < len(self.due) and self.due[i] == (due, task_id):
+                del self.due[i]
+
+    def clear(self) -> None:
+        self.by_status.clear()
+        self.by_priority.clear()
+        self.by_tag.clear()
+        self.due.clear()
+        self._keys.clear()
+
+    def query(
+        self,
+        status: Optional[str] = None,
+        priority: Optional[str] = None,
+        tag: Optional[str] = None,
+        due_before: Optional[str] = None,
+    ) -> List[int]:
+        """Return ids (ascending) of tasks matching every given filter.
+
+        `due_before` keeps tasks whose due date sorts strictly before it
+        (ISO ``YYYY-MM-DD`` strings sort chronologically); tasks without
+        a due date never match it.
+        """
+        sets: List[Set[int]] = []
+        if status is not None:
+            sets.append(self.by_status.get(status, set()))
+        if priority is not None:
+            sets.append(self.by_priority.get(priority, set()))
+        if tag is not None:
+            sets.append(self.by_tag.get(tag, set()))
+        if due_before is not None:
+            end = bisect.bisect_left(self.due, (due_before,))
+            sets.append({tid for _, tid in self.due[:end]})
+        if not sets:
+            return sorted(self._keys)
+        sets.sort(key=len)
+        result = set(sets[0])
+        for s in sets[1:]:
+            result &= s
+        return sorted(result)
+
+
+def _discard(buckets: Dict[Any, Set[int]], key: Any, task_id: int) -> None:
+    bucket = buckets.get(key)
+    if bucket is not None:
+        bucket.discard(task_id)
+        if not bucket:
+            del buckets[key]
+
+
+def task_matches(
+    task: Dict[str, Any],
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    tag: Optional[str] = None,
+    due_before: Optional[str] = None,
+) -> bool:
+    """Return True if `task` passes the same filters as `TaskIndex.query`."""
+    if status is not None and task.get("status") != status:
+        return False
+    if priority is not None and task.get("priority") != priority:
+        return False
+    if tag is not None and tag not in (task.get("tags") or []):
+        return False
+    if due_before is not None:
+        due = task.get("due_date")
+        if not isinstance(due, str) or not due or due >= due_before:
+            return False
+    return True
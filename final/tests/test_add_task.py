@@ -0,0 +1,47 @@
+import threading
+
+from final import ai_agent, commands
+from final.storage import State
+
+
+def _feed(monkeypatch, answers, log):
+    """Answer add-task prompts in order, recording each prompt's first word."""
+    it = iter(answers)
+
+    def fake_input(prompt=""):
+        log.append(prompt.split()[0])
+        return next(it)
+
+    monkeypatch.setattr("builtins.input", fake_input)
+
+
+def test_title_is_suggested_while_other_fields_are_entered(monkeypatch):
+    log = []
+
+    def fake_summary(description):
+        log.append("summarize")
+        return "Buy apples"
+
+    monkeypatch.setattr(ai_agent, "summarize_description", fake_summary)
+    _feed(monkeypatch, ["go buy apples", "food", "high", "", ""], log)
+
+    change = commands.add_task(State({"tasks": [], "notes": []}))
+
+    assert change["task"]["title"] == "Buy apples"
+    assert change["task"]["tags"] == ["food"]
+    # Tags, priority and due date are asked before waiting for the suggestion.
+    prompts = [p for p in log if p != "summarize"]
+    assert prompts == ["description:", "tags", "priority", "due_date", "Title"]
+
+
+def test_slow_suggestion_times_out(monkeypatch, capsys):
+    release = threading.Event()
+    monkeypatch.setattr(ai_agent, "summarize_description", lambda d: release.wait(5) and "late")
+    monkeypatch.setattr(commands, "TITLE_SUGGESTION_TIMEOUT", 0.05)
+    _feed(monkeypatch, ["desc", "", "", "", "My title"], [])
+
+    change = commands.add_task(State({"tasks": [], "notes": []}))
+    release.set()
+
+    assert change["task"]["title"] == "My title"
+    assert "taking too long" in capsys.readouterr().out
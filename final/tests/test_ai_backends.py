@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from final import ai_agent, ai_cache, commands
+from final.ai_backends import Backend, extractive_title, rule_based_plan
+from final.storage import State
+
+
+def test_extractive_title_picks_keywords_in_order():
+    assert extractive_title("go to groceries and buy apples") == "Groceries buy apples"
+    description = "Fix the login crash. The login page crashes on Safari. Check login on Friday."
+    # "login" scores highest; picked words keep their order in the text.
+    assert extractive_title(description, max_words=3) == "Fix login crash"
+    assert extractive_title("") == ""
+
+
+def test_incomplete_backend_fails_when_created():
+    class TitlesOnly(Backend):
+        def summarize(self, description, use_cache=True):
+            return description
+
+    with pytest.raises(TypeError):
+        TitlesOnly()
+
+
+def test_rule_based_plan_is_deterministic():
+    tasks = [
+        {"id": 3, "title": "Ship release", "priority": "high", "due_date": "2025-01-09"},
+        {"id": 1, "title": "Water plants", "priority": "low", "due_date": "2025-01-10"},
+        {"id": 2, "title": "Read book"},
+    ]
+    plan = rule_based_plan(tasks, today=date(2025, 1, 10), limit=2)
+    assert plan.splitlines() == [
+        "1. [3] Ship release (high priority, overdue since 2025-01-09)",
+        "2. [1] Water plants (low priority, due today)",
+        "(1 more open tasks can wait.)",
+    ]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        ai_agent.get_backend("nope")
+
+
+def test_hybrid_plan_streams_local_then_remote(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_cache, "CACHE_FILE", str(tmp_path / "ai_cache.db"))
+    monkeypatch.setattr(ai_agent, "_call_chat", lambda messages, stream=False, **kw: "1. remote")
+    tasks = [{"id": 1, "title": "Ship release", "status": "open", "priority": "high"}]
+
+    pieces = list(ai_agent.stream_plan(tasks, backend="hybrid"))
+    assert pieces[0].startswith("1. [1] Ship release")
+    assert pieces[-1] == "1. remote"
+
+
+def test_add_task_falls_back_to_local_title(monkeypatch):
+    def failing(description):
+        raise RuntimeError("no network")
+
+    monkeypatch.setattr(ai_agent, "summarize_description", failing)
+    answers = iter(["go to groceries and buy apples", "", "", "", ""])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+
+    change = commands.add_task(State({"tasks": [], "notes": []}))
+    assert change["task"]["title"] == "Groceries buy apples"
+    assert change["task"]["title_source"] == "local"
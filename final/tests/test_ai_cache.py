@@ -0,0 +1,32 @@
+from final import ai_agent, ai_cache
+
+
+def test_repeated_description_skips_api_call(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_cache, "CACHE_FILE", str(tmp_path / "ai_cache.db"))
+    monkeypatch.setattr(ai_cache, "ENABLED", True)
+    calls = []
+
+    def fake_chat(messages, **kwargs):
+        calls.append(messages)
+        return "Buy apples at the store"
+
+    monkeypatch.setattr(ai_agent, "_call_chat", fake_chat)
+
+    assert ai_agent.summarize_description("go to groceries and buy apples") == "Buy apples at the store"
+    assert ai_agent.summarize_description("  Go to groceries   and buy apples ") == "Buy apples at the store"
+    assert len(calls) == 1
+    assert ai_cache.get_cache().stats()["hits"] == 1
+
+    ai_agent.summarize_description("go to groceries and buy apples", use_cache=False)
+    assert len(calls) == 2
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ai_cache.AICache(str(tmp_path / "c.db"), max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    cache.close()
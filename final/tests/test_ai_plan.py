@@ -0,0 +1,146 @@
+import threading
+from datetime import date
+
+import pytest
+
+from final import ai_agent, ai_cache
+
+
+@pytest.fixture(autouse=True)
+def plan_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(ai_cache, "CACHE_FILE", str(tmp_path / "ai_cache.db"))
+    monkeypatch.setattr(ai_cache, "ENABLED", True)
+
+
+def _task(tid, priority="medium", due=None):
+    return {"id": tid, "title": f"task {tid}", "status": "open", "priority": priority, "due_date": due}
+
+
+def test_rank_tasks_prefers_priority_and_due_date():
+    today = date(2025, 1, 10)
+    tasks = [
+        _task(1, "low"),
+        _task(2, "high"),
+        _task(3, "medium", "2025-01-05"),  # overdue
+        _task(4, "medium", "2025-03-01"),
+    ]
+    ranked = ai_agent.rank_tasks(tasks, 3, today=today)
+    assert [t["id"] for t in ranked] == [3, 2, 4]
+
+
+def test_small_plan_is_one_capped_request(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ai_agent, "_call_chat", lambda messages, **kw: calls.append(messages) or "1. do it")
+    monkeypatch.setattr(ai_agent, "PLAN_MAX_PROMPT_TOKENS", 200)
+
+    tasks = [_task(i) for i in range(1, 40)]
+    assert ai_agent.generate_plan(tasks, top_k=20) == "1. do it"
+
+    assert len(calls) == 1
+    prompt = calls[0][1]["content"]
+    assert ai_agent.estimate_tokens(calls[0][0]["content"] + prompt) <= 200 + 5
+    assert 0 < prompt.count("ID: ") < 20
+
+
+def test_large_plan_is_map_reduced(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_chat(messages, **kw):
+        with lock:
+            calls.append(messages[1]["content"])
+        if messages[1]["content"].startswith("Each plan"):
+            return "merged"
+        return "1. partial"
+
+    monkeypatch.setattr(ai_agent, "_call_chat", fake_chat)
+    monkeypatch.setattr(ai_agent, "PLAN_CHUNK_SIZE", 10)
+
+    tasks = [_task(i) for i in range(1, 101)]
+    assert ai_agent.generate_plan(tasks, top_k=25) == "merged"
+
+    # 25 candidates in chunks of 10: three map requests and one merge.
+    assert len(calls) == 4
+    assert sum(c.count("ID: ") for c in calls[:3]) == 25
+    assert calls[-1].count("Plan ") == 3
+
+
+def test_default_plan_of_a_large_backlog_is_map_reduced(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_chat(messages, **kw):
+        with lock:
+            calls.append(messages[1]["content"])
+        return "merged" if messages[1]["content"].startswith("Each plan") else "1. partial"
+
+    monkeypatch.setattr(ai_agent, "_call_chat", fake_chat)
+
+    tasks = [_task(i) for i in range(1, 301)]
+    assert ai_agent.generate_plan(tasks) == "merged"
+
+    chunks = -(-ai_agent.PLAN_TOP_K // ai_agent.PLAN_CHUNK_SIZE)
+    assert chunks > 1
+    assert len(calls) == chunks + 1
+    assert sum(c.count("ID: ") for c in calls[:-1]) == ai_agent.PLAN_TOP_K
+
+
+def test_ai_plan_streams_and_reports_latency(monkeypatch, capsys):
+    from final import commands
+    from final.storage import State
+
+    def fake_chat(messages, stream=False, **kw):
+        return iter(["1. first", "\n2. second"]) if stream else "unused"
+
+    monkeypatch.setattr(ai_agent, "_call_chat", fake_chat)
+    commands.ai_plan(State({"tasks": [_task(1), _task(2)], "notes": []}))
+
+    out = capsys.readouterr().out
+    assert "AI-generated plan:\n1. first\n2. second\n" in out
+    assert "first output after" in out and "total" in out
+
+
+def test_streaming_falls_back_when_unsupported(monkeypatch):
+    class NoStreaming:
+        class chat:
+            class completions:
+                @staticmethod
+                def create(**kw):
+                    raise RuntimeError("stream not supported")
+
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(ai_agent, "get_client", lambda: NoStreaming)
+    monkeypatch.setattr(ai_agent, "_call_chat", lambda messages, **kw: "whole plan")
+
+    messages = [{"role": "user", "content": "plan"}]
+    assert list(ai_agent._stream_chat(messages, ai_agent.MODEL, 0.4, 500)) == ["whole plan"]
+
+
+def test_unchanged_backlog_reuses_cached_plan(monkeypatch):
+    calls = []
+    monkeypatch.setattr(ai_agent, "_call_chat", lambda messages, **kw: calls.append(messages) or f"plan {len(calls)}")
+    tasks = [_task(1, "high"), _task(2)]
+
+    assert ai_agent.generate_plan(tasks) == "plan 1"
+    assert ai_agent.generate_plan([dict(t) for t in tasks]) == "plan 1"
+    assert len(calls) == 1
+
+    tasks[1]["title"] = "edited"
+    assert ai_agent.generate_plan(tasks) == "plan 2"
+    tasks.append(_task(3))
+    assert ai_agent.generate_plan(tasks) == "plan 3"
+    tasks[0]["status"] = "done"
+    assert ai_agent.generate_plan(tasks) == "plan 4"
+    assert ai_agent.generate_plan(tasks, use_cache=False) == "plan 5"
+
+
+@pytest.mark.parametrize("top", ["0", "-5"])
+def test_ai_plan_rejects_non_positive_top(monkeypatch, top):
+    from final import CommandError, run_command
+    from final.flusher import Flusher
+    from final.storage import State
+
+    monkeypatch.setattr(ai_agent, "_call_chat", lambda messages, **kw: pytest.fail("plan was requested"))
+    state = State({"tasks": [_task(1)], "notes": []})
+    with pytest.raises(CommandError, match="expected 1 or more"):
+        run_command(state, Flusher(state, mode="batch"), f"ai-plan --top {top}", interactive=False)
@@ -0,0 +1,90 @@
+import contextlib
+import io
+import json
+
+from final import batch, commands, sqlite_backend, storage
+from final.flusher import Flusher
+
+
+def test_script_runs_under_one_load_and_save(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    saves = []
+    real_save = storage.save_state
+    monkeypatch.setattr(storage, "save_state", lambda state: saves.append(1) or real_save(state))
+    script = tmp_path / "script.txt"
+    script.write_text(
+        "# setup\n"
+        'add-task --title "Write report" --priority high --tags work,q1 --due-date 2025-01-31\n'
+        "add-task --description 'go to groceries and buy apples'\n"
+        "add-note --title Ideas --content 'try batch mode'\n"
+        "complete-task 1\n"
+        "add-task\n"
+        "reset-state\n"
+        "complete-task x\n"
+    )
+    out = io.StringIO()
+
+    assert batch.main(["run", str(script)], out=out) == 1
+
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [r["line"] for r in results] == [2, 3, 4, 5, 6, 7, 8]
+    assert [r["ok"] for r in results] == [True, True, True, True, False, False, False]
+    assert results[0]["output"] == "Added task 1: Write report"
+    assert results[-1]["error"] == "Invalid task id: x"
+    assert len(saves) == 1
+
+    state = storage.load_state()
+    assert [(t["title"], t["status"]) for t in state["tasks"]] == [
+        ("Write report", "done"),
+        ("Groceries buy apples", "open"),
+    ]
+    assert state["tasks"][0]["tags"] == ["work", "q1"]
+    assert storage.find_note(state, 1)["content"] == "try batch mode"
+
+
+def test_batch_reads_stdin_and_stops_at_quit(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    out = io.StringIO()
+    stdin = io.StringIO("add-task --title one\nquit\nadd-task --title two\n")
+
+    assert batch.main(["--batch"], stdin=stdin, out=out) == 0
+
+    assert len(out.getvalue().splitlines()) == 2
+    assert [t["title"] for t in storage.load_state()["tasks"]] == ["one"]
+
+
+def test_sqlite_batch_searches_its_own_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr(storage, "BACKEND", "sqlite")
+    out = io.StringIO()
+    stdin = io.StringIO('add-task --title "buy milk"\nsearch milk\n')
+
+    assert batch.main(["--batch"], stdin=stdin, out=out) == 0
+
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert results[1]["output"].startswith("Task [1] buy milk")
+    sqlite_backend.close(storage.db_path())
+
+
+def test_renumbering_is_reported_by_the_command(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    flusher = Flusher(state, mode="batch")
+    other = storage.load_state()
+    real_sync = flusher.sync
+
+    def sync_then_lose_race():
+        real_sync()
+        # Another session adds task 1 after we synced but before we commit.
+        with contextlib.redirect_stdout(io.StringIO()):
+            storage.log_change(other, commands.create_task(other, title="theirs"))
+
+    monkeypatch.setattr(flusher, "sync", sync_then_lose_race)
+    result, _ = batch.execute(state, flusher, "add-task --title mine")
+    flusher.close()
+
+    assert result["output"].splitlines() == [
+        "Added task 1: mine",
+        "Task 1 was renumbered to 2 (id taken by another session).",
+    ]
+    assert [(t["id"], t["title"]) for t in storage.load_state()["tasks"]] == [(1, "theirs"), (2, "mine")]
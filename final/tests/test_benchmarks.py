@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import suite  # noqa: E402
+import synthetic  # noqa: E402
+from final.importer import validate_note, validate_task  # noqa: E402
+
+
+def test_generator_is_seeded_and_valid():
+    state = synthetic.generate_state(300, 50, seed=7)
+    assert state == synthetic.generate_state(300, 50, seed=7)
+    assert state != synthetic.generate_state(300, 50, seed=8)
+    assert [t["id"] for t in state["tasks"]] == list(range(1, 301))
+    for task in state["tasks"]:
+        validate_task(task, "")
+    for note in state["notes"]:
+        validate_note(note, "")
+    priorities = {t["priority"] for t in state["tasks"]}
+    assert priorities == {"low", "medium", "high"}
+    assert any(t["due_date"] is None for t in state["tasks"])
+    assert any(t["status"] == "done" for t in state["tasks"])
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {"load_state/1000": 0.010, "search_all/1000": 0.001}
+    results = {"load_state/1000": 0.0124, "search_all/1000": 0.0013, "list_tasks/1000": 0.5}
+    assert suite.compare(results, baseline, 0.25) == ["search_all/1000"]
+
+
+def test_suite_runs_on_a_small_state(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(suite, "MIN_RUN_SECONDS", 0)
+    monkeypatch.setattr(suite.storage, "STATE_FILE", suite.storage.STATE_FILE)
+    baseline = tmp_path / "baseline.json"
+    assert suite.main(["--sizes", "50", "--repeat", "1", "--baseline", str(baseline), "--update-baseline"]) == 0
+    assert "complete_task/50" in baseline.read_text()
+    assert suite.main(["--sizes", "50", "--repeat", "1", "--baseline", str(baseline), "--threshold", "1000"]) == 0
@@ -0,0 +1,64 @@
+import json
+
+from final import blob_store, commands, storage
+
+
+def test_note_bodies_move_to_blob_store(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    body = "Lecture on PKMS " * 100
+    change = {"op": "add_note", "note": {"id": 1, "title": "Lecture", "content": body, "tags": []}}
+    storage.apply_change(state, change)
+    storage.log_change(state, change)
+    storage.save_state(state)
+
+    on_disk = json.loads((tmp_path / "state.json").read_text())
+    note = on_disk["notes"][0]
+    assert "content" not in note
+    assert blob_store.get(storage.blob_dir(), note["content_hash"]) == body
+
+    reloaded = storage.load_state()
+    assert reloaded["notes"][0]["content"] == body
+    commands.view_note(reloaded, 1)
+    assert body in capsys.readouterr().out
+    assert storage.search_records(reloaded, "pkms lecture")[1][0]["id"] == 1
+
+
+def test_blob_put_is_idempotent(tmp_path):
+    first = blob_store.put(str(tmp_path), "same text")
+    second = blob_store.put(str(tmp_path), "same text")
+    assert first == second
+    assert len(list(tmp_path.rglob("*.z"))) == 1
+
+
+def test_compaction_removes_orphaned_blobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr(blob_store, "GC_MIN_AGE", 0)
+    state = storage.load_state()
+    for note_id, body in ((1, "kept body"), (2, "dropped body")):
+        change = {"op": "add_note", "note": {"id": note_id, "title": "N", "content": body, "tags": []}}
+        storage.apply_change(state, change)
+        storage.log_change(state, change)
+    storage.save_state(state)
+
+    def blobs():
+        return sorted(p.name[:-2] for p in tmp_path.rglob("*.z"))
+
+    assert blobs() == sorted(blob_store.content_hash(b) for b in ("kept body", "dropped body"))
+
+    # Reset, then add the first body back under a new note.
+    storage.log_change(state, commands.reset_state(state, confirmed=True))
+    change = {"op": "add_note", "note": {"id": 3, "title": "N", "content": "kept body", "tags": []}}
+    storage.apply_change(state, change)
+    storage.log_change(state, change)
+    assert len(blobs()) == 2  # still referenced by the journal
+    storage.save_state(state)
+
+    assert blobs() == [blob_store.content_hash("kept body")]
+    assert storage.load_state()["notes"][0]["content"] == "kept body"
+
+
+def test_recent_blobs_are_not_collected(tmp_path):
+    digest = blob_store.put(str(tmp_path), "not committed yet")
+    assert blob_store.collect_garbage(str(tmp_path), []) == 0
+    assert blob_store.get(str(tmp_path), digest) == "not committed yet"
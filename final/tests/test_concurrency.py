@@ -0,0 +1,48 @@
+from final import sqlite_backend, storage
+
+
+def _add(state, title):
+    task = {"id": storage.next_task_id(state), "title": title, "status": "open"}
+    change = {"op": "add_task", "task": task}
+    storage.apply_change(state, change)
+    return change
+
+
+def test_two_sessions_do_not_lose_updates(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    a = storage.load_state()
+    b = storage.load_state()
+
+    storage.log_change(a, _add(a, "from a"))
+    # b still thinks id 1 is free; its task is renumbered instead of clobbering a's.
+    storage.log_change(b, _add(b, "from b"))
+    assert [(t["id"], t["title"]) for t in b["tasks"]] == [(1, "from a"), (2, "from b")]
+
+    assert storage.sync(a)
+    assert storage.find_task(a, 2)["title"] == "from b"
+
+    change = {"op": "update_task", "id": 1, "fields": {"status": "done"}}
+    storage.apply_change(b, change)
+    storage.log_change(b, change)
+
+    # a compacts; b's next write notices the new snapshot and reloads.
+    storage.sync(a)
+    storage.save_state(a)
+    storage.log_change(b, _add(b, "after compaction"))
+
+    final = storage.load_state()
+    assert [(t["id"], t["status"]) for t in final["tasks"]] == [(1, "done"), (2, "open"), (3, "open")]
+
+
+def test_sqlite_sessions_renumber_on_conflict(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr(storage, "BACKEND", "sqlite")
+    a = storage.load_state()
+    b = storage.load_state()
+
+    storage.log_change(a, _add(a, "from a"))
+    b_change = _add(b, "from b")
+    storage.log_change(b, b_change)
+    assert b_change["task"]["id"] == 2
+    assert [t["title"] for t in storage.load_state()["tasks"]] == ["from a", "from b"]
+    sqlite_backend.close(storage.db_path())
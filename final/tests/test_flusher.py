@@ -0,0 +1,39 @@
+import os
+
+from final import storage
+from final.flusher import Flusher
+
+
+def _add(state, task_id):
+    change = {"op": "add_task", "task": {"id": task_id, "title": f"T{task_id}", "status": "open"}}
+    storage.apply_change(state, change)
+    return change
+
+
+def test_debounced_flush_coalesces_and_close_persists(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    flusher = Flusher(state, mode="debounced", delay=60)
+    for i in range(1, 4):
+        flusher.record(_add(state, i))
+    assert state.dirty
+    assert not os.path.exists(storage.journal_path())
+
+    flusher.flush()
+    assert flusher.writes == 1
+    assert len(storage.read_journal()) == 3
+
+    flusher.record(_add(state, 4))
+    flusher.close()
+    assert not state.dirty
+    assert [t["id"] for t in storage.load_state()["tasks"]] == [1, 2, 3, 4]
+
+
+def test_unchanged_state_is_not_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    flusher = Flusher(state, mode="durable")
+    flusher.record(None)
+    flusher.close()
+    assert flusher.writes == 0
+    assert not os.path.exists(storage.STATE_FILE)
@@ -0,0 +1,131 @@
+import gzip
+import http.client
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+
+import final
+from final import commands, http_api, storage
+from final.flusher import Flusher
+
+
+def _api(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    for i in range(1, 121):
+        commands.create_task(state, title=f"Report part {i}", tags="work" if i % 2 else "home")
+    commands.create_note(state, "Ideas", content="ship the http api")
+    storage.save_state(state)
+    return _restart()
+
+
+def _restart():
+    state = storage.load_state()
+    return http_api.Api(state, Flusher(state))
+
+
+def _get(api, target, **headers):
+    status, response_headers, body = api.handle("GET", target, {k.replace("_", "-"): v for k, v in headers.items()})
+    if response_headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return status, response_headers, json.loads(body) if body else None
+
+
+def test_pagination_filters_and_search(tmp_path, monkeypatch):
+    api = _api(tmp_path, monkeypatch)
+
+    status, _, page = _get(api, "/tasks?tag=work&offset=10&limit=5")
+    assert status == 200
+    assert page["total"] == 60
+    assert [t["id"] for t in page["items"]] == [21, 23, 25, 27, 29]
+    assert _get(api, "/tasks")[2]["limit"] == http_api.PAGE_SIZE
+    assert _get(api, "/tasks?limit=x")[0] == 400
+    assert _get(api, "/tasks/7")[2]["title"] == "Report part 7"
+    assert _get(api, "/tasks/999")[0] == 404
+
+    _, _, notes = _get(api, "/notes")
+    created_at = notes["items"][0].pop("created_at")
+    assert notes["items"] == [{"id": 1, "title": "Ideas", "tags": []}]
+    assert created_at[:4].isdigit()
+    assert _get(api, "/notes/1")[2]["content"] == "ship the http api"
+
+    _, _, hits = _get(api, "/search?q=http")
+    assert [(h["kind"], h["id"]) for h in hits["items"]] == [("note", 1)]
+    _, _, ranked = _get(api, "/search?q=part%2012&top=3")
+    assert ranked["items"][0]["id"] == 12 and "score" in ranked["items"][0]
+    assert _get(api, "/search")[0] == 400
+
+
+def test_etag_gzip_and_writes(tmp_path, monkeypatch):
+    api = _api(tmp_path, monkeypatch)
+
+    status, headers, _ = _get(api, "/tasks?limit=100", accept_encoding="gzip")
+    assert headers["Content-Encoding"] == "gzip"
+    etag = headers["ETag"]
+    assert api.handle("GET", "/tasks?limit=100", {"if-none-match": etag})[0] == 304
+
+    body = json.dumps({"title": "Write docs", "tags": ["docs"], "priority": "high"}).encode()
+    status, headers, created = api.handle("POST", "/tasks", {}, body)
+    assert status == 201
+    assert json.loads(created)["id"] == 121
+    assert headers["ETag"] != etag
+    assert _get(api, "/tasks?limit=100", if_none_match=etag)[0] == 200
+    assert api.handle("POST", "/tasks", {}, b'{"priority": "urgent", "title": "x"}')[0] == 400
+    body = json.dumps({"title": "Old", "tags": "a,b", "status": "done", "created_at": "2024-05-01T09:00:00"})
+    created = json.loads(api.handle("POST", "/tasks", {}, body.encode())[2])
+    assert (created["tags"], created["status"], created["created_at"]) == (["a", "b"], "done", "2024-05-01T09:00:00")
+    assert storage.find_task(api.state, created["id"])["created_at"] == "2024-05-01T09:00:00"
+
+    status, _, done = api.handle("POST", "/tasks/121/complete", {})
+    assert status == 200 and json.loads(done)["status"] == "done"
+    assert api.handle("POST", "/notes", {}, b'{"title": "Log", "content": "body"}')[0] == 201
+    assert api.handle("DELETE", "/tasks/1", {})[0] == 405
+
+    # Writes are saved, and a fresh load sees them.
+    reloaded = storage.load_state()
+    assert storage.find_task(reloaded, 121)["status"] == "done"
+    assert storage.find_note(reloaded, 2)["content"] == "body"
+
+
+def test_serves_over_http(tmp_path):
+    src = os.path.dirname(os.path.dirname(final.__file__))
+    env = dict(os.environ, PYTHONPATH=src, FINAL_AI_BACKEND="local")
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "import final; final.main(['http', '--port', '0'])"],
+        cwd=tmp_path, env=env, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        port = int(re.search(r":(\d+)/", proc.stderr.readline()).group(1))
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("POST", "/notes", body=json.dumps({"title": "Hello"}))
+        response = conn.getresponse()
+        assert response.status == 201 and json.loads(response.read())["id"] == 1
+        conn.request("GET", "/notes")
+        response = conn.getresponse()
+        assert response.status == 200
+        assert json.loads(response.read())["total"] == 1
+        conn.request("GET", "/notes", headers={"If-None-Match": response.getheader("ETag")})
+        response = conn.getresponse()
+        assert response.status == 304 and response.read() == b""
+        conn.close()
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        assert proc.wait(timeout=10) == 0
+
+
+def test_etags_survive_restarts_but_not_foreign_writes(tmp_path, monkeypatch):
+    api = _api(tmp_path, monkeypatch)
+    etag = api.handle("GET", "/tasks", {})[1]["ETag"]
+    assert api.handle("GET", "/nowhere", {"if-none-match": "*"})[0] == 404
+    assert api.handle("GET", "/tasks/999", {"if-none-match": etag})[0] == 404
+
+    # A restarted server answers 304 for the same saved data...
+    assert _restart().handle("GET", "/tasks", {"if-none-match": etag})[0] == 304
+
+    # ...but not once another process has written.
+    other = storage.load_state()
+    storage.log_change(other, commands.create_task(other, title="From elsewhere"))
+    assert _restart().handle("GET", "/tasks", {"if-none-match": etag})[0] == 200
@@ -9,3 +9,18 @@ def test_next_task_id_empty():
 def test_next_task_id_nonempty():
     state = {"tasks": [{"id": 1}, {"id": 4}], "notes": []}
     assert next_task_id(state) == 5
+
+
+def test_state_ids_use_high_water_mark():
+    from final.storage import State, apply_change, find_task
+
+    state = State({"tasks": [{"id": 1}, {"id": 4}], "notes": []})
+    assert next_task_id(state) == 5
+    assert find_task(state, 4) is state["tasks"][1]
+
+    apply_change(state, {"op": "add_task", "task": {"id": 5, "status": "open"}})
+    apply_change(state, {"op": "reset"})
+    # Ids are not reused after a reset.
+    assert next_task_id(state) == 6
+    assert next_note_id(state) == 1
+    assert find_task(state, 5) is None
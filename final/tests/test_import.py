@@ -0,0 +1,115 @@
+import json
+
+from final import commands, importer, storage
+from final.flusher import Flusher
+
+
+def test_import_csv_and_jsonl_commits_per_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    csv_path = tmp_path / "tasks.csv"
+    csv_path.write_text(
+        "id,title,description,tags,status,priority,due_date\n"
+        '99,Write report,,"work,q1",open,high,2025-01-31\n'
+        ",,go to groceries and buy apples,,done,,\n"
+        "7,Bad priority,,,open,urgent,\n"
+        "8,Bad date,,,open,low,next week\n"
+    )
+    jsonl_path = tmp_path / "mixed.jsonl"
+    jsonl_path.write_text(
+        json.dumps({"kind": "note", "title": "Ideas", "content": "x" * 1000, "tags": ["a"]}) + "\n"
+        + json.dumps({"title": "Call Bob", "color": "red"}) + "\n"
+        + "{not json\n"
+        + json.dumps({"title": "Plan trip", "tags": ["travel"]}) + "\n"
+    )
+    state = storage.load_state()
+    storage.apply_change(state, {"op": "add_task", "task": {"id": 5, "title": "existing"}})
+    flusher = Flusher(state)
+    commits = []
+    real_commit = storage.commit_changes
+    monkeypatch.setattr(storage, "commit_changes", lambda s, changes, **kw: commits.append(len(changes)) or real_commit(s, changes, **kw))
+
+    assert commands.import_records(state, str(csv_path), commit=flusher.record_now) == 2
+    assert commands.import_records(state, str(jsonl_path), commit=flusher.record_now) == 2
+
+    assert commits == [2, 2]
+    loaded = storage.load_state()
+    tasks = [(t["id"], t["title"], t["status"], t["priority"], t["tags"]) for t in loaded["tasks"]]
+    assert tasks == [
+        (6, "Write report", "open", "high", ["work", "q1"]),
+        (7, "Groceries buy apples", "done", "medium", []),
+        (8, "Plan trip", "open", "medium", ["travel"]),
+    ]
+    assert loaded.task_index.query(tag="work") == [6]
+    assert storage.search_records(loaded, "trip")[0][0]["id"] == 8
+    note = storage.find_note(loaded, 1)
+    assert note["content"] == "x" * 1000 and "content" not in dict(note)
+
+
+def test_import_reports_invalid_records(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    path = tmp_path / "notes.jsonl"
+    path.write_text(json.dumps({"content": "no title"}) + "\n" + json.dumps({"title": "ok"}) + "\n")
+    state = storage.load_state()
+
+    assert commands.import_records(state, str(path), kind="note") == 1
+
+    assert [n["title"] for n in state["notes"]] == ["ok"]
+    out = capsys.readouterr().out
+    assert "Imported 0 tasks and 1 notes" in out
+    assert "line 1: a note needs a title" in out
+
+
+def test_chunks_are_committed_as_they_are_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    path = tmp_path / "tasks.jsonl"
+    path.write_text("".join(json.dumps({"title": f"Task {i}"}) + "\n" for i in range(1, 6)))
+    state = storage.load_state()
+    journal_sizes = []
+
+    def commit(changes):
+        storage.commit_changes(state, changes)
+        journal_sizes.append(len(storage.read_journal()))
+
+    imported, _, _ = importer.import_file(state, str(path), chunk_size=2, commit=commit)
+
+    assert imported == {"task": 5, "note": 0}
+    assert journal_sizes == [2, 4, 5]
+
+
+def test_unreadable_file_reports_what_was_imported_before_it(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr(importer, "CHUNK_SIZE", 2)
+    path = tmp_path / "tasks.csv"
+    rows = "".join(f"Task {i},\n" for i in range(1, 6))
+    path.write_bytes(b"title,description\n" + rows.encode() + b"Bad \xff,\nLater,\n")
+    state = storage.load_state()
+
+    assert commands.import_records(state, str(path), commit=lambda changes: storage.commit_changes(state, changes)) == 5
+
+    out = capsys.readouterr().out
+    assert "Import failed after line 6: 'utf-8' codec can't decode" in out
+    assert "5 tasks and 0 notes before it were imported" in out
+    assert [t["title"] for t in storage.load_state()["tasks"]] == [f"Task {i}" for i in range(1, 6)]
+
+
+def test_jsonl_line_with_bad_utf8_is_an_invalid_record(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    path = tmp_path / "tasks.jsonl"
+    path.write_bytes(b'{"title": "One"}\n{"title": "bad \xff"}\n{"title": "Two"}\n')
+    state = storage.load_state()
+
+    assert commands.import_records(state, str(path)) == 2
+    assert "line 2: invalid UTF-8" in capsys.readouterr().out
+
+
+def test_csv_errors_are_reported(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    path = tmp_path / "tasks.csv"
+    path.write_text("title,description\nOk,\nBig," + "x" * 200000 + "\n")
+    state = storage.load_state()
+
+    assert commands.import_records(state, str(path)) == 1
+
+    out = capsys.readouterr().out
+    assert "Import failed after line 2: field larger than field limit" in out
+    assert [t["title"] for t in state["tasks"]] == ["Ok"]
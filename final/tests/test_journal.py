@@ -0,0 +1,55 @@
+import os
+
+from final import storage
+
+
+def test_journal_replayed_over_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    storage.save_state(state)
+
+    change = {"op": "add_task", "task": {"id": 1, "title": "A", "status": "open"}}
+    storage.apply_change(state, change)
+    storage.log_change(state, change)
+    change = {"op": "update_task", "id": 1, "fields": {"status": "done"}}
+    storage.apply_change(state, change)
+    storage.log_change(state, change)
+
+    reloaded = storage.load_state()
+    assert reloaded["tasks"] == [{"id": 1, "title": "A", "status": "done"}]
+
+
+def test_save_state_compacts_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    change = {"op": "add_note", "note": {"id": 1, "title": "N", "content": "", "tags": []}}
+    storage.apply_change(state, change)
+    storage.log_change(state, change)
+    assert os.path.exists(storage.journal_path())
+
+    storage.save_state(state)
+    assert not os.path.exists(storage.journal_path())
+    assert len(storage.load_state()["notes"]) == 1
+
+
+def test_checkpoint_compacts_only_a_large_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    storage.save_state({"tasks": [{"id": i, "title": f"Task {i}", "status": "open"} for i in range(1, 101)], "notes": []})
+    state = storage.load_state()
+    snapshot = os.stat(storage.STATE_FILE).st_mtime_ns
+
+    change = {"op": "update_task", "id": 1, "fields": {"status": "done"}}
+    storage.apply_change(state, change)
+    storage.log_change(state, change)
+    storage.checkpoint(state)
+    # A short session leaves its journal to be replayed.
+    assert os.stat(storage.STATE_FILE).st_mtime_ns == snapshot
+    assert storage.load_state()["tasks"][0]["status"] == "done"
+
+    for i in range(2, 101):
+        change = {"op": "update_task", "id": i, "fields": {"status": "done"}}
+        storage.apply_change(state, change)
+        storage.log_change(state, change)
+    storage.checkpoint(state)
+    assert not os.path.exists(storage.journal_path())
+    assert all(t["status"] == "done" for t in storage.load_state()["tasks"])
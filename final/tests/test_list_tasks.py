@@ -0,0 +1,53 @@
+import pytest
+
+from final import CommandError, commands, run_command, storage
+from final.flusher import Flusher
+from final.storage import State, apply_change, filter_tasks
+
+
+def _state():
+    return State({
+        "tasks": [
+            {"id": 1, "title": "Apples", "tags": ["errands"], "status": "open", "priority": "high", "due_date": "2026-10-30"},
+            {"id": 2, "title": "Essay", "tags": ["school"], "status": "open", "priority": "high", "due_date": None},
+            {"id": 3, "title": "Stamps", "tags": ["errands"], "status": "done", "priority": "low", "due_date": "2026-11-05"},
+        ],
+        "notes": [],
+    })
+
+
+def test_filters_match_scan():
+    state = _state()
+    plain = {"tasks": state["tasks"], "notes": []}
+    cases = [
+        {"status": "open"},
+        {"priority": "high", "tag": "errands"},
+        {"due_before": "2026-11-01"},
+        {"tag": "errands", "due_before": "2026-12-01"},
+        {"tag": "missing"},
+    ]
+    for filters in cases:
+        assert filter_tasks(state, **filters) == filter_tasks(plain, **filters)
+
+
+def test_indexes_follow_changes(capsys):
+    state = _state()
+    apply_change(state, {"op": "update_task", "id": 1, "fields": {"status": "done"}})
+    assert [t["id"] for t in filter_tasks(state, status="open")] == [2]
+
+    commands.list_tasks(state, status="done", tag="errands")
+    out = capsys.readouterr().out
+    assert "[1] Apples" in out and "[3] Stamps" in out and "Essay" not in out
+
+
+def test_list_tasks_command_quotes_values_and_checks_dates(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = _state()
+    apply_change(state, {"op": "update_task", "id": 2, "fields": {"tags": ["two words"]}})
+    flusher = Flusher(state, mode="batch")
+
+    run_command(state, flusher, 'list-tasks --tag "two words"', interactive=False)
+    assert "[2] Essay" in capsys.readouterr().out
+
+    with pytest.raises(CommandError, match="Invalid date"):
+        run_command(state, flusher, "list-tasks --due-before 2026-13-01", interactive=False)
@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import final
+from final import metrics, storage
+from final.flusher import Flusher
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    monkeypatch.setattr(metrics, "TRACE_FILE", None)
+    monkeypatch.setattr(metrics, "_trace", None)
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_percentiles():
+    values = [i / 1000 for i in range(1, 101)]
+    assert metrics.percentile(values, 50) == 0.05
+    assert metrics.percentile(values, 99) == 0.099
+    assert metrics.percentile([0.002], 95) == 0.002
+    assert metrics.percentile([], 50) == 0.0
+
+
+def test_stats_command_reports_commands_and_io(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    flusher = Flusher(state, mode="durable")
+    for i in range(5):
+        final.run_command(state, flusher, f"add-task --title 'Task {i}'")
+    final.run_command(state, flusher, "search task")
+    capsys.readouterr()
+
+    final.run_command(state, flusher, "stats")
+    out = capsys.readouterr().out
+    snap = metrics.snapshot()
+    assert snap["timers"]["command.add-task"]["calls"] == 5
+    assert snap["timers"]["storage.commit"]["calls"] == 5
+    assert snap["timers"]["search.scan"]["calls"] == 1
+    assert snap["counters"]["bytes_written"] > 0
+    assert "command.add-task" in out and "p99 ms" in out and "written" in out
+
+    final.run_command(state, flusher, "stats reset")
+    # Only the timing of "stats reset" itself is left.
+    assert set(metrics.snapshot()["timers"]) == {"command.stats"}
+
+
+def test_trace_file_and_disabled(tmp_path, monkeypatch):
+    trace = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(metrics, "TRACE_FILE", str(trace))
+    with metrics.timer("work"):
+        pass
+    metrics.count("bytes_read", 10)
+    metrics._trace.close()
+    events = [json.loads(line) for line in trace.read_text().splitlines()]
+    assert events[0]["span"] == "work" and events[0]["ms"] >= 0
+    assert events[1] == {"t": events[1]["t"], "counter": "bytes_read", "n": 10}
+
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.reset()
+    with metrics.timer("ignored"):
+        pass
+    metrics.timed("ignored")(lambda: None)()
+    metrics.count("ignored")
+    assert metrics.snapshot() == {"timers": {}, "counters": {}}
+    assert "off" in metrics.format_stats()
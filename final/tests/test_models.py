@@ -0,0 +1,78 @@
+import json
+
+from final import commands, storage
+from final.models import Note, Task
+
+
+def test_task_behaves_like_a_dict():
+    task = Task({"id": 1, "title": "Write", "tags": ["work"], "status": "open", "color": "blue"})
+    assert task["title"] == "Write"
+    assert task.get("due_date") is None and "due_date" not in task
+    assert task.get("color") == "blue" and "color" in task
+    assert task == {"id": 1, "title": "Write", "tags": ["work"], "status": "open", "color": "blue"}
+    task.update({"status": "done", "due_date": "2025-02-01"})
+    assert {**task}["status"] == "done"
+    del task["color"]
+    assert list(task) == ["id", "title", "tags", "status", "due_date"]
+    assert not hasattr(task, "__dict__")
+
+
+def test_repeated_strings_are_interned():
+    a = Task(json.loads('{"id": 1, "tags": ["work"], "status": "open", "priority": "high"}'))
+    b = Task(json.loads('{"id": 2, "tags": ["work"], "status": "open", "priority": "high"}'))
+    assert a["tags"][0] is b["tags"][0]
+    assert a["status"] is b["status"] and a["priority"] is b["priority"]
+    a.update(json.loads('{"status": "done"}'))
+    b["status"] = json.loads('"done"')
+    assert a["status"] is b["status"]
+
+
+def test_records_round_trip_through_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "BACKEND", "json")
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    first = commands.create_task(state, title="One", tags="a,b")["task"]
+    second = commands.create_task(state, title="Two")["task"]
+    commands.create_note(state, "Ideas", content="body")
+    first["legacy"] = {"kept": True}
+    assert isinstance(first, Task)
+    storage.save_state(state)
+
+    saved = json.loads((tmp_path / "state.json").read_text())
+    assert saved["tasks"][0]["legacy"] == {"kept": True}
+    assert "content" not in saved["notes"][0] and "content_hash" in saved["notes"][0]
+
+    reloaded = storage.load_state()
+    assert reloaded["tasks"][0] == first
+    assert isinstance(storage.find_note(reloaded, 1), Note)
+    assert storage.find_note(reloaded, 1)["content"] == "body"
+    assert json.loads(json.dumps(reloaded["tasks"]))[1]["title"] == "Two"
+
+
+def test_each_new_record_is_stamped_when_created(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    stamps = iter(["2025-01-01T09:00:00", "2025-01-01T09:05:00", "2025-01-01T09:10:00"])
+    monkeypatch.setattr(commands, "timestamp", lambda: next(stamps))
+    state = storage.load_state()
+
+    first = commands.create_task(state, title="One")["task"]
+    second = commands.create_task(state, title="Two")["task"]
+    note = commands.create_note(state, "Ideas")["note"]
+
+    assert first["created_at"] == "2025-01-01T09:00:00"
+    assert second["created_at"] == "2025-01-01T09:05:00"
+    assert note["created_at"] == "2025-01-01T09:10:00"
+
+
+def test_only_top_level_tasks_are_loaded_as_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "BACKEND", "json")
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    (tmp_path / "state.json").write_text(json.dumps({
+        "tasks": [{"id": 1, "title": "T", "status": "open", "meta": {"title": "x", "status": "y"}}],
+        "notes": [{"id": 1, "title": "N", "status": "draft", "content": "c"}],
+    }))
+
+    state = storage.load_state()
+
+    assert type(state["tasks"][0]) is Task and type(state["tasks"][0]["meta"]) is dict
+    assert not isinstance(state["notes"][0], Task) and isinstance(state["notes"][0], Note)
@@ -0,0 +1,56 @@
+import time
+
+from final import ai_agent, ai_cache, commands, retitle, storage
+from final.flusher import Flusher
+
+
+def test_token_bucket_limits_rate():
+    bucket = retitle.TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    # The first token is free, the other five arrive every 20 ms.
+    assert time.monotonic() - start >= 0.09
+
+
+def test_retitle_tasks_retries_failures():
+    calls = {}
+
+    def flaky(description):
+        calls[description] = calls.get(description, 0) + 1
+        if description == "bad":
+            raise RuntimeError("always fails")
+        if calls[description] == 1:
+            raise RuntimeError("rate limited")
+        return description.upper()
+
+    tasks = [{"id": i, "description": d} for i, d in enumerate(["a", "b", "bad", "c"], 1)]
+    seen = []
+    titles = retitle.retitle_tasks(
+        tasks, summarize=flaky, concurrency=4, rate=0, retries=2, backoff=0, progress=lambda *p: seen.append(p)
+    )
+
+    assert titles == {1: "A", 2: "B", 4: "C"}
+    assert calls["bad"] == 3
+    assert seen[-1] == (4, 4, 1)
+
+
+def test_retitle_command_saves_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(ai_cache, "ENABLED", False)
+    monkeypatch.setattr(ai_agent, "_call_chat", lambda messages, **kw: "Title for " + messages[1]["content"].split()[-1])
+    state = storage.load_state()
+    adds = [
+        {"op": "add_task", "task": {"id": i, "title": title, "description": description}}
+        for i, (title, description) in enumerate([("", "one"), ("Keep", "two"), ("", "three")], 1)
+    ]
+    for change in adds:
+        storage.apply_change(state, change)
+    storage.commit_changes(state, adds)
+    flusher = Flusher(state)
+
+    flusher.record_many(commands.retitle(state))
+
+    assert flusher.writes == 1
+    assert [t["title"] for t in storage.load_state()["tasks"]] == ["Title for one", "Keep", "Title for three"]
@@ -13,3 +13,19 @@ def test_search_runs():
 
     # Should run without raising
     search_all(state, "essay")
+
+
+def test_search_top_ranks_best_match_first(capsys):
+    state = {
+        "tasks": [
+            {"id": 1, "title": "Groceries", "description": "milk eggs apples", "priority": "low", "status": "open"},
+            {"id": 2, "title": "Apples apples", "description": "apples for pie", "priority": "high", "status": "open"},
+            {"id": 3, "title": "Laundry", "description": "", "priority": "low", "status": "open"},
+        ],
+        "notes": [{"id": 1, "title": "Pie", "content": "needs apples", "tags": []}],
+    }
+
+    search_all(state, "apples", top=2)
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert lines[0].startswith("Task [2] Apples apples")
@@ -0,0 +1,107 @@
+import os
+
+from final import blob_store, storage
+from final.search_index import SearchIndex
+
+
+def test_token_index_intersects_words():
+    index = SearchIndex.build({
+        "tasks": [
+            {"id": 1, "title": "Buy apples", "description": "at the grocery store"},
+            {"id": 2, "title": "Buy stamps", "description": "post office"},
+        ],
+        "notes": [],
+    })
+    assert index.tasks.search("buy") == {1, 2}
+    assert index.tasks.search("Buy GROCERY") == {1}
+    assert index.tasks.search("buy bananas") == set()
+
+
+def test_index_updated_incrementally_and_persisted(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    storage.apply_change(state, {"op": "add_note", "note": {"id": 1, "title": "Lecture", "content": "PKMS talk"}})
+    assert storage.search_records(state, "pkms")[1][0]["id"] == 1
+
+    storage.save_state(state)
+    assert os.path.exists(storage.index_path())
+    reloaded = storage.load_state()
+    assert reloaded.index_saved
+    assert storage.search_records(reloaded, "lecture")[1][0]["id"] == 1
+    assert reloaded.search_index.notes.search("lecture") == {1}
+
+    storage.apply_change(reloaded, {"op": "reset"})
+    assert storage.search_records(reloaded, "lecture") == ([], [])
+
+
+def test_trigram_search_matches_full_scan():
+    state = storage.State({
+        "tasks": [
+            {"id": 1, "title": "Buy apples", "description": "grocery run"},
+            {"id": 2, "title": "Rebuy applesauce", "description": ""},
+            {"id": 3, "title": "Call mom", "description": None},
+        ],
+        "notes": [{"id": 1, "title": "ab", "content": "Apple pie recipe"}],
+    })
+    plain = {"tasks": state["tasks"], "notes": state["notes"]}
+    state.search_index = SearchIndex.build(state)
+
+    for query in ["appl", "buy apples", "y a", "ab", "", "zzz", "CALL"]:
+        assert storage.search_records(state, query) == storage.search_records(plain, query)
+
+
+def test_changed_and_replaced_records_are_unindexed_from_their_text(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.State({"tasks": [{"id": 1, "title": "Buy apples", "description": "grocery run"}], "notes": []})
+    state.search_index = SearchIndex.build(state)
+
+    storage.apply_change(state, {"op": "update_task", "id": 1, "fields": {"title": "Buy pears"}})
+    assert state.search_index.tasks.search("apples") == set()
+    assert state.search_index.tasks.search("pears grocery") == {1}
+    assert state.search_index.tasks.total_length == 4
+
+    # Another session's task with the same id replaces ours in the index.
+    storage.apply_change(state, {"op": "add_task", "task": {"id": 1, "title": "Walk dog"}})
+    assert state.search_index.tasks.search("pears") == set()
+    assert state.search_index.tasks.postings == {"walk": {1: 1}, "dog": {1: 1}}
+
+
+def test_saved_postings_stay_packed_until_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    storage.apply_change(state, {"op": "add_task", "task": {"id": 1, "title": "Buy apples", "description": "grocery"}})
+    storage.apply_change(state, {"op": "add_task", "task": {"id": 2, "title": "Buy pears", "description": ""}})
+    storage.save_state(state)
+
+    index = storage.load_state().search_index
+    assert all(isinstance(p, str) for p in index.tasks.postings.values())
+    assert index.tasks.search("buy pears") == {2}
+    assert index.tasks.postings["pears"] == {2: 1} and isinstance(index.tasks.postings["apples"], str)
+    assert index.task_grams.candidates("pple") == {1}
+
+    index.remove_task({"id": 1, "title": "Buy apples", "description": "grocery"})
+    assert index.tasks.search("buy") == {2} and "apples" not in index.tasks.postings
+    assert index.task_grams.candidates("buy") == {2} and "gro" not in index.task_grams.postings
+    assert SearchIndex.from_dict(index.to_dict()).tasks.search("buy") == {2}
+
+
+def test_note_index_loaded_from_its_own_file_on_first_note_search(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    state = storage.load_state()
+    storage.apply_change(state, {"op": "add_note", "note": {"id": 1, "title": "Lecture", "content": "PKMS talk"}})
+    storage.apply_change(state, {"op": "add_note", "note": {"id": 2, "title": "Recipe", "content": "apple pie"}})
+    storage.save_state(state)
+    assert os.path.exists(storage.notes_index_path())
+
+    reloaded = storage.load_state()
+    assert not reloaded.search_index.notes_loaded
+    storage.apply_change(reloaded, {"op": "add_note", "note": {"id": 3, "title": "Talk", "content": "slides"}})
+
+    def no_body_reads(*args):
+        raise AssertionError("note body read")
+
+    monkeypatch.setattr(blob_store, "get", no_body_reads)
+    index = reloaded.search_index
+    assert storage.search_records(reloaded, "zzz") == ([], [])
+    assert index.notes.search("talk") == {1, 3}
+    assert reloaded.search_index.notes.search("apple") == {2}
@@ -0,0 +1,85 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+import final
+from final import client, storage
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    src = os.path.dirname(os.path.dirname(final.__file__))
+    env = dict(os.environ, PYTHONPATH=src, FINAL_AI_BACKEND="local")
+    env.pop("FINAL_SOCKET", None)
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "import final; final.main(['serve'])"],
+        cwd=tmp_path,
+        env=env,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    path = str(tmp_path / "state.sock")
+    deadline = time.monotonic() + 10
+    while not os.path.exists(path):
+        assert proc.poll() is None, proc.stderr.read()
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+    yield proc, path
+    if proc.poll() is None:
+        proc.kill()
+        proc.wait()
+
+
+def test_clients_share_one_store(daemon, tmp_path, monkeypatch):
+    proc, path = daemon
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+    first = client.Connection(path)
+    second = client.Connection(path)
+    added = first.request('add-task --title "Write report" --tags work', request_id=1)
+    assert added == {"ok": True, "output": "Added task 1: Write report", "id": 1}
+    assert second.request("list-tasks --tag work")["output"].count("Write report") == 1
+    assert second.request("complete-task 9") == {"ok": True, "output": "Task 9 not found."}
+    assert second.request("add-task --title")["error"].startswith("Usage")
+
+    # Plain command lines work too; quit only closes this connection.
+    raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    raw.connect(path)
+    raw.sendall(b'{"id": 2}\ncomplete-task 1\nquit\n')
+    replies = [json.loads(line) for line in raw.makefile("rb")]
+    assert replies[0]["ok"] is False
+    assert replies[1]["output"] == "Marked task 1 as completed."
+    assert replies[2]["closed"] is True
+    raw.close()
+    assert "done" in first.request("list-tasks --status done")["output"]
+    first.close()
+    second.close()
+
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=10) == 0
+    assert not os.path.exists(path)
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    assert storage.load_state()["tasks"][0]["status"] == "done"
+
+
+def test_client_command_and_stale_socket(daemon, tmp_path, capsys):
+    proc, path = daemon
+    assert client.main(["add-note", "--title", "Ideas", "--content", "two words"], path=path) == 0
+    assert client.main(["view-note", "1"], path=path) == 0
+    assert "two words" in capsys.readouterr().out
+    assert client.main(["complete-task", "x"], path=path) == 1
+
+    proc.kill()
+    proc.wait()
+    # The socket file left by the killed daemon is not mistaken for a live one.
+    assert os.path.exists(path)
+    assert client.main(["list-tasks"], path=path) == 2
+    from final import server
+
+    assert not server._alive(path)
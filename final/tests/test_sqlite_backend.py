@@ -0,0 +1,126 @@
+import json
+
+from final import commands, sqlite_backend, storage
+
+
+def _use_sqlite(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "STATE_FILE", str(tmp_path / "state.json"))
+    monkeypatch.setattr(storage, "BACKEND", "sqlite")
+
+
+def test_sqlite_seeded_from_json_and_round_trips(tmp_path, monkeypatch):
+    _use_sqlite(tmp_path, monkeypatch)
+    seed = {
+        "tasks": [{"id": 2, "title": "Essay", "description": "x", "tags": ["school"],
+                   "status": "open", "priority": "high", "due_date": None, "created_at": "t"}],
+        "notes": [{"id": 1, "title": "N", "content": "body", "tags": []}],
+    }
+    (tmp_path / "state.json").write_text(json.dumps(seed))
+
+    state = storage.load_state()
+    assert state["tasks"] == seed["tasks"]
+    assert state["notes"] == seed["notes"]
+    assert storage.next_task_id(state) == 3
+    sqlite_backend.close(storage.db_path())
+
+
+def test_sqlite_change_and_lookups(tmp_path, monkeypatch, capsys):
+    _use_sqlite(tmp_path, monkeypatch)
+    state = storage.load_state()
+    task = {"id": 1, "title": "Buy apples", "description": "", "tags": ["errands"],
+            "status": "open", "priority": "medium", "due_date": None}
+    change = {"op": "add_task", "task": task}
+    storage.apply_change(state, change)
+    storage.log_change(state, change)
+
+    change = commands.complete_task(state, 1)
+    storage.log_change(state, change)
+    assert storage.find_task(state, 1)["status"] == "done"
+
+    commands.search_all(state, "APPLES")
+    assert "Task [1] Buy apples" in capsys.readouterr().out
+    sqlite_backend.close(storage.db_path())
+
+
+def test_sqlite_state_keeps_its_search_index(tmp_path, monkeypatch):
+    _use_sqlite(tmp_path, monkeypatch)
+    state = storage.load_state()
+    index = state.search_index
+    assert index is not None
+    storage.apply_change(state, {"op": "add_task", "task": {"id": 1, "title": "Buy apples", "status": "open"}})
+    storage.apply_change(state, {"op": "add_note", "note": {"id": 1, "title": "Pie", "content": "apples"}})
+
+    ranked = storage.ranked_search(state, "apples", 5)
+    assert [(kind, r["id"]) for kind, r, _ in ranked] == [("task", 1), ("note", 1)]
+    assert state.search_index is index and index.tasks.search("apples") == {1}
+    sqlite_backend.close(storage.db_path())
+
+
+def test_sqlite_commit_writes_all_changes_in_one_transaction(tmp_path, monkeypatch):
+    _use_sqlite(tmp_path, monkeypatch)
+    state = storage.load_state()
+    changes = [{"op": "add_task", "task": {"id": i, "title": f"T{i}", "status": "open"}} for i in (1, 2, 3)]
+    for change in changes:
+        storage.apply_change(state, change)
+    conn = sqlite_backend.connect(storage.db_path())
+    commits = []
+    conn.set_trace_callback(lambda sql: commits.append(sql) if sql.strip().upper() == "COMMIT" else None)
+
+    storage.commit_changes(state, changes)
+
+    conn.set_trace_callback(None)
+    assert len(commits) == 1
+    assert sqlite_backend.max_id(storage.db_path(), "tasks") == 3
+    sqlite_backend.close(storage.db_path())
+
+
+
+def _in_other_connection(path, write):
+    """Run `write` on a separate connection, as another process would."""
+    ours = sqlite_backend._connections.pop(path)
+    try:
+        write(storage.load_state())
+    finally:
+        sqlite_backend.close(path)
+        sqlite_backend._connections[path] = ours
+
+
+def _commit(state, *changes):
+    for change in changes:
+        storage.apply_change(state, change)
+    storage.commit_changes(state, list(changes))
+
+
+def test_sqlite_sync_applies_only_the_changed_rows(tmp_path, monkeypatch):
+    _use_sqlite(tmp_path, monkeypatch)
+    path = storage.db_path()
+    state = storage.load_state()
+    _commit(state, {"op": "add_task", "task": {"id": 1, "title": "Mine", "status": "open"}})
+    _in_other_connection(path, lambda other: _commit(
+        other,
+        {"op": "add_task", "task": {"id": 2, "title": "Theirs", "status": "open"}},
+        {"op": "update_task", "id": 1, "fields": {"status": "done"}},
+    ))
+    reloads = []
+    load = storage._load_sqlite_state
+    monkeypatch.setattr(storage, "_load_sqlite_state", lambda: reloads.append(1) or load())
+    index = state.search_index
+
+    assert storage.sync(state)
+    assert [(t["id"], t["title"], t["status"]) for t in state["tasks"]] == [(1, "Mine", "done"), (2, "Theirs", "open")]
+    assert state.search_index is index and index.tasks.search("theirs") == {2}
+    assert not state.dirty and not storage.sync(state)
+    assert not reloads
+
+    # A new task whose id was taken meanwhile is renumbered, still without a reload.
+    _in_other_connection(path, lambda other: _commit(
+        other, {"op": "add_task", "task": {"id": 3, "title": "Taken", "status": "open"}}
+    ))
+    reloads.clear()
+    ours = {"op": "add_task", "task": {"id": 3, "title": "Late", "status": "open"}}
+    _commit(state, ours)
+    assert ours["task"]["id"] == 4
+    assert storage.take_renumbered(state) == [("task", 3, 4)]
+    assert [t["title"] for t in state["tasks"]] == ["Mine", "Theirs", "Taken", "Late"]
+    assert not reloads
+    sqlite_backend.close(path)
@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+import final
+
+
+# What the REPL imports before its first prompt.
+REPL_MODULES = ("final", "final.commands", "final.storage", "final.flusher", "final.ai_agent")
+
+
+def test_repl_modules_do_not_load_openai():
+    src = os.path.dirname(os.path.dirname(final.__file__))
+    env = dict(os.environ, PYTHONPATH=src)
+    env.pop("OPENAI_API_KEY", None)
+    code = (
+        f"import sys, {', '.join(REPL_MODULES)}\n"
+        f"print(all(m in sys.modules for m in {REPL_MODULES!r}), 'openai' in sys.modules)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.split() == ["True", "False"]